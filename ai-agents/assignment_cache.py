@@ -0,0 +1,122 @@
+"""
+On-disk cache for AI fallback assignments
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "assignment_cache.sqlite3")
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 10000
+
+_PUNCTUATION = re.compile(r"[^\w\s]+")
+
+
+def normalize_text(text) -> str:
+    """Lowercase, drop punctuation and collapse whitespace so near-identical complaints match."""
+    return " ".join(_PUNCTUATION.sub(" ", str(text or "").lower()).split())
+
+
+def issue_cache_key(issue_data: dict, roster_fingerprint: str) -> str:
+    """Content-addressed key for an issue against a specific roster."""
+    fields = [
+        normalize_text(issue_data.get("category", "")),
+        normalize_text(issue_data.get("title", "")),
+        normalize_text(issue_data.get("description", "")),
+        roster_fingerprint,
+    ]
+    return hashlib.sha256(json.dumps(fields).encode("utf-8")).hexdigest()
+
+
+class AssignmentCache:
+    """SQLite-backed cache of AI assignment results with TTL and LRU eviction.
+
+    Entries older than ``ttl_seconds`` are treated as misses and removed.
+    Once the cache holds more than ``max_entries`` rows, the least recently
+    used ones are evicted.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS assignments ("
+            " key TEXT PRIMARY KEY,"
+            " result TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS assignments_accessed ON assignments (accessed_at)")
+        self._conn.commit()
+
+    def get(self, key: str):
+        """Return the cached result for key, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result, created_at FROM assignments WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            if now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM assignments WHERE key = ?", (key,))
+                self._conn.commit()
+                self.misses += 1
+                self.evictions += 1
+                return None
+            self._conn.execute("UPDATE assignments SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, result: dict):
+        """Store a result and evict the least recently used rows past max_entries."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO assignments (key, result, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(result, ensure_ascii=False), now, now)
+            )
+            excess = self._conn.execute("SELECT COUNT(*) FROM assignments").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM assignments WHERE key IN "
+                    "(SELECT key FROM assignments ORDER BY accessed_at ASC LIMIT ?)", (excess,)
+                )
+                self.evictions += excess
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM assignments")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM assignments").fetchone()[0]
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": entries,
+            "path": self.path
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for technician assignment
+
+Generates synthetic rosters and issues, times the assignment pipeline at a
+range of roster and batch sizes with the LLM stubbed out, and writes the
+results to a JSON file. Passing --baseline compares against an earlier
+results file and exits non-zero when any benchmark regressed past the
+threshold.
+
+Usage:
+    python benchmark_assignment.py [--quick] [--output results.json]
+                                   [--baseline old.json] [--threshold 0.2]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import timeit
+
+# Add the current directory to Python path
+AGENT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(AGENT_DIR)
+
+SKILLS = ["plumbing", "electrical", "carpentry", "painting", "cleaning", "security", "elevator", "parking", "garden"]
+ISSUE_TEMPLATES = {
+    "plumbing": ("Water leak in {room}", "Water is dripping from the pipe under the {room} sink."),
+    "electrical": ("Power socket sparking in {room}", "The switch board in the {room} sparks when used."),
+    "carpentry": ("Broken door hinge in {room}", "The {room} cupboard door does not close."),
+    "painting": ("Paint peeling in {room}", "Dampness has made the {room} wall paint peel."),
+    "cleaning": ("Garbage not collected", "Trash near the {room} has not been cleaned for days."),
+    "security": ("Gate left open", "The security guard was not at the gate near the {room}."),
+    "elevator": ("Lift not working", "The lift is stuck between floors near the {room}."),
+    "parking": ("Vehicle in my parking slot", "Someone parked a bike in my slot near the {room}."),
+    "garden": ("Garden hedge overgrown", "The hedge and lawn near the {room} need pruning."),
+}
+ROOMS = ["kitchen", "bathroom", "hall", "bedroom", "lobby", "terrace"]
+
+TECHNICIAN_SIZES = [10, 100, 1000, 10000, 100000]
+ISSUE_SIZES = [1, 10, 100, 1000, 10000]
+QUICK_TECHNICIAN_SIZES = [10, 1000]
+QUICK_ISSUE_SIZES = [1, 100]
+
+
+def generate_roster(count: int, seed: int = 0) -> list:
+    """Synthetic technicians with 1-3 skills, mixed rates and availability."""
+    rng = random.Random(seed)
+    technicians = []
+    for index in range(count):
+        technicians.append({
+            "_id": f"tech{index}",
+            "name": f"Technician {index}",
+            "phone": f"+91 90000 {index:05d}"[-15:],
+            "email": f"tech{index}@societyhub.com",
+            "skills": rng.sample(SKILLS, rng.choice((1, 1, 2, 3))),
+            "hourlyRate": rng.randrange(300, 1200, 50),
+            "availability": rng.choice(("available", "available", "busy", "off-duty")),
+        })
+    return technicians
+
+
+def generate_issues(count: int, seed: int = 0, missing_category_rate: float = 0.1) -> list:
+    """Synthetic issues; a share of them have no category so inference runs too."""
+    rng = random.Random(seed + 1)
+    issues = []
+    for _ in range(count):
+        category = rng.choice(SKILLS)
+        title, description = ISSUE_TEMPLATES[category]
+        room = rng.choice(ROOMS)
+        issues.append({
+            "title": title.format(room=room),
+            "description": description.format(room=room),
+            "category": "" if rng.random() < missing_category_rate else category,
+        })
+    return issues
+
+
+def _stub_ai_assignment(issue_data: dict) -> dict:
+    return {"type": "technician_assignment", "source": "benchmark-stub"}
+
+
+def measure(function, min_seconds: float = 0.2, repeat: int = 3) -> dict:
+    """Best-of-``repeat`` seconds per call, auto-ranging the loop count like timeit."""
+    timer = timeit.Timer(function)
+    loops, elapsed = timer.autorange()
+    if elapsed < min_seconds:
+        loops = max(1, int(loops * min_seconds / max(elapsed, 1e-9)))
+    best = min(timer.repeat(repeat=repeat, number=loops)) / loops
+    return {"seconds_per_op": best, "loops": loops}
+
+
+def _run_process(args: list, input_data: str = None) -> float:
+    started = time.perf_counter()
+    completed = subprocess.run(
+        args, input=input_data, capture_output=True, text=True, cwd=AGENT_DIR,
+        env=dict(os.environ, ASSIGNMENT_CACHE="off")
+    )
+    elapsed = time.perf_counter() - started
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip() or f"exit code {completed.returncode}")
+    return elapsed
+
+
+def measure_process(args: list, input_data: str = None, repeat: int = 3) -> dict:
+    """Best-of-``repeat`` wall time of a fresh interpreter process."""
+    return {"seconds_per_op": min(_run_process(args, input_data) for _ in range(repeat)), "loops": 1}
+
+
+def run_benchmarks(technician_sizes: list, issue_sizes: list, log=print) -> dict:
+    import categoryagent
+    from technician_roster import TechnicianRoster
+
+    # The LLM is never called during benchmarks
+    categoryagent.run_ai_assignment = _stub_ai_assignment
+    categoryagent.cache_enabled = False
+
+    tool = categoryagent.assignment_tool
+    results = {}
+
+    def record(name, measurement):
+        results[name] = measurement
+        log(f"{name:<45} {measurement['seconds_per_op'] * 1000:12.4f} ms/op")
+
+    issue = generate_issues(1)[0]
+    for technician_count in technician_sizes:
+        technicians = generate_roster(technician_count)
+        roster = TechnicianRoster(technicians)
+        categories = iter(range(10 ** 9))
+
+        record(f"roster_build/techs={technician_count}",
+               measure(lambda: TechnicianRoster(technicians)))
+        record(f"find_best_technician/cold/techs={technician_count}",
+               measure(lambda: tool._find_best_technician(issue["category"], technicians)))
+        # A fresh category each call so the per-category result cache never hits
+        record(f"find_best_technician/uncached/techs={technician_count}",
+               measure(lambda: roster.best_match(f"{SKILLS[next(categories) % len(SKILLS)]}-{next(categories)}")))
+        record(f"find_best_technician/warm/techs={technician_count}",
+               measure(lambda: tool._find_best_technician(issue["category"], roster)))
+        record(f"run/techs={technician_count}",
+               measure(lambda: tool._run(dict(issue, technicians=technicians))))
+
+    batch_technicians = TechnicianRoster(generate_roster(1000))
+    for issue_count in issue_sizes:
+        issues = generate_issues(issue_count)
+        record(f"assign_batch/issues={issue_count}/techs=1000",
+               measure(lambda: categoryagent.assign_technician_batch(issues, batch_technicians), min_seconds=0.1))
+        record(f"dispatch_batch/issues={issue_count}/techs=1000",
+               measure(lambda: categoryagent.dispatch_technicians_batch(issues, batch_technicians), min_seconds=0.1))
+
+    record("cold_start/import", measure_process([sys.executable, "-c", "import categoryagent"]))
+    stub_main = (
+        "import categoryagent\n"
+        "categoryagent.run_ai_assignment = lambda issue_data: {'type': 'technician_assignment'}\n"
+        "categoryagent.main()\n"
+    )
+    for technician_count in technician_sizes[:3]:
+        payload = json.dumps(dict(issue, technicians=generate_roster(technician_count)))
+        record(f"main_stdin/techs={technician_count}",
+               measure_process([sys.executable, "-c", stub_main], payload))
+
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Return (name, baseline, current) for every benchmark slower than baseline * (1 + threshold)."""
+    regressions = []
+    for name, measurement in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if measurement["seconds_per_op"] > previous["seconds_per_op"] * (1 + threshold):
+            regressions.append((name, previous["seconds_per_op"], measurement["seconds_per_op"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark technician assignment")
+    parser.add_argument("--quick", action="store_true", help="Run only small roster and batch sizes")
+    parser.add_argument("--output", default="benchmark_assignment.json", help="Where to write the results JSON")
+    parser.add_argument("--baseline", help="Earlier results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Allowed slowdown before a benchmark counts as a regression (default 0.2 = 20%%)")
+    args = parser.parse_args()
+
+    technician_sizes = QUICK_TECHNICIAN_SIZES if args.quick else TECHNICIAN_SIZES
+    issue_sizes = QUICK_ISSUE_SIZES if args.quick else ISSUE_SIZES
+    results = run_benchmarks(technician_sizes, issue_sizes)
+
+    report = {
+        "suite": "technician_assignment",
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    with open(args.output, "w") as output_file:
+        json.dump(report, output_file, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for name, previous, current in regressions:
+            print(f"REGRESSION {name}: {previous * 1000:.4f} ms -> {current * 1000:.4f} ms")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
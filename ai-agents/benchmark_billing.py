@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for billing duplicate detection
+
+Generates seeded synthetic bill exports (row count, duplicate fraction,
+near-duplicate noise and resident cardinality are all configurable), times
+DuplicateCheckerTool._run, run_analysis and simple_duplicate_check end to
+end on each, records their peak traced memory, and writes the results to a
+JSON file. Passing --baseline compares against an earlier results file and
+exits non-zero when any benchmark got slower or hungrier past its threshold.
+
+Usage:
+    python benchmark_billing.py [--quick] [--rows 1000 100000 ...]
+                                [--duplicate-fraction 0.1] [--near-noise 0.05]
+                                [--residents 1000] [--seed 0]
+                                [--output results.json] [--baseline old.json]
+                                [--threshold 0.2] [--memory-threshold 0.2]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+# Add the current directory to Python path
+AGENT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(AGENT_DIR)
+
+FIRST_NAMES = ["Raj", "Neha", "Amit", "Sneha", "Vikram", "Pooja", "Rohan", "Anjali", "Karan", "Priya",
+               "Arjun", "Kavya", "Rahul", "Meera", "Sanjay", "Divya", "Aditya", "Isha", "Manish", "Riya"]
+LAST_NAMES = ["Verma", "Patel", "Rao", "Iyer", "Nair", "Mehta", "Shah", "Sharma", "Gupta", "Reddy",
+              "Joshi", "Kapoor", "Menon", "Das", "Kulkarni", "Singh", "Bose", "Pillai", "Chopra", "Desai"]
+STATUSES = ["Paid", "Unpaid", "Disputed"]
+STATUS_WEIGHTS = [0.7, 0.2, 0.1]
+COMMENTS = ["", "", "", "Late payment", "Dispute over water charges", "Paid via UPI", "Includes parking charges"]
+AMOUNTS = np.arange(800, 3001, 100)
+START_DATE = np.datetime64("2025-01-01")
+DAYS = 365
+
+ROW_SIZES = [1000, 10000, 100000, 1000000, 10000000]
+QUICK_ROW_SIZES = [1000, 10000]
+# Near-duplicate scoring and the pure-pandas checker are only run up to this size
+NEAR_MAX_ROWS = 1000000
+# Bills are generated and written this many at a time, so 10M-row exports fit in memory
+GENERATOR_CHUNK_ROWS = 100000
+CHUNKSIZE = 100000
+
+
+def resident_names(count: int) -> list:
+    """count distinct resident names; past the first/last name pairs a number keeps them distinct."""
+    pairs = len(FIRST_NAMES) * len(LAST_NAMES)
+    names = []
+    for index in range(count):
+        name = f"{FIRST_NAMES[index % len(FIRST_NAMES)]} {LAST_NAMES[(index // len(FIRST_NAMES)) % len(LAST_NAMES)]}"
+        names.append(name if index < pairs else f"{name} {index // pairs}")
+    return names
+
+
+def generate_bills(rows: int, seed: int = 0, duplicate_fraction: float = 0.1, near_noise: float = 0.05,
+                   residents: int = 1000, start: int = 0) -> pd.DataFrame:
+    """
+    Synthetic bills with Bill IDs from start, as a bill export frame.
+
+    A duplicate_fraction of the rows copy another row of the block, half of
+    them with the resident name or status in different case or spacing so
+    normalization matters. A near_noise share of those copies also get a
+    date a day or two off, a dropped letter in the name or a full stop
+    after the comment, so only near-duplicate detection pairs them. The
+    original bills are drawn independently and can coincide by chance when
+    there are few residents.
+    """
+    rng = np.random.default_rng([seed, start])
+    names = np.array(resident_names(residents), dtype=object)
+    copies = min(int(round(rows * duplicate_fraction)), max(rows - 1, 0))
+    originals = rows - copies
+
+    source = np.concatenate([np.arange(originals), rng.integers(0, max(originals, 1), copies)])
+    is_copy = np.arange(rows) >= originals
+    order = rng.permutation(rows)
+    source, is_copy = source[order], is_copy[order]
+
+    name = names[rng.integers(0, residents, originals)][source]
+    amount = rng.choice(AMOUNTS, originals)[source]
+    status = np.array(STATUSES, dtype=object)[rng.choice(len(STATUSES), originals, p=STATUS_WEIGHTS)][source]
+    day = rng.integers(0, DAYS, originals)[source]
+    comment = np.array(COMMENTS, dtype=object)[rng.integers(0, len(COMMENTS), originals)][source]
+
+    cosmetic = np.flatnonzero(is_copy & (rng.random(rows) < 0.5))
+    name[cosmetic[::2]] = [f" {value.lower()}" for value in name[cosmetic[::2]]]
+    status[cosmetic[1::2]] = [f"{value.upper()} " for value in status[cosmetic[1::2]]]
+
+    noisy = np.flatnonzero(is_copy & (rng.random(rows) < near_noise))
+    kind = rng.integers(0, 3, len(noisy))
+    shifted = noisy[kind == 0]
+    day[shifted] += rng.choice([-2, -1, 1, 2], len(shifted))
+    for position in noisy[kind == 1]:
+        value = name[position].strip()
+        cut = 1 + int(rng.integers(0, max(len(value) - 1, 1)))
+        name[position] = value[:cut] + value[cut + 1:]
+    comment[noisy[kind == 2]] = [f"{value}." for value in comment[noisy[kind == 2]]]
+
+    return pd.DataFrame({
+        "Bill ID": [f"BILL{start + index:08d}" for index in range(rows)],
+        "Resident Name": name,
+        "Amount": amount,
+        "Status": status,
+        "Date": np.datetime_as_string(START_DATE + day, unit="D"),
+        "Comments": comment,
+    })
+
+
+def write_bills_csv(path: str, rows: int, **params) -> str:
+    """Write a synthetic export of rows bills to path, GENERATOR_CHUNK_ROWS at a time."""
+    with open(path, "w", newline="") as output_file:
+        for start in range(0, max(rows, 1), GENERATOR_CHUNK_ROWS):
+            block = generate_bills(min(GENERATOR_CHUNK_ROWS, rows - start), start=start, **params)
+            block.to_csv(output_file, header=start == 0, index=False)
+    return path
+
+
+def measure(function, min_seconds: float = 0.2, repeat: int = 3) -> dict:
+    """Best-of-``repeat`` seconds per call like timeit, then the traced peak memory of one more call."""
+    timer = timeit.Timer(function)
+    loops, elapsed = timer.autorange()
+    if elapsed < min_seconds:
+        loops = max(1, int(loops * min_seconds / max(elapsed, 1e-9)))
+    best = min(timer.repeat(repeat=repeat, number=loops)) / loops
+
+    tracemalloc.start()
+    try:
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"seconds_per_op": best, "loops": loops, "peak_bytes": peak}
+
+
+def run_benchmarks(row_sizes: list, data_dir: str, generator: dict, log=print) -> dict:
+    import billingagent
+    from bill_cache import BillCache
+    from simple_test import simple_duplicate_check
+
+    # Every call parses the CSV, except in the run_analysis/cached benchmarks
+    billingagent.cache_enabled = False
+    billingagent._bill_cache = BillCache(os.path.join(data_dir, "cache"), schema=billingagent.SCHEMA_VERSION)
+
+    tool = billingagent.DuplicateCheckerTool()
+    results = {}
+
+    def record(name, measurement):
+        results[name] = measurement
+        log(f"{name:<45} {measurement['seconds_per_op'] * 1000:12.4f} ms/op"
+            f" {measurement['peak_bytes'] / 2 ** 20:10.1f} MiB peak")
+
+    def quietly(function, *args, **kwargs):
+        # simple_duplicate_check prints every group; that output is part of its cost but not of the report
+        with contextlib.redirect_stdout(io.StringIO()):
+            return function(*args, **kwargs)
+
+    def cached(path):
+        billingagent.cache_enabled = True
+        try:
+            return billingagent.run_analysis(path)
+        finally:
+            billingagent.cache_enabled = False
+
+    for rows in row_sizes:
+        path = os.path.join(data_dir, f"bills_{rows}.csv")
+        started = time.perf_counter()
+        write_bills_csv(path, rows, **generator)
+        log(f"generated {rows} bills in {time.perf_counter() - started:.2f}s ({os.path.getsize(path) / 2 ** 20:.1f} MiB)")
+        # Large exports are slow enough that one timed call per repeat is plenty
+        repeat = 3 if rows <= 100000 else 1
+
+        record(f"duplicate_checker/rows={rows}", measure(lambda: tool._run(path), repeat=repeat))
+        record(f"run_analysis/rows={rows}", measure(lambda: billingagent.run_analysis(path), repeat=repeat))
+        record(f"run_analysis/chunked/rows={rows}",
+               measure(lambda: billingagent.run_analysis(path, chunksize=CHUNKSIZE), repeat=repeat))
+        cached(path)
+        record(f"run_analysis/cached/rows={rows}", measure(lambda: cached(path), repeat=repeat))
+        if rows <= NEAR_MAX_ROWS:
+            record(f"simple_duplicate_check/rows={rows}",
+                   measure(lambda: quietly(simple_duplicate_check, path), repeat=repeat))
+            record(f"near_duplicates/rows={rows}",
+                   measure(lambda: billingagent.run_near_duplicate_analysis(path), repeat=repeat))
+        os.remove(path)
+
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float, memory_threshold: float = None) -> list:
+    """
+    Return (name, metric, baseline, current) for every benchmark whose
+    seconds_per_op exceeds baseline * (1 + threshold), or whose peak_bytes
+    exceeds baseline * (1 + memory_threshold) when that is given.
+    """
+    regressions = []
+    for name, measurement in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        limits = [("seconds_per_op", threshold)]
+        if memory_threshold is not None and "peak_bytes" in previous:
+            limits.append(("peak_bytes", memory_threshold))
+        for metric, limit in limits:
+            if measurement[metric] > previous[metric] * (1 + limit):
+                regressions.append((name, metric, previous[metric], measurement[metric]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark billing duplicate detection")
+    parser.add_argument("--quick", action="store_true", help="Run only small exports")
+    parser.add_argument("--rows", type=int, nargs="+", metavar="N",
+                        help=f"Export sizes to benchmark (default {' '.join(map(str, ROW_SIZES))})")
+    parser.add_argument("--duplicate-fraction", type=float, default=0.1,
+                        help="Share of bills that copy another bill (default 0.1)")
+    parser.add_argument("--near-noise", type=float, default=0.05,
+                        help="Share of copies changed just enough to be near duplicates only (default 0.05)")
+    parser.add_argument("--residents", type=int, default=1000, help="Distinct resident names (default 1000)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the bill generator (default 0)")
+    parser.add_argument("--data-dir", help="Where to write the generated exports (default: a temporary directory)")
+    parser.add_argument("--output", default="benchmark_billing.json", help="Where to write the results JSON")
+    parser.add_argument("--baseline", help="Earlier results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Allowed slowdown before a benchmark counts as a regression (default 0.2 = 20%%)")
+    parser.add_argument("--memory-threshold", type=float, default=0.2,
+                        help="Allowed peak memory growth before a benchmark counts as a regression (default 0.2)")
+    args = parser.parse_args()
+
+    row_sizes = args.rows or (QUICK_ROW_SIZES if args.quick else ROW_SIZES)
+    generator = {
+        "seed": args.seed,
+        "duplicate_fraction": args.duplicate_fraction,
+        "near_noise": args.near_noise,
+        "residents": args.residents,
+    }
+    with tempfile.TemporaryDirectory() as temporary_dir:
+        data_dir = args.data_dir or temporary_dir
+        os.makedirs(data_dir, exist_ok=True)
+        results = run_benchmarks(row_sizes, data_dir, generator)
+
+    report = {
+        "suite": "billing_analysis",
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "pandas": pd.__version__,
+        "generator": generator,
+        "thresholds": {"seconds_per_op": args.threshold, "peak_bytes": args.memory_threshold},
+        "results": results,
+    }
+    with open(args.output, "w") as output_file:
+        json.dump(report, output_file, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)["results"]
+        regressions = compare(results, baseline, args.threshold, args.memory_threshold)
+        for name, metric, previous, current in regressions:
+            if metric == "peak_bytes":
+                print(f"REGRESSION {name}: {previous / 2 ** 20:.1f} MiB -> {current / 2 ** 20:.1f} MiB peak")
+            else:
+                print(f"REGRESSION {name}: {previous * 1000:.4f} ms -> {current * 1000:.4f} ms")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} time or {args.memory_threshold:.0%} memory"
+              f" against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Columnar on-disk cache of parsed bill exports
+"""
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:
+    pa = None
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "bills")
+MANIFEST_NAME = "manifest.json"
+
+
+def file_key(file_path: str, content_hash: bool = False) -> dict:
+    """Identity of a source file: path and size plus mtime, or a SHA-256 of its bytes."""
+    stat = os.stat(file_path)
+    key = {"path": os.path.abspath(file_path), "size": stat.st_size}
+    if content_hash:
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as source:
+            for block in iter(lambda: source.read(1 << 20), b""):
+                digest.update(block)
+        key["sha256"] = digest.hexdigest()
+    else:
+        key["mtime_ns"] = stat.st_mtime_ns
+    return key
+
+
+class BillCache:
+    """Sidecar cache that replaces CSV parsing with a memory-mapped columnar read.
+
+    Each source file gets its own directory under ``cache_dir`` holding the
+    parsed frame and a manifest with the file key it was built from. A
+    source whose size, mtime (or content hash) no longer matches is parsed
+    again and the entry rewritten, so stale data is never served.
+
+    With pyarrow the frame is stored as one uncompressed Arrow IPC file;
+    without it, as one ``.npy`` file per column, with text columns stored as
+    integer codes plus their distinct values. Both are read memory-mapped.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, content_hash: bool = False, backend: str = None,
+                 schema: str = None):
+        self.cache_dir = cache_dir
+        self.content_hash = content_hash
+        self.schema = schema
+        self.backend = backend or ("arrow" if pa is not None else "npy")
+        self.hits = 0
+        self.misses = 0
+
+    def entry_dir(self, file_path: str) -> str:
+        name = hashlib.sha256(os.path.abspath(file_path).encode("utf-8")).hexdigest()[:24]
+        return os.path.join(self.cache_dir, name)
+
+    def load(self, file_path: str, parse) -> pd.DataFrame:
+        """Return the cached frame for file_path, or parse(file_path) and cache it."""
+        key = file_key(file_path, self.content_hash)
+        entry_dir = self.entry_dir(file_path)
+        manifest = self._read_manifest(entry_dir)
+        if (manifest is not None and manifest["key"] == key and manifest["backend"] == self.backend
+                and manifest.get("schema") == self.schema):
+            try:
+                df = self._read(entry_dir, manifest)
+                self.hits += 1
+                return df
+            except (OSError, ValueError, KeyError):
+                pass
+
+        self.misses += 1
+        df = parse(file_path)
+        try:
+            self._write(entry_dir, key, df)
+        except (OSError, ValueError, TypeError):
+            # A frame the backend cannot store exactly is simply not cached
+            shutil.rmtree(entry_dir, ignore_errors=True)
+        return df
+
+    def clear(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    @staticmethod
+    def _read_manifest(entry_dir: str):
+        try:
+            with open(os.path.join(entry_dir, MANIFEST_NAME)) as manifest_file:
+                return json.load(manifest_file)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, entry_dir: str, key: dict, df: pd.DataFrame):
+        # Build the entry beside the old one and swap it in, so readers never see half of it
+        staging_dir = f"{entry_dir}.{os.getpid()}.tmp"
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        os.makedirs(staging_dir)
+        manifest = {"key": key, "backend": self.backend, "schema": self.schema,
+                    "columns": [str(col) for col in df.columns]}
+        if self.backend == "arrow":
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            with pa.OSFile(os.path.join(staging_dir, "bills.arrow"), "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+        else:
+            manifest["dtypes"] = [self._write_column(staging_dir, index, df.iloc[:, index])
+                                  for index in range(df.shape[1])]
+        with open(os.path.join(staging_dir, MANIFEST_NAME), "w") as manifest_file:
+            json.dump(manifest, manifest_file)
+
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        os.replace(staging_dir, entry_dir)
+
+    def _read(self, entry_dir: str, manifest: dict) -> pd.DataFrame:
+        if manifest["backend"] == "arrow":
+            with pa.memory_map(os.path.join(entry_dir, "bills.arrow"), "r") as source:
+                return pa.ipc.open_file(source).read_all().to_pandas()
+        columns = {
+            name: self._read_column(entry_dir, index, dtype)
+            for index, (name, dtype) in enumerate(zip(manifest["columns"], manifest["dtypes"]))
+        }
+        return pd.DataFrame(columns)
+
+    @staticmethod
+    def _write_column(staging_dir: str, index: int, column: pd.Series) -> str:
+        dtype = str(column.dtype)
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            np.save(os.path.join(staging_dir, f"{index}.codes.npy"), column.cat.codes.to_numpy().astype(np.int32))
+            np.save(os.path.join(staging_dir, f"{index}.values.npy"), np.asarray(column.cat.categories, dtype=str))
+            return dtype
+        if (pd.api.types.is_numeric_dtype(column.dtype) or pd.api.types.is_bool_dtype(column.dtype)
+                or pd.api.types.is_datetime64_dtype(column.dtype)):
+            np.save(os.path.join(staging_dir, f"{index}.npy"), column.to_numpy())
+            return dtype
+        if pd.api.types.infer_dtype(column, skipna=True) not in ("string", "empty"):
+            raise TypeError(f"Column {column.name!r} mixes text with other values")
+        codes, uniques = pd.factorize(column)
+        np.save(os.path.join(staging_dir, f"{index}.codes.npy"), codes.astype(np.int32))
+        np.save(os.path.join(staging_dir, f"{index}.values.npy"), np.asarray(uniques, dtype=str))
+        return dtype
+
+    @staticmethod
+    def _read_column(entry_dir: str, index: int, dtype: str) -> pd.Series:
+        path = os.path.join(entry_dir, f"{index}.npy")
+        if os.path.exists(path):
+            return pd.Series(np.load(path, mmap_mode="r"), dtype=dtype)
+        codes = np.load(os.path.join(entry_dir, f"{index}.codes.npy"), mmap_mode="r")
+        values = np.load(os.path.join(entry_dir, f"{index}.values.npy"), mmap_mode="r")
+        if dtype == "category":
+            return pd.Series(pd.Categorical.from_codes(codes, categories=pd.Index(values.astype(object))))
+        # Code -1 marks a missing value and picks the NaN appended after the values
+        lookup = np.append(values.astype(object), np.nan)
+        return pd.Series(lookup[codes], dtype=dtype)
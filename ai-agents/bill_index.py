@@ -0,0 +1,164 @@
+"""
+Persistent fingerprint index for incremental duplicate detection
+"""
+import hashlib
+import json
+import os
+import sqlite3
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "bill_index.sqlite3")
+
+# Bytes before the ingested offset that must be unchanged for a file to be resumed there
+TAIL_BYTES = 4096
+
+
+def _tail_digest(file_path: str, offset: int) -> str:
+    with open(file_path, "rb") as source:
+        source.seek(max(0, offset - TAIL_BYTES))
+        return hashlib.sha256(source.read(min(offset, TAIL_BYTES))).hexdigest()
+
+
+def line_end_offset(file_path: str) -> int:
+    """Offset just past the last complete line, where the next read of an appended file starts."""
+    size = os.path.getsize(file_path)
+    with open(file_path, "rb") as source:
+        position = size
+        while position > 0:
+            start = max(0, position - (1 << 16))
+            source.seek(start)
+            newline = source.read(position - start).rfind(b"\n")
+            if newline >= 0:
+                return start + newline + 1
+            position = start
+    return 0
+
+
+class BillIndex:
+    """SQLite index of every bill seen so far and the duplicate groups they form.
+
+    Each bill is stored once, under its Bill ID, with the 64-bit fingerprint
+    of its normalized key and its original values. ``groups`` keeps the size
+    of every fingerprint group and ``meta`` the running totals, so a run
+    touches only the bills it adds and the groups they join. For each source
+    file the index also remembers how far it has been read; an appended file
+    is resumed from there, while a rewritten one is read again and only its
+    unseen Bill IDs are added.
+
+    Call ``add`` for each batch of new rows, then ``finish`` to commit them
+    and get the groups that were created or grew.
+    """
+
+    def __init__(self, path: str = DEFAULT_INDEX_PATH):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS bills ("
+            " seq INTEGER PRIMARY KEY,"
+            " bill_id UNIQUE NOT NULL,"
+            " fingerprint INTEGER NOT NULL,"
+            " resident_name, amount, status, date, comments);"
+            "CREATE INDEX IF NOT EXISTS bills_fingerprint ON bills (fingerprint);"
+            "CREATE TABLE IF NOT EXISTS groups ("
+            " fingerprint INTEGER PRIMARY KEY,"
+            " count INTEGER NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS sources ("
+            " path TEXT PRIMARY KEY,"
+            " offset INTEGER NOT NULL,"
+            " tail TEXT NOT NULL,"
+            " header TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS meta ("
+            " name TEXT PRIMARY KEY,"
+            " value INTEGER NOT NULL);"
+            "CREATE TEMP TABLE IF NOT EXISTS touched ("
+            " fingerprint INTEGER PRIMARY KEY,"
+            " added INTEGER NOT NULL);"
+        )
+        self.added = 0
+
+    def rebuild(self):
+        """Forget every bill and source so the next ingest starts from scratch."""
+        self._conn.executescript(
+            "DELETE FROM bills; DELETE FROM groups; DELETE FROM sources; DELETE FROM meta; DELETE FROM touched;"
+        )
+        self.added = 0
+
+    def totals(self):
+        """(bills indexed, bills in a duplicate group)"""
+        values = dict(self._conn.execute("SELECT name, value FROM meta"))
+        return values.get("total_records", 0), values.get("duplicate_records", 0)
+
+    def resume_point(self, file_path: str):
+        """(offset, header) to continue reading file_path from, or (0, None) to read it whole."""
+        row = self._conn.execute(
+            "SELECT offset, tail, header FROM sources WHERE path = ?", (os.path.abspath(file_path),)
+        ).fetchone()
+        if row is None or os.path.getsize(file_path) < row[0] or _tail_digest(file_path, row[0]) != row[1]:
+            return 0, None
+        return row[0], json.loads(row[2])
+
+    def mark_read(self, file_path: str, offset: int, header):
+        """Remember that file_path has been ingested up to offset (committed by finish)."""
+        self._conn.execute(
+            "INSERT OR REPLACE INTO sources (path, offset, tail, header) VALUES (?, ?, ?, ?)",
+            (os.path.abspath(file_path), offset, _tail_digest(file_path, offset), json.dumps(list(header)))
+        )
+
+    def add(self, rows) -> int:
+        """Index (bill_id, fingerprint, resident_name, amount, status, date, comments) rows.
+
+        Rows whose Bill ID is already indexed are skipped. Returns how many were added.
+        """
+        last_seq = self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM bills").fetchone()[0]
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO bills (bill_id, fingerprint, resident_name, amount, status, date, comments)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+        )
+        added = self._conn.execute("SELECT COUNT(*) FROM bills WHERE seq > ?", (last_seq,)).fetchone()[0]
+        if added:
+            for table, column in (("groups", "count"), ("touched", "added")):
+                self._conn.execute(
+                    f"INSERT INTO {table} (fingerprint, {column})"
+                    " SELECT fingerprint, COUNT(*) FROM bills WHERE seq > ? GROUP BY fingerprint"
+                    f" ON CONFLICT (fingerprint) DO UPDATE SET {column} = {column} + excluded.{column}",
+                    (last_seq,)
+                )
+        self.added += added
+        return added
+
+    def finish(self):
+        """Commit the batches added since the last finish.
+
+        Returns:
+            (groups, bills): {fingerprint: (count, previous_count)} for every
+            duplicate group that rows were added to, and the bills of those
+            groups as (fingerprint, bill_id, resident_name, amount, status,
+            date, comments) in the order they were indexed
+        """
+        groups = {}
+        total, duplicates = self.totals()
+        for fingerprint, count, added in self._conn.execute(
+            "SELECT fingerprint, count, added FROM touched JOIN groups USING (fingerprint)"
+        ):
+            previous = count - added
+            duplicates += (count if count > 1 else 0) - (previous if previous > 1 else 0)
+            if count > 1:
+                groups[fingerprint] = (count, previous)
+        bills = self._conn.execute(
+            "SELECT fingerprint, bill_id, resident_name, amount, status, date, comments FROM bills"
+            " WHERE fingerprint IN (SELECT fingerprint FROM touched JOIN groups USING (fingerprint) WHERE count > 1)"
+            " ORDER BY seq"
+        ).fetchall()
+
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)",
+            [("total_records", total + self.added), ("duplicate_records", duplicates)]
+        )
+        self._conn.execute("DELETE FROM touched")
+        self._conn.commit()
+        self.added = 0
+        return groups, bills
+
+    def close(self):
+        self._conn.close()
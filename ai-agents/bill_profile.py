@@ -0,0 +1,135 @@
+"""
+Opt-in stage timings and peak memory for one billing analysis
+"""
+import cProfile
+import time
+import tracemalloc
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    __slots__ = ("profile", "name", "started", "start_bytes", "peak_bytes")
+
+    def __init__(self, profile, name):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        self.profile._enter(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profile._exit(self)
+        return False
+
+
+class BillProfile:
+    """Wall time and traced peak memory per stage, plus row and group counts.
+
+    Nothing is recorded between runs: ``start`` enables recording (and
+    tracemalloc, and cProfile when given a dump path) and ``finish`` stops it
+    and returns the ``profile`` block. A stage's ``peak_bytes`` is the most
+    traced memory in use at any point while it ran, nested stages included;
+    ``allocated_bytes`` is what it left allocated. tracemalloc sees Python
+    and NumPy allocations but not Arrow buffers, and slows the run down, so
+    the timings are for comparing stages, not for absolute throughput.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.stages = {}
+        self.counts = {}
+        self._open = []
+        self._profiler = None
+        self._cprofile_path = None
+        self._started = 0.0
+        self._peak = 0
+        self._tracing = False
+
+    def start(self, cprofile_path: str = None):
+        self.enabled = True
+        self.stages = {}
+        self.counts = {}
+        self._open = []
+        self._cprofile_path = cprofile_path
+        self._peak = 0
+        # Leave tracing on at the end if someone else turned it on
+        self._tracing = tracemalloc.is_tracing()
+        if not self._tracing:
+            tracemalloc.start()
+        self._started = time.perf_counter()
+        if cprofile_path:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    def stage(self, name: str):
+        """Context manager recording one stage; a no-op when not started."""
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def count(self, name: str, value: int):
+        if self.enabled:
+            self.counts[name] = int(value)
+
+    def _enter(self, stage):
+        current, peak = tracemalloc.get_traced_memory()
+        # Resetting the peak for this stage must not lose the peak of the run or the stages around it
+        self._peak = max(self._peak, peak)
+        for outer in self._open:
+            outer.peak_bytes = max(outer.peak_bytes, peak)
+        tracemalloc.reset_peak()
+        stage.start_bytes = current
+        stage.peak_bytes = current
+        stage.started = time.perf_counter()
+        self._open.append(stage)
+
+    def _exit(self, stage):
+        seconds = time.perf_counter() - stage.started
+        current, peak = tracemalloc.get_traced_memory()
+        self._open.remove(stage)
+        stage.peak_bytes = max(stage.peak_bytes, peak)
+        for outer in self._open:
+            outer.peak_bytes = max(outer.peak_bytes, stage.peak_bytes)
+        # A stage entered more than once (one per chunk, say) adds up its time and keeps its highest peak
+        record = self.stages.setdefault(stage.name, {"seconds": 0.0, "calls": 0, "peak_bytes": 0, "allocated_bytes": 0})
+        record["seconds"] += seconds
+        record["calls"] += 1
+        record["peak_bytes"] = max(record["peak_bytes"], stage.peak_bytes)
+        record["allocated_bytes"] += current - stage.start_bytes
+
+    def finish(self) -> dict:
+        """Stop recording and return the profile block."""
+        if not self.enabled:
+            return None
+        seconds = time.perf_counter() - self._started
+        if self._profiler is not None:
+            self._profiler.disable()
+            self._profiler.dump_stats(self._cprofile_path)
+            self._profiler = None
+        peak = max([self._peak, tracemalloc.get_traced_memory()[1]] + [stage["peak_bytes"] for stage in self.stages.values()])
+        if not self._tracing:
+            tracemalloc.stop()
+        self.enabled = False
+
+        block = {
+            "total_seconds": round(seconds, 4),
+            "peak_bytes": peak,
+            "stages": {name: {**stage, "seconds": round(stage["seconds"], 4)} for name, stage in self.stages.items()},
+            "counts": self.counts
+        }
+        if self._cprofile_path:
+            block["cprofile"] = self._cprofile_path
+        return block
@@ -0,0 +1,131 @@
+"""
+Typed schema for bill export CSVs
+"""
+import io
+import json
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+BILL_COLUMNS = ['Bill ID', 'Resident Name', 'Amount', 'Status', 'Date', 'Comments']
+
+# Few distinct values repeated across many bills
+CATEGORY_COLUMNS = ['Resident Name', 'Status', 'Comments']
+
+# Amount is left to the parser: int64, or float64 when a value is missing or
+# fractional. Date is parsed as ISO dates; a column holding anything else
+# stays text.
+BILL_DTYPES = {'Bill ID': 'str', **{col: 'category' for col in CATEGORY_COLUMNS}}
+DATE_FORMAT = '%Y-%m-%d'
+
+# Chunked readers keep text as plain strings, since categories would differ
+# from one chunk to the next, and leave dates unparsed
+CHUNK_DTYPES = {col: 'str' for col in BILL_COLUMNS if col != 'Amount'}
+
+# Stored with cached frames so a schema change never serves old parses
+SCHEMA_VERSION = "1"
+
+
+def read_bills(source, **options) -> pd.DataFrame:
+    """Read a bill export with the schema's columns and dtypes"""
+    return pd.read_csv(source, usecols=BILL_COLUMNS, dtype=BILL_DTYPES,
+                       parse_dates=['Date'], date_format=DATE_FORMAT, **options)
+
+
+def read_bill_chunks(source, chunksize: int, **options):
+    """Iterate a bill export chunksize rows at a time with fixed dtypes, so every chunk normalizes and hashes alike"""
+    return pd.read_csv(source, usecols=BILL_COLUMNS, dtype=CHUNK_DTYPES, chunksize=chunksize, **options)
+
+
+def records_frame(records) -> pd.DataFrame:
+    """Bill dicts keyed by the export's column names as a chunk typed like read_bill_chunks"""
+    df = pd.DataFrame.from_records(records, columns=BILL_COLUMNS)
+    for col, dtype in CHUNK_DTYPES.items():
+        df[col] = df[col].astype(dtype)
+    try:
+        df['Amount'] = pd.to_numeric(df['Amount'])
+    except (TypeError, ValueError):
+        # An amount that is not a number leaves the column text, as the CSV parser does
+        df['Amount'] = df['Amount'].astype('str')
+    return df
+
+
+def read_bill_records(lines, chunksize: int, loads=json.loads):
+    """Iterate NDJSON bills (one object per line, missing keys as empty cells) chunksize bills at a time"""
+    records = []
+    for line in lines:
+        if line.strip():
+            records.append(loads(line))
+        if len(records) == chunksize:
+            yield records_frame(records)
+            records = []
+    if records:
+        yield records_frame(records)
+
+
+def parses_as_dates(column: pd.Series) -> bool:
+    """Whether read_bills would parse these Date cells as dates: every value present matches DATE_FORMAT"""
+    present = column[column.notna()]
+    return bool(pd.to_datetime(present, format=DATE_FORMAT, errors='coerce').notna().all())
+
+
+def parse_dates(column: pd.Series) -> pd.Series:
+    """Date text as the datetimes read_bills gives a column that parses_as_dates"""
+    return pd.to_datetime(column, format=DATE_FORMAT)
+
+
+def empty_column_dtypes() -> dict:
+    """The dtype read_bills gives each column when it holds no values at all"""
+    empty_row = "," * (len(BILL_COLUMNS) - 1)
+    df = read_bills(io.StringIO(",".join(BILL_COLUMNS) + "\n" + empty_row + "\n"))
+    return {col: df[col].dtype for col in BILL_COLUMNS}
+
+
+def cell_text(value) -> str:
+    """A cell as report text: "" when missing, dates without a midnight time"""
+    if pd.isna(value):
+        return ""
+    if isinstance(value, pd.Timestamp) and value == value.normalize():
+        return value.strftime(DATE_FORMAT)
+    return str(value)
+
+
+def normalize_text_column(column: pd.Series) -> pd.Series:
+    """Strip and lowercase text; categories are normalized once each, not once per row"""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        normalized = column.cat.categories.astype(str).str.strip().str.lower()
+        # Sorted categories keep groupby(sort=True) in the order plain text would sort
+        categories, category_codes = np.unique(np.asarray(normalized, dtype=object), return_inverse=True)
+        # Code -1 (missing) picks the -1 appended after the mapped codes
+        codes = np.append(category_codes, -1)[column.cat.codes.to_numpy()]
+        return pd.Series(pd.Categorical.from_codes(codes, categories), index=column.index, name=column.name)
+    # Text is 'object' before pandas 3 and 'str' from pandas 3 on
+    if pd.api.types.is_string_dtype(column.dtype):
+        return column.str.strip().str.lower()
+    return column
+
+
+def memory_report(csv_file_path: str) -> dict:
+    """Memory and load time of the default pd.read_csv against the typed schema load"""
+    report = {"csv_file": csv_file_path}
+    for name, load in (("default", pd.read_csv), ("typed", read_bills)):
+        start = time.perf_counter()
+        df = load(csv_file_path)
+        seconds = time.perf_counter() - start
+        usage = df.memory_usage(deep=True, index=False)
+        report[name] = {
+            "seconds": round(seconds, 4),
+            "bytes": int(usage.sum()),
+            "columns": {str(col): {"dtype": str(df[col].dtype), "bytes": int(usage[col])} for col in df.columns}
+        }
+    report["reduction"] = round(report["default"]["bytes"] / max(report["typed"]["bytes"], 1), 2)
+    return report
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python bill_schema.py <csv_file_path>")
+        sys.exit(1)
+    print(json.dumps(memory_report(sys.argv[1]), indent=2))
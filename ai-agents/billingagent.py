@@ -1,107 +1,1063 @@
-from crewai.tools import BaseTool
+import numpy as np
 import pandas as pd
 import os
 import sys
-import json
+import json_codec
 from dotenv import load_dotenv
+from bill_schema import (DATE_FORMAT, SCHEMA_VERSION, cell_text, empty_column_dtypes, normalize_text_column,
+                         parse_dates, parses_as_dates, read_bill_chunks, read_bill_records, read_bills)
+from bill_index import BillIndex, DEFAULT_INDEX_PATH, line_end_offset
+from bill_profile import BillProfile
+from near_duplicates import DEFAULT_DATE_WINDOW, DEFAULT_THRESHOLD, find_near_duplicates
 load_dotenv()
 
-from crewai import LLM
+# ---------------------------
+# Profiling
+# ---------------------------
+# Opt-in: run_analysis(profile=True) (or --profile) records each stage's wall
+# time and peak traced memory and adds them to the result as "profile".
+analysis_profile = BillProfile()
 
-# Get API key from environment variable
-api_key = os.getenv('GOOGLE_API_KEY')
-if not api_key:
-    print("Warning: GOOGLE_API_KEY not found in environment variables")
-    api_key = "your-gemini-api-key-here"
+# Columns that identify a bill; rows matching on all of them are duplicates
+DUPLICATE_COLUMNS = ['Resident Name', 'Amount', 'Status', 'Date', 'Comments']
 
-llm = LLM(
-    model="gemini/gemini-2.0-flash",
-    temperature=0.1,
-    api_key=api_key
-)
+# raw_output lists at most this many duplicate rows (to_string max_rows),
+# showing the first and last REPORT_EDGE_ROWS when there are more
+REPORT_MAX_ROWS = 100
+REPORT_EDGE_ROWS = REPORT_MAX_ROWS // 2
 
-class DuplicateCheckerTool(BaseTool):
+# duplicate_details reads the first bill of this many groups at a time
+DETAIL_BATCH_GROUPS = 10000
+
+# ---------------------------
+# Bill Loading
+# ---------------------------
+# Parsed exports are kept in a columnar sidecar cache keyed by path, size and
+# mtime, and read back memory-mapped. Set BILL_CACHE=off (or pass --no-cache)
+# to always parse the CSV, and BILL_CACHE_KEY=hash to key on file contents.
+cache_enabled = os.getenv('BILL_CACHE', 'on').lower() not in ('0', 'off', 'false', 'no')
+_bill_cache = None
+
+def get_bill_cache():
+    """Return the shared bill cache, opening it on first call"""
+    global _bill_cache
+    if _bill_cache is None:
+        from bill_cache import BillCache, DEFAULT_CACHE_DIR
+        _bill_cache = BillCache(
+            os.getenv('BILL_CACHE_DIR', DEFAULT_CACHE_DIR),
+            content_hash=os.getenv('BILL_CACHE_KEY', 'mtime').lower() == 'hash',
+            schema=SCHEMA_VERSION
+        )
+    return _bill_cache
+
+def read_bills_csv(file_path):
+    """Parse a bill export CSV into a DataFrame typed by bill_schema"""
+    return read_bills(file_path)
+
+def load_bills(file_path):
+    """Read a bill export into a DataFrame, through the sidecar cache when enabled"""
+    if cache_enabled:
+        return get_bill_cache().load(file_path, read_bills_csv)
+    return read_bills_csv(file_path)
+
+# ---------------------------
+# Duplicate Detection
+# ---------------------------
+
+def normalize_bills(df):
+    """Return the duplicate key columns with text stripped and lowercased"""
+    key = df[DUPLICATE_COLUMNS].copy()
+    for col in DUPLICATE_COLUMNS:
+        key[col] = normalize_text_column(key[col])
+    return key
+
+def find_duplicate_groups(df, key=None):
+    """
+    Fingerprint every row once by its normalized key (normalize_bills(df) unless given).
+
+    Returns:
+        (group_ids, duplicate_mask): a group number per row, equal for rows
+        with the same normalized key, and which rows share their group
+    """
+    if key is None:
+        with analysis_profile.stage("normalize"):
+            key = normalize_bills(df)
+    with analysis_profile.stage("group"):
+        group_ids = key.groupby(DUPLICATE_COLUMNS, dropna=False, sort=True, observed=True).ngroup().to_numpy()
+        duplicate_mask = np.bincount(group_ids)[group_ids] > 1
+    return group_ids, duplicate_mask
+
+def _text(value):
+    return cell_text(value)
+
+def _amount(value):
+    return None if pd.isna(value) else int(value)
+
+def duplicate_report(df, duplicate_mask):
+    """Plain-text duplicate listing shown as raw_output"""
+    duplicate_rows = df[duplicate_mask]
+
+    if duplicate_rows.empty:
+        return "No duplicate entries found based on Resident Name, Amount, Status, Date, and Comments."
+
+    result = f"Duplicate entries found ({len(duplicate_rows)} rows):\n\n"
+
+    # Get all duplicates, not just for a specific resident
+    result += duplicate_rows.to_string(index=False, max_rows=REPORT_MAX_ROWS)
+    return result
+
+def duplicate_group_table(group_ids, duplicate_mask):
+    """
+    Every duplicate group at once, without iterating a groupby.
+
+    Returns:
+        (positions, starts, counts): the duplicate rows ordered by group id
+        (file order within a group), and the offset in positions and the size
+        of each group, in group id order
+    """
+    positions = np.flatnonzero(duplicate_mask)
+    positions = positions[np.argsort(group_ids[positions], kind='stable')]
+    _, starts, counts = np.unique(group_ids[positions], return_index=True, return_counts=True)
+    return positions, starts, counts
+
+def page_order(counts, sort='key', offset=0, limit=None):
+    """Indexes of the groups on one page, by normalized key (the default) or largest group first"""
+    if sort == 'size':
+        order = np.argsort(-np.asarray(counts, dtype=np.int64), kind='stable')
+    elif sort == 'key':
+        order = np.arange(len(counts))
+    else:
+        raise ValueError(f"Unknown sort: {sort}")
+    return order[offset:None if limit is None else offset + limit]
+
+def iter_duplicate_details(df, group_ids, duplicate_mask, sort='key', offset=0, limit=None):
+    """One entry per duplicate group on the page, showing the first bill's values, built lazily"""
+    positions, starts, counts = duplicate_group_table(group_ids, duplicate_mask)
+    order = page_order(counts, sort, offset, limit)
+    bill_ids = df['Bill ID'].to_numpy()
+    for batch_start in range(0, len(order), DETAIL_BATCH_GROUPS):
+        groups = order[batch_start:batch_start + DETAIL_BATCH_GROUPS]
+        first = df.iloc[positions[starts[groups]]]
+        columns = [first[col].tolist() for col in DUPLICATE_COLUMNS]
+        for group, name, amount, status, date, comments in zip(groups.tolist(), *columns):
+            start = starts[group]
+            yield {
+                "resident_name": _text(name),
+                "amount": _amount(amount),
+                "status": _text(status),
+                "date": _text(date),
+                "comments": _text(comments),
+                "bill_ids": bill_ids[positions[start:start + counts[group]]].tolist(),
+                "count": int(counts[group])
+            }
+
+def duplicate_details(df, group_ids, duplicate_mask, sort='key', offset=0, limit=None):
+    """duplicate_details of the page as a list (see iter_duplicate_details)"""
+    return list(iter_duplicate_details(df, group_ids, duplicate_mask, sort, offset, limit))
+
+def detail_amount_totals(details):
+    """(duplicate_amount, potential_savings) over duplicate_details groups; a missing amount counts as 0"""
+    duplicate_amount = sum((group["amount"] or 0) * group["count"] for group in details)
+    potential_savings = sum((group["amount"] or 0) * (group["count"] - 1) for group in details)
+    return duplicate_amount, potential_savings
+
+def paginate_details(details, sort='key', offset=0, limit=None):
+    """The page of an already built duplicate_details list"""
+    return [details[index] for index in page_order([group["count"] for group in details], sort, offset, limit)]
+
+# ---------------------------
+# Chunked Duplicate Detection
+# ---------------------------
+def bill_fingerprints(key):
+    """64-bit hash of every normalized key row"""
+    return pd.util.hash_pandas_object(key, index=False).to_numpy()
+
+def _read_bill_chunks(csv_file_path, chunksize):
+    return _timed_chunks(read_bill_chunks(csv_file_path, chunksize))
+
+def _timed_chunks(chunks):
+    """Yield chunks, profiling the time spent reading each one as the "read" stage"""
+    chunks = iter(chunks)
+    while True:
+        with analysis_profile.stage("read"):
+            chunk = next(chunks, None)
+        if chunk is None:
+            return
+        yield chunk
+
+def _chunk_key(chunk):
+    key = normalize_bills(chunk)
+    key['Amount'] = pd.to_numeric(key['Amount'], errors='coerce').astype('float64')
+    return key
+
+def _sorted_group_details(first_rows, bill_ids, extra=None):
+    """
+    duplicate_details from each group's first bill (with a _fingerprint
+    column) and its bill IDs, plus extra[fingerprint] fields when given
+    """
+    # Keep the group order of analyze_bills: sorted by normalized key, missing values last
+    order = _chunk_key(first_rows).sort_values(DUPLICATE_COLUMNS, na_position='last', kind='stable').index
+    rows = first_rows.loc[order]
+    details = []
+    for resident_name, amount, status, date, comments, fingerprint in zip(
+            *(rows[col].tolist() for col in ['Resident Name', 'Amount', 'Status', 'Date', 'Comments', '_fingerprint'])):
+        group = bill_ids[fingerprint]
+        details.append({
+            "resident_name": _text(resident_name),
+            "amount": _amount(amount),
+            "status": _text(status),
+            "date": _text(date),
+            "comments": _text(comments),
+            "bill_ids": group,
+            "count": len(group)
+        })
+        if extra is not None:
+            details[-1].update(extra[fingerprint])
+    return details
+
+def analyze_bills_chunked(csv_file_path, chunksize):
+    """
+    Duplicate analysis that never holds the whole file in memory.
+
+    The first pass keeps one 64-bit fingerprint per row. The second pass
+    re-reads the file and keeps only duplicate rows: their bill IDs, the
+    first bill of each group and the rows raw_output can display. The
+    result matches analyze_bills on the same file; amounts are compared as
+    numbers, so an unparsable amount counts as missing.
+    """
+    fingerprints = []
+    filled_columns = set()  # text columns with a value somewhere in the file
+    dated = True  # whether analyze_bills would have parsed the Date column
+    for chunk in _read_bill_chunks(csv_file_path, chunksize):
+        with analysis_profile.stage("fingerprint"):
+            fingerprints.append(bill_fingerprints(_chunk_key(chunk)))
+        filled_columns.update(chunk.columns[chunk.notna().any()])
+        dated = dated and parses_as_dates(chunk['Date'])
+    fingerprints = np.concatenate(fingerprints) if fingerprints else np.empty(0, dtype=np.uint64)
+    total = len(fingerprints)
+    results = analyze_bills(pd.DataFrame(columns=DUPLICATE_COLUMNS), csv_file_path)
+    results["total_records"] = total
+    if total == 0:
+        return results
+
+    unique, counts = np.unique(fingerprints, return_counts=True)
+    duplicate_fingerprints = unique[counts > 1]
+    duplicate_count = int(counts[counts > 1].sum())
+    del unique, counts
+    results["duplicate_records"] = duplicate_count
+    results["duplicate_percentage"] = round((duplicate_count / total) * 100, 2)
+    if duplicate_count == 0:
+        results["raw_output"] = duplicate_report(pd.DataFrame(columns=DUPLICATE_COLUMNS), np.zeros(0, dtype=bool))
+        return results
+
+    bill_ids = {}  # fingerprint -> bill IDs in file order
+    first_rows = []  # first bill of each group
+    report_head = []  # up to the first REPORT_MAX_ROWS duplicate rows
+    report_tail = None  # the last REPORT_EDGE_ROWS duplicate rows
+    head_size = 0
+    float_amounts = False
+    offset = 0
+    for chunk in _read_bill_chunks(csv_file_path, chunksize):
+        chunk_fingerprints = fingerprints[offset:offset + len(chunk)]
+        offset += len(chunk)
+        # A missing amount anywhere turns the whole column to floats in analyze_bills
+        float_amounts = float_amounts or pd.api.types.is_float_dtype(chunk['Amount'].dtype)
+        mask = np.isin(chunk_fingerprints, duplicate_fingerprints)
+        if not mask.any():
+            continue
+        rows = chunk[mask]
+        row_fingerprints = chunk_fingerprints[mask]
+
+        new_positions = []
+        for position, (fingerprint, bill_id) in enumerate(zip(row_fingerprints.tolist(), rows['Bill ID'].tolist())):
+            group = bill_ids.get(fingerprint)
+            if group is None:
+                bill_ids[fingerprint] = [bill_id]
+                new_positions.append(position)
+            else:
+                group.append(bill_id)
+        if new_positions:
+            first_rows.append(rows.iloc[new_positions].assign(_fingerprint=row_fingerprints[new_positions]))
+
+        if head_size < REPORT_MAX_ROWS:
+            report_head.append(rows.iloc[:REPORT_MAX_ROWS - head_size])
+            head_size += len(report_head[-1])
+        report_tail = rows if report_tail is None else pd.concat([report_tail, rows])
+        report_tail = report_tail.iloc[-REPORT_EDGE_ROWS:]
+
+    with analysis_profile.stage("details"):
+        results["duplicate_details"] = _sorted_group_details(
+            _loaded_dates(pd.concat(first_rows, ignore_index=True), dated), bill_ids)
+    results["duplicate_groups"] = len(results["duplicate_details"])
+    results["duplicate_amount"], results["potential_savings"] = detail_amount_totals(results["duplicate_details"])
+
+    # One hidden row between the head and the tail makes to_string elide the
+    # middle exactly as it does for the full duplicate listing
+    report_rows = pd.concat(report_head)
+    if duplicate_count > REPORT_MAX_ROWS:
+        report_rows = pd.concat([report_rows.iloc[:REPORT_EDGE_ROWS + 1], report_tail])
+    with analysis_profile.stage("report"):
+        results["raw_output"] = _chunked_report(report_rows, duplicate_count, float_amounts, filled_columns, dated)
+    return results
+
+def _loaded_dates(rows, dated):
+    """Chunk rows with their Date text parsed when the whole file's dates parse, as analyze_bills has them"""
+    return rows.assign(Date=parse_dates(rows['Date'])) if dated else rows
+
+def _chunked_report(report_rows, duplicate_count, float_amounts, filled_columns, dated):
+    """
+    raw_output of duplicate_count duplicates from the rows it displays
+    (all of them, or the head row and tail rows around the elision), typed
+    as analyze_bills would have them after loading the whole file
+    """
+    report_rows = _loaded_dates(report_rows, dated)
+    if float_amounts and pd.api.types.is_numeric_dtype(report_rows['Amount'].dtype):
+        report_rows = report_rows.astype({'Amount': 'float64'})
+    # A column empty in the whole file has no text in analyze_bills either, just missing values
+    empty_dtypes = empty_column_dtypes()
+    report_rows = report_rows.astype({col: empty_dtypes[col] for col in report_rows.columns if col not in filled_columns})
+    report = duplicate_report(report_rows, np.ones(len(report_rows), dtype=bool))
+    return report.replace(f"({len(report_rows)} rows)", f"({duplicate_count} rows)", 1)
+
+# ---------------------------
+# Streamed Input
+# ---------------------------
+# Bills can be piped in on stdin (path "-") as CSV or as NDJSON objects keyed
+# by the export's column names, e.g. straight from a database cursor. The
+# stream cannot be read twice, so it is analysed in one pass as chunks
+# arrive: the first bill of each distinct key is kept, and of later bills
+# only the bill IDs and the rows raw_output displays. Nothing is written to
+# disk and the raw input is never held whole.
+STDIN_PATH = "-"
+STREAM_CHUNK_ROWS = 10000
+
+def read_stream_chunks(source, input_format='csv', chunksize=STREAM_CHUNK_ROWS):
+    """Bill chunks from a CSV or NDJSON text stream, typed like read_bill_chunks"""
+    if input_format == 'ndjson':
+        return _timed_chunks(read_bill_records(source, chunksize, loads=json_codec.loads))
+    return _timed_chunks(read_bill_chunks(source, chunksize))
+
+def analyze_bill_stream(chunks, source_name):
+    """
+    Duplicate analysis of bill chunks read once, in order.
+
+    The result matches analyze_bills_chunked (and so analyze_bills) on a
+    file with the same rows; memory grows with the distinct bills, not with
+    the input.
+    """
+    first_positions = {}  # fingerprint -> position of its first bill
+    first_rows = []  # first bill of each distinct key, indexed by position
+    repeats = {}  # fingerprint -> [(position, bill ID)] of the bills after the first
+    report_head = []  # up to the first REPORT_MAX_ROWS repeated bills
+    report_tail = None  # the last REPORT_EDGE_ROWS repeated bills
+    head_size = 0
+    filled_columns = set()
+    float_amounts = False
+    dated = True
+    total = 0
+    for chunk in chunks:
+        chunk.index = pd.RangeIndex(total, total + len(chunk))
+        with analysis_profile.stage("fingerprint"):
+            fingerprints = bill_fingerprints(_chunk_key(chunk))
+        filled_columns.update(chunk.columns[chunk.notna().any()])
+        float_amounts = float_amounts or pd.api.types.is_float_dtype(chunk['Amount'].dtype)
+        dated = dated and parses_as_dates(chunk['Date'])
+
+        new_positions, repeat_positions = [], []
+        for position, (fingerprint, bill_id) in enumerate(zip(fingerprints.tolist(), chunk['Bill ID'].tolist())):
+            if fingerprint in first_positions:
+                repeats.setdefault(fingerprint, []).append((total + position, bill_id))
+                repeat_positions.append(position)
+            else:
+                first_positions[fingerprint] = total + position
+                new_positions.append(position)
+        first_rows.append(chunk.iloc[new_positions])
+        total += len(chunk)
+        if not repeat_positions:
+            continue
+
+        rows = chunk.iloc[repeat_positions]
+        if head_size < REPORT_MAX_ROWS:
+            report_head.append(rows.iloc[:REPORT_MAX_ROWS - head_size])
+            head_size += len(report_head[-1])
+        report_tail = rows if report_tail is None else pd.concat([report_tail, rows])
+        report_tail = report_tail.iloc[-REPORT_EDGE_ROWS:]
+
+    results = analyze_bills(pd.DataFrame(columns=DUPLICATE_COLUMNS), source_name)
+    results["total_records"] = total
+    if total == 0:
+        return results
+    duplicate_count = sum(len(group) + 1 for group in repeats.values())
+    results["duplicate_records"] = duplicate_count
+    results["duplicate_percentage"] = round((duplicate_count / total) * 100, 2)
+    if duplicate_count == 0:
+        results["raw_output"] = duplicate_report(pd.DataFrame(columns=DUPLICATE_COLUMNS), np.zeros(0, dtype=bool))
+        return results
+
+    first_rows = pd.concat(first_rows)
+    group_firsts = first_rows.loc[sorted(first_positions[fingerprint] for fingerprint in repeats)]
+    # Groups are keyed by their first bill's position, which stands in for the fingerprint
+    group_firsts = group_firsts.assign(_fingerprint=group_firsts.index)
+    bill_ids = {position: [bill_id] for position, bill_id in
+                zip(group_firsts.index.tolist(), group_firsts['Bill ID'].tolist())}
+    for fingerprint, group in repeats.items():
+        bill_ids[first_positions[fingerprint]].extend(bill_id for _, bill_id in group)
+    with analysis_profile.stage("details"):
+        results["duplicate_details"] = _sorted_group_details(_loaded_dates(group_firsts, dated), bill_ids)
+    results["duplicate_groups"] = len(results["duplicate_details"])
+    results["duplicate_amount"], results["potential_savings"] = detail_amount_totals(results["duplicate_details"])
+
+    positions = np.sort(np.concatenate([
+        group_firsts.index.to_numpy(),
+        np.fromiter((position for group in repeats.values() for position, _ in group), dtype=np.int64)
+    ]))
+    if duplicate_count > REPORT_MAX_ROWS:
+        positions = np.concatenate([positions[:REPORT_EDGE_ROWS + 1], positions[-REPORT_EDGE_ROWS:]])
+    shown = pd.concat([group_firsts.drop(columns='_fingerprint'), *report_head, report_tail])
+    report_rows = shown[~shown.index.duplicated()].loc[positions]
+    with analysis_profile.stage("report"):
+        results["raw_output"] = _chunked_report(report_rows, duplicate_count, float_amounts, filled_columns, dated)
+    return results
+
+# ---------------------------
+# Incremental Duplicate Detection
+# ---------------------------
+# A persistent fingerprint index (bill_index.py) remembers every bill already
+# seen, so a run only reads and hashes the bills added since the last one and
+# reports the duplicate groups they created or grew. Pass --rebuild (or
+# rebuild=True) to discard the index and ingest everything again.
+INDEX_CHUNK_ROWS = 100000
+
+def _unread_bill_chunks(csv_file_path, offset, header, chunksize):
+    """Chunks of the rows after byte offset, a line boundary recorded by an earlier run"""
+    if offset >= os.path.getsize(csv_file_path):
+        return
+    with open(csv_file_path, 'rb') as source:
+        source.seek(offset)
+        try:
+            yield from read_bill_chunks(source, chunksize, header=None, names=header)
+        except pd.errors.EmptyDataError:
+            return
+
+def _nullable(column):
+    return column.astype(object).where(column.notna(), None).tolist()
+
+def _index_rows(chunk):
+    """(bill_id, fingerprint, *DUPLICATE_COLUMNS) rows for BillIndex.add; bills without an ID are skipped"""
+    chunk = chunk[chunk['Bill ID'].notna()]
+    fingerprints = bill_fingerprints(_chunk_key(chunk)).view(np.int64).tolist()
+    return zip(chunk['Bill ID'].tolist(), fingerprints, *(_nullable(chunk[col]) for col in DUPLICATE_COLUMNS))
+
+def analyze_bills_incremental(csv_file_path, index, chunksize=INDEX_CHUNK_ROWS):
+    """
+    Add the unseen bills of a file to the index and report what changed.
+
+    An appended file is read from where the previous run stopped; any other
+    file is read whole, and bills whose Bill ID is already indexed are
+    skipped. Totals cover everything indexed; raw_output and
+    duplicate_details list only the duplicate groups this run created or
+    grew, each with its previous_count and change ("new" or "changed").
+    """
+    offset, header = index.resume_point(csv_file_path)
+    end = line_end_offset(csv_file_path)
+    if header is None:
+        header = list(pd.read_csv(csv_file_path, nrows=0).columns)
+        chunks = _read_bill_chunks(csv_file_path, chunksize)
+    else:
+        chunks = _unread_bill_chunks(csv_file_path, offset, header, chunksize)
+    for chunk in chunks:
+        index.add(_index_rows(chunk))
+    new_records = index.added
+    index.mark_read(csv_file_path, end, header)
+    groups, bills = index.finish()
+
+    total, duplicate_count = index.totals()
+    results = {
+        "analysis_type": "billing_duplicate_detection",
+        "mode": "incremental",
+        "csv_file": csv_file_path,
+        "total_records": total,
+        "new_records": new_records,
+        "duplicate_records": duplicate_count,
+        "duplicate_percentage": round((duplicate_count / total) * 100, 2) if total else 0.0,
+        "duplicate_groups": 0,
+        "duplicate_amount": 0,
+        "potential_savings": 0,
+        "raw_output": "No new or changed duplicate groups since the last run.",
+        "duplicate_details": []
+    }
+    if not groups:
+        return results
+
+    rows = pd.DataFrame.from_records(bills, columns=['_fingerprint', 'Bill ID'] + DUPLICATE_COLUMNS)
+    results["raw_output"] = duplicate_report(rows.drop(columns='_fingerprint'), np.ones(len(rows), dtype=bool))
+    bill_ids = rows.groupby('_fingerprint', sort=False)['Bill ID'].agg(list).to_dict()
+    first_rows = rows.drop_duplicates('_fingerprint').reset_index(drop=True)
+    changes = {
+        fingerprint: {"previous_count": previous, "change": "changed" if previous > 1 else "new"}
+        for fingerprint, (_, previous) in groups.items()
+    }
+    details = _sorted_group_details(first_rows, bill_ids, changes)
+    results["duplicate_details"] = details
+    results["duplicate_groups"] = len(details)
+    results["duplicate_amount"], results["potential_savings"] = detail_amount_totals(details)
+    return results
+
+# ---------------------------
+# Near-Duplicate Detection
+# ---------------------------
+# Exact matching misses bills entered twice with small differences ("Raj
+# Verma" vs "Raj  verma.", a date a day later, reworded comments). The
+# near-duplicate mode clusters such bills through blocking and vectorized
+# scoring (near_duplicates.py) instead of comparing every pair.
+
+def analyze_bills_near(df, csv_file_path, threshold=DEFAULT_THRESHOLD, date_window=DEFAULT_DATE_WINDOW):
+    """
+    Near-duplicate analysis of an already loaded bill frame.
+
+    duplicate_details has one entry per cluster in the usual shape plus its
+    similarity, the lowest pair score that joined the cluster.
+    """
+    results = analyze_bills(df.iloc[:0], csv_file_path)
+    results.update({
+        "mode": "near_duplicate",
+        "total_records": int(len(df)),
+        "similarity_threshold": threshold,
+        "date_window_days": date_window
+    })
+    if df.empty:
+        return results
+
+    cluster_ids, similarity = find_near_duplicates(df, threshold, date_window)
+    mask = cluster_ids >= 0
+    duplicate_count = int(mask.sum())
+    results["duplicate_records"] = duplicate_count
+    results["duplicate_percentage"] = round((duplicate_count / len(df)) * 100, 2)
+    if not duplicate_count:
+        results["raw_output"] = (f"No near-duplicate entries found (similarity threshold {threshold}, "
+                                 f"date window {date_window} days).")
+        return results
+
+    details = duplicate_details(df, cluster_ids, mask)
+    for group, cluster in zip(details, sorted(similarity)):
+        group["similarity"] = similarity[cluster]
+    results["duplicate_details"] = details
+    results["duplicate_groups"] = len(details)
+    results["duplicate_amount"], results["potential_savings"] = detail_amount_totals(details)
+
+    # List each cluster's bills together, numbered in duplicate_details order
+    order = np.flatnonzero(mask)[np.argsort(cluster_ids[mask], kind='stable')]
+    clusters = df.iloc[order].assign(Cluster=np.unique(cluster_ids[order], return_inverse=True)[1] + 1)
+    results["raw_output"] = (f"Near-duplicate entries found ({duplicate_count} rows in {len(details)} clusters):\n\n"
+                             + clusters.to_string(index=False, max_rows=REPORT_MAX_ROWS))
+    return results
+
+# ---------------------------
+# Multi-File Analysis
+# ---------------------------
+# Many exports (societies, months) are analysed in a process pool, one file
+# per task, and merged into one report. Bills whose normalized key appears in
+# more than one file (a bill re-issued in the next month's export) form the
+# cross-file groups. Each worker can be capped with an address-space limit.
+
+def available_cores():
+    """CPU cores this process may run on"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def _init_worker(memory_limit_mb, use_cache):
+    global cache_enabled
+    cache_enabled = use_cache
+    if memory_limit_mb:
+        import resource
+        limit = int(memory_limit_mb) * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+def portable_key(df):
+    """Normalized key that fingerprints alike whatever dtypes each file's columns were parsed with"""
+    key = df[DUPLICATE_COLUMNS].copy()
+    for col in DUPLICATE_COLUMNS:
+        if col != 'Amount' and not pd.api.types.is_string_dtype(key[col].dtype):
+            # Dates parsed by read_bills go back to the text they were read from, and a
+            # column empty in this file (parsed as NaN or NaT) becomes missing text
+            if pd.api.types.is_datetime64_dtype(key[col].dtype):
+                text = key[col].dt.strftime(DATE_FORMAT)
+            else:
+                text = key[col].astype(str)
+            key[col] = text.astype(object).where(key[col].notna(), None)
+    return _chunk_key(key)
+
+def _analyze_file(csv_file_path, chunksize, sort, offset, limit):
+    """Pool task: the file's own results (as run_analysis) and its distinct fingerprints"""
+    try:
+        if chunksize:
+            results = run_analysis(csv_file_path, chunksize, sort, offset, limit)
+            fingerprints = [bill_fingerprints(_chunk_key(chunk)) for chunk in _read_bill_chunks(csv_file_path, chunksize)]
+            fingerprints = np.concatenate(fingerprints) if fingerprints else np.empty(0, dtype=np.uint64)
+        else:
+            df = load_bills(csv_file_path)
+            results = analyze_bills(df, csv_file_path, sort, offset, limit)
+            fingerprints = bill_fingerprints(portable_key(df)) if len(df) else np.empty(0, dtype=np.uint64)
+        return results, np.unique(fingerprints)
+
+    except Exception as e:
+        return {
+            "error": str(e) or type(e).__name__,
+            "analysis_type": "billing_duplicate_detection",
+            "csv_file": csv_file_path
+        }, np.empty(0, dtype=np.uint64)
+
+def _cross_file_rows(csv_file_path, fingerprints, chunksize):
+    """Pool task: the file's bills whose fingerprint is in fingerprints, with a _fingerprint column"""
+    columns = ['Bill ID'] + DUPLICATE_COLUMNS
+    if chunksize:
+        chunks = (chunk[columns] for chunk in _read_bill_chunks(csv_file_path, chunksize))
+        key = _chunk_key
+    else:
+        chunks = [load_bills(csv_file_path)[columns]]
+        key = portable_key
+    rows = []
+    for chunk in chunks:
+        if len(chunk):
+            chunk_fingerprints = bill_fingerprints(key(chunk))
+            mask = np.isin(chunk_fingerprints, fingerprints)
+            rows.append(chunk[mask].assign(_fingerprint=chunk_fingerprints[mask]))
+    return pd.concat(rows, ignore_index=True) if rows else pd.DataFrame(columns=columns + ['_fingerprint'])
+
+def _run_tasks(pool, function, argument_lists):
+    """Results of function over argument_lists, in order, in the pool or in this process"""
+    if pool is None:
+        return [function(*arguments) for arguments in argument_lists]
+    futures = [pool.submit(function, *arguments) for arguments in argument_lists]
+    return [future.result() for future in futures]
+
+def analyze_bill_files(csv_file_paths, workers=None, memory_limit_mb=None, chunksize=None,
+                       sort='key', offset=0, limit=None):
+    """
+    Analyse several bill exports in parallel and merge the results.
+
+    Each file is analysed as run_analysis would (files holds those results,
+    paged by sort, offset and limit). cross_file_details lists the
+    duplicate groups spanning several files, in the usual shape plus the
+    bill IDs per file. The first pass returns only each file's distinct
+    fingerprints; files holding a cross-file key are then read again for
+    just those bills.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    workers = max(1, min(workers or available_cores(), len(csv_file_paths)))
+    pool = None
+    if workers > 1 or memory_limit_mb:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                   initargs=(memory_limit_mb, cache_enabled))
+    try:
+        analysed = _run_tasks(pool, _analyze_file, [
+            (path, chunksize, sort, offset, limit) for path in csv_file_paths
+        ])
+        file_results = [results for results, _ in analysed]
+        total = sum(results.get("total_records", 0) for results in file_results)
+        duplicate_count = sum(results.get("duplicate_records", 0) for results in file_results)
+        merged = {
+            "analysis_type": "billing_duplicate_detection",
+            "mode": "multi_file",
+            "csv_files": list(csv_file_paths),
+            "total_records": total,
+            "duplicate_records": duplicate_count,
+            "duplicate_percentage": round((duplicate_count / total) * 100, 2) if total else 0.0,
+            "files": file_results,
+            "cross_file_records": 0,
+            "cross_file_groups": 0,
+            "cross_file_details": []
+        }
+
+        # Keys found in at least two files; each file contributes its distinct keys once
+        distinct = [fingerprints for _, fingerprints in analysed]
+        unique, counts = np.unique(np.concatenate(distinct), return_counts=True)
+        shared = unique[counts > 1]
+        if len(shared) == 0:
+            return merged
+        holders = [index for index, fingerprints in enumerate(distinct) if np.isin(fingerprints, shared).any()]
+        found = _run_tasks(pool, _cross_file_rows, [
+            (csv_file_paths[index], shared, chunksize) for index in holders
+        ])
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    rows = pd.concat([rows.assign(_file=index) for index, rows in zip(holders, found)], ignore_index=True)
+    bill_ids = rows.groupby('_fingerprint', sort=False)['Bill ID'].agg(list).to_dict()
+    first_rows = rows.drop_duplicates('_fingerprint').reset_index(drop=True)
+    files_of = {fingerprint: {"files": []} for fingerprint in bill_ids}
+    per_file = rows.groupby(['_fingerprint', '_file'], sort=False)['Bill ID'].agg(list)
+    for (fingerprint, index), ids in per_file.items():
+        files_of[fingerprint]["files"].append({"csv_file": csv_file_paths[index], "bill_ids": ids})
+
+    details = _sorted_group_details(first_rows, bill_ids, files_of)
+    merged["cross_file_records"] = int(len(rows))
+    merged["cross_file_groups"] = len(details)
+    merged["cross_file_details"] = paginate_details(details, sort, offset, limit)
+    return merged
+
+class DuplicateCheckerTool:
     name: str = "Duplicate Checker Tool"
     description: str = (
         "Identifies rows in a CSV file where all fields except 'Bill ID' match, "
         "ignoring case and leading/trailing spaces."
     )
 
-    def _run(self, file_path: str) -> str:
+    def run(self, file_path: str, chunksize: int = None) -> str:
+        return self._run(file_path, chunksize)
+
+    def _run(self, file_path: str, chunksize: int = None) -> str:
         if not os.path.exists(file_path):
             return "Error: File not found."
 
         try:
-            df = pd.read_csv(file_path)
+            if chunksize:
+                return analyze_bills_chunked(file_path, chunksize)["raw_output"]
+
+            df = load_bills(file_path)
 
             if df.empty:
                 return "The CSV file is empty."
 
-            # Columns to compare for duplicates (excluding 'Bill ID')
-            columns_to_check = ['Resident Name', 'Amount', 'Status', 'Date', 'Comments']
+            _, duplicate_mask = find_duplicate_groups(df)
+            return duplicate_report(df, duplicate_mask)
 
-            # Clean string columns: strip and lowercase
-            df_clean = df.copy()
-            for col in columns_to_check:
-                if df_clean[col].dtype == 'object':
-                    df_clean[col] = df_clean[col].str.strip().str.lower()
+        except Exception as e:
+            return f"Error while processing file: {str(e)}"
 
-            # Identify duplicates based on the selected columns
-            duplicate_rows = df[df_clean.duplicated(subset=columns_to_check, keep=False)]
+def analyze_bills(df, csv_file_path, sort='key', offset=0, limit=None, stream=False, key=None):
+    """
+    Duplicate analysis of an already loaded bill frame.
 
-            if duplicate_rows.empty:
-                return "No duplicate entries found based on Resident Name, Amount, Status, Date, and Comments."
+    The counts, the text report and duplicate_details all come from the
+    same normalized grouping, so they always agree. duplicate_details holds
+    the page of groups picked by sort, offset and limit (duplicate_groups,
+    duplicate_amount and potential_savings cover them all); with stream=True it is a generator building the
+    entries as they are consumed.
+    """
+    results = {
+        "analysis_type": "billing_duplicate_detection",
+        "csv_file": csv_file_path,
+        "total_records": int(len(df)),
+        "duplicate_records": 0,
+        "duplicate_percentage": 0.0,
+        "duplicate_groups": 0,
+        "duplicate_amount": 0,
+        "potential_savings": 0,
+        "raw_output": "The CSV file is empty.",
+        "duplicate_details": []
+    }
+    if df.empty:
+        return results
 
-            result = f"Duplicate entries found ({len(duplicate_rows)} rows):\n\n"
-            
-            # Get all duplicates, not just for a specific resident
-            result += duplicate_rows.to_string(index=False, max_rows=100)
-            return result
+    group_ids, duplicate_mask = find_duplicate_groups(df, key)
+    duplicate_count = int(duplicate_mask.sum())
+    results["duplicate_records"] = duplicate_count
+    results["duplicate_percentage"] = round((duplicate_count / len(df)) * 100, 2)
+    with analysis_profile.stage("report"):
+        results["raw_output"] = duplicate_report(df, duplicate_mask)
+    if duplicate_count:
+        results["duplicate_groups"] = int((np.bincount(group_ids) > 1).sum())
+        # Totals over every group, as each entry's amount times its count would add up
+        amounts = np.trunc(pd.to_numeric(df['Amount'], errors='coerce').fillna(0).to_numpy(dtype='float64'))
+        repeated = pd.Series(group_ids).duplicated().to_numpy()
+        results["duplicate_amount"] = int(amounts[duplicate_mask].sum())
+        results["potential_savings"] = int(amounts[repeated].sum())
+        details = iter_duplicate_details(df, group_ids, duplicate_mask, sort, offset, limit)
+        if stream:
+            results["duplicate_details"] = details
+        else:
+            with analysis_profile.stage("details"):
+                results["duplicate_details"] = list(details)
+    return results
 
-        except Exception as e:
-            return f"Error while processing file: {str(e)}"
+# ---------------------------
+# Analysis Pipeline
+# ---------------------------
+# Analyzers are registered by name and all run over one loaded frame, whose
+# normalized key is computed once and shared. run_analysis(analyzers=[...])
+# (or --analyzers) picks them; the duplicate results stay at the top level
+# and every other analyzer's result goes under "analyses".
+DEFAULT_ANALYZERS = ['duplicates']
+DISPUTED_STATUS = 'disputed'
+UNPAID_STATUSES = ('unpaid', 'pending', 'overdue')
+
+# A bill is an amount anomaly when its z-score against the resident's other
+# bills (or all other bills, for residents with fewer than
+# ANOMALY_MIN_HISTORY) reaches ANOMALY_Z_THRESHOLD. The spread is floored at
+# ANOMALY_MIN_SPREAD of the mean, so residents who always pay the same
+# amount still have a finite score.
+ANOMALY_Z_THRESHOLD = 3.0
+ANOMALY_MIN_HISTORY = 4
+ANOMALY_MIN_SPREAD = 0.05
+
+ANALYZERS = {}
+
+def analyzer(name):
+    """Register function(frame, options) -> dict as the analyzer called name"""
+    def register(function):
+        ANALYZERS[name] = function
+        return function
+    return register
+
+class BillFrame:
+    """A loaded bill frame shared by the analyzers, with derived columns computed on first use"""
+
+    def __init__(self, df, csv_file_path):
+        self.df = df
+        self.csv_file_path = csv_file_path
+        self._key = None
+        self._amounts = None
+
+    @property
+    def key(self):
+        """Normalized duplicate key columns (see normalize_bills)"""
+        if self._key is None:
+            with analysis_profile.stage("normalize"):
+                self._key = normalize_bills(self.df)
+        return self._key
 
-def run_analysis(csv_file_path):
-    """Run the billing analysis and return structured results"""
+    @property
+    def amounts(self):
+        """Amount as float64, NaN where missing or unparsable"""
+        if self._amounts is None:
+            self._amounts = pd.to_numeric(self.df['Amount'], errors='coerce').to_numpy(dtype=np.float64)
+        return self._amounts
+
+def _records(table):
+    """Rows of a summary frame as JSON-ready dicts, with NaN as None"""
+    return table.astype(object).where(table.notna(), None).to_dict('records')
+
+def _money(values):
+    return np.round(np.asarray(values, dtype=np.float64), 2)
+
+@analyzer('duplicates')
+def duplicates_analyzer(frame, options):
+    return analyze_bills(frame.df, frame.csv_file_path, options.get('sort', 'key'), options.get('offset', 0),
+                         options.get('limit'), options.get('stream', False), key=frame.key)
+
+@analyzer('residents')
+def resident_analyzer(frame, options):
+    """Bills, amounts, disputes and unpaid total per resident"""
+    status = frame.key['Status']
+    table = pd.DataFrame({
+        'resident': frame.key['Resident Name'],
+        'amount': frame.amounts,
+        'disputed': (status == DISPUTED_STATUS).to_numpy(dtype=bool),
+        'unpaid': np.where(status.isin(UNPAID_STATUSES).to_numpy(dtype=bool), frame.amounts, 0.0)
+    })
+    grouped = table.groupby('resident', observed=True, sort=True)
+    summary = grouped.agg(bills=('amount', 'size'), total_amount=('amount', 'sum'),
+                          average_amount=('amount', 'mean'), disputes=('disputed', 'sum'),
+                          unpaid_amount=('unpaid', 'sum'))
+    residents = pd.DataFrame({
+        'resident_name': frame.df['Resident Name'].groupby(table['resident'], observed=True, sort=True).first().map(_text),
+        'bills': summary['bills'],
+        'total_amount': _money(summary['total_amount']),
+        'average_amount': _money(summary['average_amount']),
+        'disputes': summary['disputes'],
+        'dispute_rate': np.round(summary['disputes'] / summary['bills'], 4),
+        'unpaid_amount': _money(summary['unpaid_amount'])
+    })
+    return {"residents": _records(residents.reset_index(drop=True))}
+
+@analyzer('status')
+def status_analyzer(frame, options):
+    """Bills and amounts per status, and per month with the unpaid and disputed share"""
+    status = frame.key['Status']
+    amounts = pd.Series(frame.amounts, index=frame.df.index)
+    by_status = amounts.groupby(status, observed=True, sort=True, dropna=False)
+    statuses = pd.DataFrame({
+        'status': frame.df['Status'].groupby(status, observed=True, sort=True, dropna=False).first().map(_text),
+        'bills': by_status.size(),
+        'amount': _money(by_status.sum()),
+        'share': np.round(by_status.size() / max(len(frame.df), 1), 4)
+    })
+
+    # Grouped by month number; only the distinct months are formatted as text
+    months = pd.to_datetime(frame.df['Date'], errors='coerce').to_numpy(dtype='datetime64[M]')
+    unpaid = status.isin(UNPAID_STATUSES).to_numpy(dtype=bool)
+    disputed = (status == DISPUTED_STATUS).to_numpy(dtype=bool)
+    table = pd.DataFrame({'amount': frame.amounts, 'unpaid': np.where(unpaid, frame.amounts, 0.0),
+                          'unpaid_bills': unpaid, 'disputed_bills': disputed})
+    by_month = table.groupby(months, sort=True).agg(
+        bills=('amount', 'size'), amount=('amount', 'sum'), unpaid_bills=('unpaid_bills', 'sum'),
+        unpaid_amount=('unpaid', 'sum'), disputed_bills=('disputed_bills', 'sum'))
+    by_month[['amount', 'unpaid_amount']] = _money(by_month[['amount', 'unpaid_amount']])
+    by_month.index = np.datetime_as_string(by_month.index.to_numpy(dtype='datetime64[M]'), unit='M')
+    return {
+        "statuses": _records(statuses.reset_index(drop=True)),
+        "by_month": _records(by_month.rename_axis('month').reset_index()),
+        "unpaid_bills": int(unpaid.sum()),
+        "unpaid_amount": float(_money(np.nansum(np.where(unpaid, frame.amounts, 0.0)))),
+        "disputed_bills": int(disputed.sum())
+    }
+
+def _leave_one_out(values, codes, size):
+    """Per row: mean, standard deviation and count of the other valid values sharing its code"""
+    valid = ~np.isnan(values)
+    x = np.where(valid, values, 0.0)
+    count = np.bincount(codes, weights=valid, minlength=size)[codes]
+    mean = (np.bincount(codes, weights=x, minlength=size) / np.maximum(np.bincount(codes, weights=valid, minlength=size), 1))[codes]
+    squares = np.bincount(codes, weights=np.where(valid, x - mean, 0.0) ** 2, minlength=size)[codes]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Removing one value from a running mean and sum of squares (Welford)
+        others = count - valid
+        other_mean = np.where(valid, (count * mean - x) / others, mean)
+        other_squares = np.where(valid, squares - (x - mean) * (x - other_mean), squares)
+        other_std = np.sqrt(np.maximum(other_squares, 0.0) / (others - 1))
+    return other_mean, other_std, others
+
+@analyzer('anomalies')
+def anomaly_analyzer(frame, options):
+    """Bills whose amount is far from the resident's (or everyone's) other bills, by z-score"""
+    threshold = options.get('z_threshold', ANOMALY_Z_THRESHOLD)
+    amounts = frame.amounts
+    residents = frame.key['Resident Name']
+    codes = (residents.cat.codes.to_numpy() if isinstance(residents.dtype, pd.CategoricalDtype)
+             else pd.factorize(residents)[0]).astype(np.int64)
+    has_resident = codes >= 0
+    resident_mean, resident_std, resident_history = _leave_one_out(amounts, np.where(has_resident, codes, 0), max(codes.max(initial=0) + 1, 1))
+    all_mean, all_std, all_history = _leave_one_out(amounts, np.zeros(len(amounts), dtype=np.int64), 1)
+
+    use_resident = has_resident & (resident_history >= ANOMALY_MIN_HISTORY)
+    mean = np.where(use_resident, resident_mean, all_mean)
+    std = np.where(use_resident, resident_std, all_std)
+    history = np.where(use_resident, resident_history, all_history)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = (amounts - mean) / np.maximum(np.nan_to_num(std), ANOMALY_MIN_SPREAD * np.abs(mean))
+    flagged = np.flatnonzero(~np.isnan(z) & (history >= ANOMALY_MIN_HISTORY) & (np.abs(z) >= threshold))
+    flagged = flagged[np.argsort(-np.abs(z[flagged]), kind='stable')]
+
+    rows = frame.df.iloc[flagged]
+    anomalies = pd.DataFrame({
+        'bill_id': rows['Bill ID'].to_numpy(),
+        'resident_name': rows['Resident Name'].map(_text).to_numpy(),
+        'amount': rows['Amount'].map(_amount).to_numpy(),
+        'status': rows['Status'].map(_text).to_numpy(),
+        'date': rows['Date'].map(_text).to_numpy(),
+        'expected_amount': _money(mean[flagged]),
+        'z_score': np.round(z[flagged], 2),
+        'baseline': np.where(use_resident[flagged], 'resident', 'all')
+    })
+    return {"z_threshold": threshold, "anomalies": _records(anomalies)}
+
+def analyze_pipeline(df, csv_file_path, analyzers=None, **options):
+    """
+    Run the named analyzers over one loaded frame and merge their results.
+
+    With 'duplicates' the result is analyze_bills' and other analyzers are
+    added under "analyses"; without it the top level only identifies the
+    file. options (sort, offset, limit, stream, z_threshold) reach every
+    analyzer.
+    """
+    names = list(analyzers or DEFAULT_ANALYZERS)
+    unknown = [name for name in names if name not in ANALYZERS]
+    if unknown:
+        raise ValueError(f"Unknown analyzer: {', '.join(unknown)} (choose from {', '.join(ANALYZERS)})")
+
+    frame = BillFrame(df, csv_file_path)
+    if 'duplicates' in names:
+        results = ANALYZERS['duplicates'](frame, options)
+    else:
+        results = {"analysis_type": "billing_analysis", "csv_file": csv_file_path, "total_records": int(len(df))}
+    others = [name for name in names if name != 'duplicates']
+    if others:
+        results["analyzers"] = names
+        results["analyses"] = {}
+        for name in others:
+            with analysis_profile.stage(f"analyzer.{name}"):
+                results["analyses"][name] = ANALYZERS[name](frame, options)
+    return results
+
+def run_analysis(csv_file_path, chunksize=None, sort='key', offset=0, limit=None, stream=False, analyzers=None,
+                 profile=False, cprofile_path=None, **options):
+    """
+    Run the billing analysis and return structured results.
+
+    With chunksize the file is read that many rows at a time and memory
+    stays bounded by the duplicates, not the file (see analyze_bills_chunked).
+    sort ('key' or 'size'), offset and limit page duplicate_details, and
+    stream=True leaves it a generator (see analyze_bills). analyzers names
+    the analyses to run over the loaded frame (see analyze_pipeline).
+
+    profile=True adds a "profile" block with each stage's time and peak
+    memory, the row and group counts and, with cprofile_path, where the
+    cProfile stats were dumped (see BillProfile). duplicate_details is then
+    built in full so its cost and that of serializing the result are
+    measured too.
+    """
+    if not profile:
+        return _run_analysis(csv_file_path, chunksize, sort, offset, limit, stream, analyzers, **options)
+
+    analysis_profile.start(cprofile_path)
+    try:
+        results = _run_analysis(csv_file_path, chunksize, sort, offset, limit, False, analyzers, **options)
+        with analysis_profile.stage("serialize"):
+            json_codec.dumps(results)
+        analysis_profile.count("rows", results.get("total_records", 0))
+        analysis_profile.count("duplicate_records", results.get("duplicate_records", 0))
+        analysis_profile.count("groups", results.get("duplicate_groups", 0))
+        analysis_profile.count("detail_groups", len(results.get("duplicate_details", [])))
+    finally:
+        block = analysis_profile.finish()
+    results["profile"] = block
+    return results
+
+def _run_analysis(csv_file_path, chunksize, sort, offset, limit, stream, analyzers, **options):
     try:
-        # Initialize the tool
-        dt = DuplicateCheckerTool()
-        
-        # Run the duplicate check
-        tool_output = dt.run(csv_file_path)
-        
-        # Parse the results
-        df = pd.read_csv(csv_file_path)
-        duplicate_rows = df[df.duplicated(subset=['Resident Name', 'Amount', 'Status', 'Date', 'Comments'], keep=False)]
-        
-        # Create structured results
-        results = {
+        if chunksize:
+            if list(analyzers or DEFAULT_ANALYZERS) != ['duplicates']:
+                raise ValueError("Chunked reading only supports the duplicates analyzer")
+            results = analyze_bills_chunked(csv_file_path, chunksize)
+            results["duplicate_details"] = paginate_details(results["duplicate_details"], sort, offset, limit)
+            return results
+        with analysis_profile.stage("load"):
+            df = load_bills(csv_file_path)
+        return analyze_pipeline(df, csv_file_path, analyzers, sort=sort, offset=offset, limit=limit, stream=stream,
+                                **options)
+
+    except Exception as e:
+        return {
+            "error": str(e),
             "analysis_type": "billing_duplicate_detection",
-            "csv_file": csv_file_path,
-            "total_records": int(len(df)),
-            "duplicate_records": int(len(duplicate_rows)),
-            "duplicate_percentage": round((len(duplicate_rows) / len(df)) * 100, 2),
-            "raw_output": tool_output,
-            "duplicate_details": []
+            "csv_file": csv_file_path
         }
-        
-        # Add details for each duplicate group
-        if not duplicate_rows.empty:
-            duplicate_groups = df[df.duplicated(subset=['Resident Name', 'Amount', 'Status', 'Date', 'Comments'], keep=False)].groupby(['Resident Name', 'Amount', 'Status', 'Date', 'Comments'])
-            
-            for group_key, group_data in duplicate_groups:
-                results["duplicate_details"].append({
-                    "resident_name": str(group_key[0]),
-                    "amount": int(group_key[1]),
-                    "status": str(group_key[2]),
-                    "date": str(group_key[3]),
-                    "comments": str(group_key[4]),
-                    "bill_ids": group_data['Bill ID'].tolist(),
-                    "count": int(len(group_data))
-                })
-        
+
+def run_stream_analysis(source, input_format='csv', chunksize=None, sort='key', offset=0, limit=None):
+    """Run the billing analysis over bills streamed from a text stream such as sys.stdin"""
+    try:
+        results = analyze_bill_stream(read_stream_chunks(source, input_format, chunksize or STREAM_CHUNK_ROWS), "<stdin>")
+        results["duplicate_details"] = paginate_details(results["duplicate_details"], sort, offset, limit)
         return results
-        
+
+    except Exception as e:
+        return {
+            "error": str(e),
+            "analysis_type": "billing_duplicate_detection",
+            "csv_file": "<stdin>"
+        }
+
+def run_incremental_analysis(csv_file_path, index_path=None, rebuild=False, chunksize=None):
+    """
+    Incremental billing analysis against a persistent fingerprint index.
+
+    The index lives at index_path (default BILL_INDEX_PATH or
+    .cache/bill_index.sqlite3); rebuild=True empties it first.
+    """
+    try:
+        index = BillIndex(index_path or os.getenv('BILL_INDEX_PATH', DEFAULT_INDEX_PATH))
+        try:
+            if rebuild:
+                index.rebuild()
+            return analyze_bills_incremental(csv_file_path, index, chunksize or INDEX_CHUNK_ROWS)
+        finally:
+            index.close()
+
     except Exception as e:
         return {
             "error": str(e),
@@ -109,23 +1065,151 @@ def run_analysis(csv_file_path):
             "csv_file": csv_file_path
         }
 
+def run_near_duplicate_analysis(csv_file_path, threshold=DEFAULT_THRESHOLD, date_window=DEFAULT_DATE_WINDOW):
+    """Run the near-duplicate billing analysis and return structured results"""
+    try:
+        return analyze_bills_near(load_bills(csv_file_path), csv_file_path, threshold, date_window)
+
+    except Exception as e:
+        return {
+            "error": str(e),
+            "analysis_type": "billing_duplicate_detection",
+            "csv_file": csv_file_path
+        }
+
+def run_multi_file_analysis(csv_file_paths, workers=None, memory_limit_mb=None, chunksize=None,
+                            sort='key', offset=0, limit=None):
+    """Run the billing analysis over several files in a process pool (see analyze_bill_files)"""
+    try:
+        return analyze_bill_files(csv_file_paths, workers, memory_limit_mb, chunksize, sort, offset, limit)
+
+    except Exception as e:
+        # e.g. BrokenProcessPool when a worker dies outright at its memory cap
+        return {
+            "error": str(e) or type(e).__name__,
+            "analysis_type": "billing_duplicate_detection",
+            "csv_files": list(csv_file_paths)
+        }
+
+def expand_paths(patterns):
+    """Bill export paths from arguments that may be glob patterns, in order and without repeats"""
+    import glob
+
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        paths.extend(path for path in matches if path not in paths)
+    return paths
+
+def write_ndjson(results, stream):
+    """Write the results without duplicate_details on one line, then each duplicate group on its own line"""
+    details = results.pop("duplicate_details", [])
+    stream.write(json_codec.dumps(results) + "\n")
+    for group in details:
+        stream.write(json_codec.dumps(group) + "\n")
+
 def main():
     """Main function to run when script is executed directly"""
-    if len(sys.argv) < 2:
-        print("Usage: python billingagent.py <csv_file_path>")
-        sys.exit(1)
-    
-    csv_file_path = sys.argv[1]
-    
-    if not os.path.exists(csv_file_path):
-        print(f"Error: File {csv_file_path} not found")
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Detect duplicate bills in a CSV export")
+    parser.add_argument("csv_file_paths", nargs="+", metavar="csv_file_path",
+                        help="Bill export(s) to analyse; several paths or a quoted glob analyse them in parallel, "
+                             "and - reads bills from stdin")
+    parser.add_argument("--input-format", choices=["csv", "ndjson"], default="csv",
+                        help="Format of bills read from stdin: CSV, or one JSON object per line (default csv)")
+    parser.add_argument("--chunksize", type=int, metavar="ROWS",
+                        help="Read the file ROWS rows at a time to keep memory bounded on very large exports")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Parse the CSV instead of reading the columnar sidecar cache")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only ingest bills not seen by earlier runs and report new or changed duplicate groups")
+    parser.add_argument("--index", metavar="PATH",
+                        help="Fingerprint index used by --incremental (default .cache/bill_index.sqlite3)")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Discard the fingerprint index and ingest the whole file (implies --incremental)")
+    parser.add_argument("--near", action="store_true",
+                        help="Cluster near-duplicate bills (similar names, dates a few days apart, reworded comments)")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"Similarity from 0 to 1 that links two bills in --near mode (default {DEFAULT_THRESHOLD})")
+    parser.add_argument("--date-window", type=int, default=DEFAULT_DATE_WINDOW, metavar="DAYS",
+                        help=f"Largest date difference compared in --near mode (default {DEFAULT_DATE_WINDOW})")
+    parser.add_argument("--sort", choices=["key", "size"], default="key",
+                        help="Order duplicate_details by normalized key or largest group first (default key)")
+    parser.add_argument("--offset", type=int, default=0, metavar="GROUPS",
+                        help="Skip this many duplicate groups")
+    parser.add_argument("--limit", type=int, metavar="GROUPS",
+                        help="Return at most this many duplicate groups (duplicate_groups and the amount totals still cover them all)")
+    parser.add_argument("--format", choices=["json", "ndjson"], default="json",
+                        help="ndjson writes the summary on the first line, then one duplicate group per line")
+    parser.add_argument("--workers", type=int, metavar="N",
+                        help="Processes analysing several files at once (default: available cores)")
+    parser.add_argument("--max-worker-memory", type=int, metavar="MB",
+                        help="Address-space cap for each worker process when analysing several files")
+    parser.add_argument("--analyzers", default=",".join(DEFAULT_ANALYZERS), metavar="NAMES",
+                        help=f"Comma-separated analyses to run over the loaded file, or 'all' "
+                             f"({', '.join(ANALYZERS)}; default {','.join(DEFAULT_ANALYZERS)})")
+    parser.add_argument("--profile", action="store_true",
+                        help="Add a profile block with each stage's wall time and peak memory to the result")
+    parser.add_argument("--cprofile", metavar="PATH",
+                        help="Also dump cProfile stats of the run to PATH (implies --profile)")
+    parser.add_argument("--z-threshold", type=float, default=ANOMALY_Z_THRESHOLD,
+                        help=f"z-score that marks an amount anomaly (default {ANOMALY_Z_THRESHOLD})")
+    args = parser.parse_args()
+    analyzers = list(ANALYZERS) if args.analyzers == "all" else [name.strip() for name in args.analyzers.split(",")]
+    unknown = [name for name in analyzers if name not in ANALYZERS]
+    if unknown:
+        parser.error(f"unknown analyzer: {', '.join(unknown)} (choose from {', '.join(ANALYZERS)})")
+    csv_file_paths = expand_paths(args.csv_file_paths)
+    multi_file = len(csv_file_paths) != 1 or csv_file_paths[0] != args.csv_file_paths[0]
+    from_stdin = STDIN_PATH in csv_file_paths
+    if from_stdin and (multi_file or args.near or args.incremental or args.rebuild or analyzers != ['duplicates']):
+        parser.error("bills from stdin are analysed alone, for exact duplicates only")
+    if multi_file and (args.near or args.incremental or args.rebuild):
+        parser.error("--near and --incremental analyse a single file")
+    if analyzers != ['duplicates'] and (multi_file or args.chunksize or args.near or args.incremental or args.rebuild):
+        parser.error("--analyzers needs a single file loaded whole")
+    if (args.profile or args.cprofile) and (multi_file or from_stdin or args.near or args.incremental or args.rebuild):
+        parser.error("--profile profiles the analysis of a single file")
+    if args.near and (args.chunksize or args.incremental or args.rebuild):
+        parser.error("--near loads the whole file and cannot be combined with --chunksize or --incremental")
+
+    if args.no_cache:
+        global cache_enabled
+        cache_enabled = False
+
+    if not csv_file_paths:
+        print(f"Error: No files match {' '.join(args.csv_file_paths)}")
         sys.exit(1)
-    
+    for csv_file_path in csv_file_paths:
+        if csv_file_path != STDIN_PATH and not os.path.exists(csv_file_path):
+            print(f"Error: File {csv_file_path} not found")
+            sys.exit(1)
+
     # Run analysis
-    results = run_analysis(csv_file_path)
-    
+    if from_stdin:
+        results = run_stream_analysis(sys.stdin, args.input_format, args.chunksize, args.sort, args.offset, args.limit)
+    elif multi_file:
+        results = run_multi_file_analysis(csv_file_paths, args.workers, args.max_worker_memory, args.chunksize,
+                                          args.sort, args.offset, args.limit)
+    elif args.near or args.incremental or args.rebuild:
+        csv_file_path = csv_file_paths[0]
+        if args.near:
+            results = run_near_duplicate_analysis(csv_file_path, args.threshold, args.date_window)
+        else:
+            results = run_incremental_analysis(csv_file_path, args.index, args.rebuild, args.chunksize)
+        if "duplicate_details" in results:
+            results["duplicate_details"] = paginate_details(results["duplicate_details"], args.sort, args.offset, args.limit)
+    else:
+        results = run_analysis(csv_file_paths[0], args.chunksize, args.sort, args.offset, args.limit,
+                               stream=args.format == "ndjson", analyzers=analyzers, z_threshold=args.z_threshold,
+                               profile=args.profile or bool(args.cprofile), cprofile_path=args.cprofile)
+
     # Output results as JSON for Node.js integration
-    print(json.dumps(results, indent=2))
+    if args.format == "ndjson":
+        write_ndjson(results, sys.stdout)
+    else:
+        print(json_codec.dumps(results, indent=True))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,113 @@
+"""
+Capacity-aware bulk dispatch of many issues over one technician roster
+"""
+import numpy as np
+
+from technician_roster import EXACT_SKILL_SCORE, PARTIAL_SKILL_SCORE
+
+# Jobs a technician may hold at once unless their record sets maxConcurrentJobs
+DEFAULT_MAX_JOBS = 3
+UNASSIGNED = -1
+
+
+def mask_flags(mask: int, size: int) -> np.ndarray:
+    """Expand a technician bitmask into a 0/1 array of length ``size``."""
+    packed = np.frombuffer(mask.to_bytes((size + 7) // 8, "little"), dtype=np.uint8)
+    return np.unpackbits(packed, count=size, bitorder="little").astype(np.int8)
+
+
+def technician_capacity(roster, max_jobs: int = DEFAULT_MAX_JOBS) -> np.ndarray:
+    """Return how many issues each technician may still take."""
+    capacity = np.empty(len(roster), dtype=np.int64)
+    for position, record in enumerate(roster.records):
+        limit = record.get("maxConcurrentJobs", max_jobs)
+        if not isinstance(limit, (int, float)):
+            limit = max_jobs
+        capacity[position] = max(int(limit), 0)
+    return capacity
+
+
+def category_score_matrix(categories: list, roster) -> np.ndarray:
+    """Score every technician for each category, one row per category.
+
+    Uses the same rules as TechnicianRoster.best_match: +3 exact skill,
+    +2 partial skill, +1 available, +1 rate under 600.
+    """
+    scores = np.zeros((len(categories), len(roster)), dtype=np.int8)
+    for row, category in enumerate(categories):
+        exact, partial = roster.category_masks(category)
+        scores[row] = mask_flags(exact, len(roster)) * EXACT_SKILL_SCORE
+        scores[row] += mask_flags(partial, len(roster)) * PARTIAL_SKILL_SCORE
+    scores += np.frombuffer(roster.bonus, dtype=np.int8)
+    return scores
+
+
+def score_matrix(categories: list, roster) -> np.ndarray:
+    """Return the issue x technician score matrix for a list of issue categories."""
+    unique, inverse = np.unique(np.asarray(categories, dtype=object), return_inverse=True)
+    return category_score_matrix(list(unique), roster)[inverse]
+
+
+def _take_slots(techs: np.ndarray, remaining: np.ndarray, demand: int) -> np.ndarray:
+    """Fill up to ``demand`` jobs from ``techs`` in order and consume their capacity."""
+    capacity = remaining[techs]
+    needed = int(np.searchsorted(np.cumsum(capacity), demand)) + 1
+    techs = techs[:needed]
+    taken = capacity[:needed].copy()
+    overflow = int(taken.sum()) - demand
+    if overflow > 0:
+        taken[-1] -= overflow
+    remaining[techs] -= taken
+    return np.repeat(techs, taken)
+
+
+def dispatch(categories: list, roster, max_jobs: int = DEFAULT_MAX_JOBS) -> np.ndarray:
+    """Assign every issue to a technician position without exceeding capacity.
+
+    Issues with the same category score every technician identically, so
+    the issue x technician matrix is solved through its distinct category
+    rows. Score levels are filled from the highest down; within a level,
+    technicians are taken in roster order and issues in input order. Issues
+    no positive-scoring technician can take use the single-issue fallback
+    order (multi-skilled, then available, then anyone) among technicians
+    with capacity left.
+
+    Returns:
+        Array of technician positions per issue, UNASSIGNED when every
+        technician is at capacity
+    """
+    assigned = np.full(len(categories), UNASSIGNED, dtype=np.int64)
+    if len(categories) == 0 or len(roster) == 0:
+        return assigned
+
+    unique, inverse = np.unique(np.asarray(categories, dtype=object), return_inverse=True)
+    scores = category_score_matrix(list(unique), roster)
+    remaining = technician_capacity(roster, max_jobs)
+
+    # Issue indices grouped by category, each group in input order
+    issue_order = np.argsort(inverse, kind="stable")
+    counts = np.bincount(inverse, minlength=len(unique))
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    served = np.zeros(len(unique), dtype=np.int64)
+
+    for level in range(int(scores.max()), 0, -1):
+        for row in range(len(unique)):
+            demand = int(counts[row] - served[row])
+            if demand == 0:
+                continue
+            techs = np.flatnonzero((scores[row] == level) & (remaining > 0))
+            if techs.size == 0:
+                continue
+            slots = _take_slots(techs, remaining, demand)
+            begin = starts[row] + served[row]
+            assigned[issue_order[begin:begin + slots.size]] = slots
+            served[row] += slots.size
+
+    pending = np.flatnonzero(assigned == UNASSIGNED)
+    if pending.size and remaining.any():
+        fallback = np.asarray(roster.fallback_order(), dtype=np.int64)
+        fallback = fallback[remaining[fallback] > 0]
+        slots = _take_slots(fallback, remaining, int(pending.size))
+        assigned[pending[:slots.size]] = slots
+
+    return assigned
@@ -1,33 +1,188 @@
-from crewai.tools import BaseTool
-from crewai import Agent, Task, Crew, LLM
+import time
+_import_started = time.perf_counter()
+
+import itertools
 import json
 import os
 import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from dotenv import load_dotenv
+import json_codec
+from issue_features import ISSUE_CATEGORIES, extract_features
+from pipeline_stats import PipelineStats
+from technician_roster import TechnicianRecord, TechnicianRoster
 load_dotenv()
 
 # ---------------------------
 # Load Gemini Model with API Key
 # ---------------------------
-# Set the API key from environment
-google_api_key = os.getenv('GOOGLE_API_KEY')
-if google_api_key:
-    os.environ['GOOGLE_API_KEY'] = google_api_key
-
-llm = LLM(
-    model="gemini/gemini-1.5-flash",  # Using more stable model
-    temperature=0.1,  # Lower temperature for more consistent output
-    api_key=google_api_key
+# crewai and the Gemini client are only needed when the deterministic
+# assignment fails, so they are imported and built on first use.
+_llm = None
+_technician_agent = None
+_agent_lock = threading.Lock()
+
+
+def get_llm():
+    """Return the shared Gemini LLM, importing crewai on first call."""
+    global _llm
+    with _agent_lock:
+        if _llm is None:
+            from crewai import LLM
+
+            # Set the API key from environment
+            google_api_key = os.getenv('GOOGLE_API_KEY')
+            if google_api_key:
+                os.environ['GOOGLE_API_KEY'] = google_api_key
+
+            _llm = LLM(
+                model="gemini/gemini-1.5-flash",  # Using more stable model
+                temperature=0.1,  # Lower temperature for more consistent output
+                api_key=google_api_key
+            )
+    return _llm
+
+# ---------------------------
+# Stage Timings
+# ---------------------------
+# Opt-in: ASSIGNMENT_TIMINGS=json adds a _timings block to the output,
+# ASSIGNMENT_TIMINGS=stderr prints it to stderr (or pass --timings).
+TIMINGS_OUTPUTS = ('json', 'stderr')
+timings_output = os.getenv('ASSIGNMENT_TIMINGS', '').lower() or None
+if timings_output not in (None, *TIMINGS_OUTPUTS):
+    # Recording timings nobody would ever print only slows requests down
+    print(f"Warning: ignoring ASSIGNMENT_TIMINGS={timings_output!r}; expected one of {', '.join(TIMINGS_OUTPUTS)}",
+          file=sys.stderr)
+    timings_output = None
+assignment_stats = PipelineStats(enabled=timings_output is not None)
+
+# ASSIGNMENT_OUTPUT=compact (or --compact) prints one-shot results on one
+# line instead of indented; worker responses are always compact.
+output_compact = os.getenv('ASSIGNMENT_OUTPUT', '').lower() == 'compact'
+
+# ---------------------------
+# AI Fallback Cache
+# ---------------------------
+# AI answers are cached on disk by issue text and roster fingerprint. Set
+# ASSIGNMENT_CACHE=off (or pass --no-cache) to bypass it.
+cache_enabled = os.getenv('ASSIGNMENT_CACHE', 'on').lower() not in ('0', 'off', 'false', 'no')
+_assignment_cache = None
+
+
+def get_assignment_cache():
+    """Return the shared AI fallback cache, opening it on first call."""
+    global _assignment_cache
+    with _agent_lock:
+        if _assignment_cache is None:
+            from assignment_cache import AssignmentCache, DEFAULT_CACHE_PATH
+            _assignment_cache = AssignmentCache(os.getenv('ASSIGNMENT_CACHE_PATH', DEFAULT_CACHE_PATH))
+    return _assignment_cache
+
+# ---------------------------
+# AI Fallback Deadline and Circuit Breaker
+# ---------------------------
+# The AI fallback runs on a bounded thread pool and is abandoned once its
+# deadline passes, so a slow model can never hold up an assignment for
+# longer than AI_FALLBACK_TIMEOUT seconds.
+AI_FALLBACK_TIMEOUT = float(os.getenv('AI_FALLBACK_TIMEOUT', '15'))
+AI_FALLBACK_CONCURRENCY = int(os.getenv('AI_FALLBACK_CONCURRENCY', '4'))
+_fallback_executor = None
+# LLM calls that outlived their deadline and are still running
+abandoned_fallbacks = 0
+
+
+class CircuitBreaker:
+    """Skips the LLM after repeated failures until a cool-down has passed.
+
+    After ``failure_threshold`` consecutive failures (errors or timeouts) the
+    breaker opens and callers go straight to the deterministic result. Once
+    ``reset_timeout`` seconds have passed, one trial call is let through; a
+    success closes the breaker again, a failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                # Half-open: let this call through and hold the others back
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+
+
+ai_breaker = CircuitBreaker(
+    int(os.getenv('AI_FALLBACK_FAILURES', '5')),
+    float(os.getenv('AI_FALLBACK_RESET', '60'))
 )
 
+
+def get_fallback_executor() -> ThreadPoolExecutor:
+    """Return the shared pool that bounds concurrent LLM calls."""
+    global _fallback_executor
+    with _agent_lock:
+        if _fallback_executor is None:
+            _fallback_executor = ThreadPoolExecutor(
+                max_workers=AI_FALLBACK_CONCURRENCY, thread_name_prefix="ai-fallback"
+            )
+    return _fallback_executor
+
 # ---------------------------
 # Technician Assignment Tool
 # ---------------------------
-class TechnicianAssignmentTool(BaseTool):
+class TechnicianAssignmentTool:
+    """Deterministic technician matcher.
+
+    This is a plain class so the fast path never imports crewai; the agent
+    gets a crewai wrapper around it from get_technician_agent().
+    """
     name: str = "Technician Assignment Tool"
     description: str = "Assigns a technician based on issue category, title, and description using database technicians."
 
+    def run(self, issue_data: dict) -> str:
+        return self._run(issue_data)
+
     def _run(self, issue_data: dict) -> str:
+        result = self.assign(issue_data)
+        if result.get("error"):
+            return json.dumps(result)
+        return json.dumps(result, indent=2)
+
+    def assign(self, issue_data: dict, roster: TechnicianRoster = None) -> dict:
+        """Assign a technician to one issue and return the notification dict.
+
+        When ``roster`` is given it is used instead of ``issue_data["technicians"]``,
+        so a batch of issues can share one prepared roster.
+        """
         try:
             # Parse the issue data
             if isinstance(issue_data, str):
@@ -36,132 +191,114 @@ class TechnicianAssignmentTool(BaseTool):
             category = issue_data.get("category", "").lower()
             title = issue_data.get("title", "")
             description = issue_data.get("description", "")
+            # Scan the issue text once for urgency and category keywords
+            with assignment_stats.stage("features"):
+                features = extract_features(title, description)
 
             # Get technicians from the provided data
-            technicians = issue_data.get("technicians", [])
+            if roster is None:
+                roster = TechnicianRoster(issue_data.get("technicians", []))
 
-            if not technicians:
-                return json.dumps({
+            if not roster:
+                return {
                     "error": "No technicians available",
                     "category": category
-                })
+                }
 
             # Find the best technician for the category using simple logic
-            best_technician = self._find_best_technician(category, technicians)
+            with assignment_stats.stage("match"):
+                best_technician = self._find_best_technician(category, roster, features)
 
             if not best_technician:
-                return json.dumps({
+                return {
                     "error": "No suitable technician found for this category",
                     "category": category,
-                    "available_technicians": len(technicians)
-                })
-            
-            if best_technician:
-                # Create assignment notification
-                notification = {
-                    "type": "technician_assignment",
-                    "title": f"Technician Assigned: {best_technician['name']}",
-                    "message": f"{best_technician['name']} has been assigned to your issue. They specialize in {', '.join(best_technician['skills'])} and charge ₹{best_technician['hourlyRate']}/hour.",
-                    "technician": {
-                        "id": best_technician.get("_id", best_technician.get("id")),
-                        "name": best_technician["name"],
-                        "phone": best_technician["phone"],
-                        "email": best_technician["email"],
-                        "skills": best_technician["skills"],
-                        "hourlyRate": best_technician["hourlyRate"],
-                        "availability": best_technician["availability"]
-                    },
-                    "issue": {
-                        "title": title,
-                        "description": description,
-                        "category": category
-                    },
-                    "estimatedTime": self._get_estimated_time(category, title, description),
-                    "estimatedCost": self._get_estimated_cost(category, best_technician["hourlyRate"]),
-                    "actions": [
-                        {
-                            "type": "accept",
-                            "label": "Accept Assignment",
-                            "description": "Accept this technician for your issue"
-                        },
-                        {
-                            "type": "reschedule",
-                            "label": "Request Reschedule",
-                            "description": "Request a different time slot"
-                        },
-                        {
-                            "type": "reject",
-                            "label": "Reject & Request Another",
-                            "description": "Request a different technician"
-                        }
-                    ]
+                    "available_technicians": len(roster)
                 }
-                
-                return json.dumps(notification, indent=2)
-            else:
-                return json.dumps({
-                    "error": "No suitable technician found for this category",
-                    "category": category,
-                    "available_technicians": len(technicians)
-                })
-                
+
+            # Create assignment notification
+            return self._build_notification(category, title, description, best_technician, features, roster)
+
         except Exception as e:
-            return json.dumps({
+            return {
                 "error": f"Error while processing issue: {str(e)}",
                 "issue_data": str(issue_data)
-            })
-
-    def _find_best_technician(self, category: str, technicians: list) -> dict:
-        """Find the best technician using simple matching logic."""
-        best_technician = None
-        best_match_score = 0
-
-        for tech in technicians:
-            skills = [skill.lower() for skill in tech.get("skills", [])]
+            }
 
-            # Calculate match score
-            match_score = 0
-            if category in skills:
-                match_score += 3  # Primary skill match
-            elif any(skill in category or category in skill for skill in skills):
-                match_score += 2  # Partial skill match
+    def _build_notification(self, category: str, title: str, description: str, best_technician: TechnicianRecord,
+                            features=None, roster: TechnicianRoster = None) -> dict:
+        """Create the assignment notification sent to the resident."""
+        match_category = self._match_category(category, features, roster)
+        with assignment_stats.stage("estimate"):
+            estimated_time = self._get_estimated_time(match_category, title, description, features)
+            estimated_cost = self._get_estimated_cost(match_category, best_technician["hourlyRate"])
+        notification = {
+            "type": "technician_assignment",
+            "title": f"Technician Assigned: {best_technician['name']}",
+            "message": f"{best_technician['name']} has been assigned to your issue. They specialize in {', '.join(best_technician['skills'])} and charge ₹{best_technician['hourlyRate']}/hour.",
+            "technician": {
+                "id": best_technician.get("_id", best_technician.get("id")),
+                "name": best_technician["name"],
+                "phone": best_technician["phone"],
+                "email": best_technician["email"],
+                "skills": best_technician["skills"],
+                "hourlyRate": best_technician["hourlyRate"],
+                "availability": best_technician["availability"]
+            },
+            "issue": {
+                "title": title,
+                "description": description,
+                "category": category
+            },
+            "estimatedTime": estimated_time,
+            "estimatedCost": estimated_cost,
+            "actions": [
+                {
+                    "type": "accept",
+                    "label": "Accept Assignment",
+                    "description": "Accept this technician for your issue"
+                },
+                {
+                    "type": "reschedule",
+                    "label": "Request Reschedule",
+                    "description": "Request a different time slot"
+                },
+                {
+                    "type": "reject",
+                    "label": "Reject & Request Another",
+                    "description": "Request a different technician"
+                }
+            ]
+        }
+        if match_category != category:
+            notification["issue"]["inferredCategory"] = match_category
+        return notification
 
-            # Prefer available technicians
-            if tech.get("availability") == "available":
-                match_score += 1
+    def _match_category(self, category: str, features=None, roster: TechnicianRoster = None) -> str:
+        """Use the keyword category guess when the given category is missing, or unknown and no roster skill matches it."""
+        if features is None or category in ISSUE_CATEGORIES:
+            return category
+        if category and roster is not None and any(roster.category_masks(category)):
+            return category
+        return features.category_guess or category
 
-            # Prefer technicians with lower hourly rate (cost-effective)
-            hourly_rate = tech.get("hourlyRate", 1000)
-            if hourly_rate < 600:
-                match_score += 1
+    def _find_best_technician(self, category: str, technicians, features=None) -> TechnicianRecord:
+        """Find the best technician using simple matching logic."""
+        roster = TechnicianRoster.from_technicians(technicians)
+        category = self._match_category(category, features, roster)
 
-            if match_score > best_match_score:
-                best_match_score = match_score
-                best_technician = tech
+        position = roster.best_match(category)
+        path = "direct_match"
 
         # Fallback logic
-        if not best_technician:
-            # Try to find a general technician with multiple skills
-            for tech in technicians:
-                skills = tech.get("skills", [])
-                if len(skills) >= 2:  # Multi-skilled technician
-                    best_technician = tech
-                    break
-
-            # Last resort - any available technician
-            if not best_technician:
-                for tech in technicians:
-                    if tech.get("availability") == "available":
-                        best_technician = tech
-                        break
-
-                # Absolute last resort
-                if not best_technician and technicians:
-                    best_technician = technicians[0]
+        if position is None:
+            position, path = roster.fallback_position()
+        if path is not None:
+            assignment_stats.count(path)
 
-        return best_technician
+        return roster.records[position] if position is not None else None
 
-    def _get_estimated_time(self, category: str, title: str, description: str) -> str:
+    def _get_estimated_time(self, category: str, title: str, description: str, features=None) -> str:
         """Estimate completion time based on category and issue details."""
         time_estimates = {
             "plumbing": "2-4 hours",
@@ -176,8 +313,9 @@ class TechnicianAssignmentTool(BaseTool):
         }
         
         # Adjust based on urgency keywords
-        urgent_keywords = ["emergency", "urgent", "broken", "not working", "leak", "spark"]
-        if any(keyword in title.lower() or keyword in description.lower() for keyword in urgent_keywords):
+        if features is None:
+            features = extract_features(title, description)
+        if features.urgent:
             base_time = time_estimates.get(category, "2-4 hours")
             # Reduce time for urgent issues
             if "hours" in base_time:
@@ -216,113 +354,663 @@ class TechnicianAssignmentTool(BaseTool):
 # ---------------------------
 assignment_tool = TechnicianAssignmentTool()
 
-technician_agent = Agent(
-    role="Technician Dispatcher",
-    goal="Assign the most suitable technician to maintenance issues based on skills, availability, and cost",
-    backstory="You are an expert technician dispatcher. Assign technicians based on skills match, availability, and cost efficiency.",
-    tools=[assignment_tool],
-    verbose=False,  # Reduce verbosity to avoid encoding issues
-    llm=llm
-)
+
+def get_technician_agent():
+    """Return the shared dispatcher agent, building it on first call."""
+    global _technician_agent
+    llm = get_llm()
+    with _agent_lock:
+        if _technician_agent is None:
+            from crewai import Agent
+            from crewai.tools import BaseTool
+
+            class CrewTechnicianAssignmentTool(BaseTool):
+                name: str = assignment_tool.name
+                description: str = assignment_tool.description
+
+                def _run(self, issue_data: dict) -> str:
+                    return assignment_tool._run(issue_data)
+
+            _technician_agent = Agent(
+                role="Technician Dispatcher",
+                goal="Assign the most suitable technician to maintenance issues based on skills, availability, and cost",
+                backstory="You are an expert technician dispatcher. Assign technicians based on skills match, availability, and cost efficiency.",
+                tools=[CrewTechnicianAssignmentTool()],
+                verbose=False,  # Reduce verbosity to avoid encoding issues
+                llm=llm
+            )
+    return _technician_agent
 
 # ---------------------------
 # Main Function for Backend Integration
 # ---------------------------
-def assign_technician(issue_data: dict) -> dict:
+def run_ai_assignment(issue_data: dict) -> dict:
+    """Ask the dispatcher agent for an assignment; raises if the answer is unusable."""
+    from crewai import Task, Crew
+
+    technician_agent = get_technician_agent()
+
+    # Create task for the agent
+    task = Task(
+        description=(
+            f"Assign the best technician for this {issue_data.get('category', '')} issue. "
+            f"Consider skills, availability, and cost. "
+            f"Issue: {issue_data.get('title', '')} - {issue_data.get('description', '')}"
+        ),
+        expected_output="JSON notification with technician assignment details",
+        agent=technician_agent
+    )
+
+    # Create crew and run with minimal verbosity
+    crew = Crew(
+        agents=[technician_agent],
+        tasks=[task],
+        verbose=False
+    )
+
+    # Get the result
+    result = crew.kickoff()
+
+    # Parse the result - convert CrewOutput to string first
+    result_str = str(result)
+    return json.loads(result_str)
+
+
+class _FallbackCall:
+    """An LLM call submitted to the fallback pool.
+
+    Its deadline is either fixed by the caller or set ``timeout`` seconds
+    after the call starts running, so time spent queued behind other calls
+    does not count against it.
+    """
+
+    def __init__(self, deadline: float = None, timeout: float = None):
+        self.deadline = deadline
+        self.timeout = timeout
+        self.started = threading.Event()
+        self.future = None
+
+    def begin(self):
+        if self.deadline is None:
+            self.deadline = time.monotonic() + self.timeout
+        self.started.set()
+
+    def late(self) -> bool:
+        return time.monotonic() > self.deadline
+
+
+def _call_ai_assignment(issue_data: dict, cache_key: str, call: _FallbackCall) -> dict:
+    call.begin()
+    try:
+        result = run_ai_assignment(issue_data)
+    except Exception:
+        if not call.late():
+            ai_breaker.record_failure()
+        raise
+    # An answer after the deadline was already counted as a timeout by the
+    # caller; recording it as a success would reset a breaker that a
+    # consistently slow model should open
+    if not call.late():
+        ai_breaker.record_success()
+
+    if cache_key is not None and isinstance(result, dict) and not result.get("error"):
+        get_assignment_cache().put(cache_key, result)
+    return result
+
+
+def start_ai_fallback(issue_data: dict, roster: TechnicianRoster = None, use_cache: bool = True,
+                      deadline: float = None, timeout: float = None):
+    """
+    Begin the AI fallback for an issue without waiting for the LLM.
+
+    The call must be done by the monotonic ``deadline``, or within
+    ``timeout`` seconds of starting to run when no deadline is given; an
+    answer after that does not count as a success for the circuit breaker.
+
+    Returns:
+        The cached result dict on a cache hit, None when the circuit breaker
+        is open, otherwise the _FallbackCall submitted to the fallback pool
+    """
+    cache_key = None
+    if use_cache and cache_enabled:
+        from assignment_cache import issue_cache_key
+
+        if roster is None:
+            roster = TechnicianRoster(issue_data.get("technicians", []))
+        cache_key = issue_cache_key(issue_data, roster.fingerprint)
+        cached = get_assignment_cache().get(cache_key)
+        if cached is not None:
+            return cached
+
+    if not ai_breaker.allow():
+        return None
+
+    call = _FallbackCall(deadline, timeout)
+    call.future = get_fallback_executor().submit(_call_ai_assignment, issue_data, cache_key, call)
+    return call
+
+
+def _remaining(deadline: float) -> float:
+    return max(0.0, deadline - time.monotonic())
+
+
+def finish_ai_fallback(pending, direct_result: dict, start_deadline: float) -> dict:
+    """
+    Wait for a started fallback, else return direct_result.
+
+    A call still queued at the monotonic ``start_deadline`` is cancelled; one
+    that started is waited for until its own deadline.
+    """
+    if pending is None:
+        assignment_stats.count("llm_circuit_open")
+        return direct_result
+    if isinstance(pending, dict):
+        assignment_stats.count("llm_cache_hit")
+        return pending
+
+    if not pending.started.wait(_remaining(start_deadline)) and pending.future.cancel():
+        # It never reached the LLM, so the circuit breaker is not told
+        assignment_stats.count("llm_queue_timeout")
+        return direct_result
+    # A call that could not be cancelled is already running and about to mark its start
+    pending.started.wait()
+    try:
+        result = pending.future.result(timeout=_remaining(pending.deadline))
+        assignment_stats.count("llm_used")
+        return result
+    except FutureTimeoutError:
+        assignment_stats.count("llm_timeout")
+        # The call keeps its pool slot until the model answers, but nobody waits for it
+        global abandoned_fallbacks
+        abandoned_fallbacks += 1
+        ai_breaker.record_failure()
+        return direct_result
+    except Exception:
+        assignment_stats.count("llm_failed")
+        # If AI agent fails, fall back to direct assignment result
+        return direct_result
+
+
+def assign_technician(issue_data: dict, roster: TechnicianRoster = None, use_cache: bool = True,
+                      timeout: float = None) -> dict:
     """
     Main function to assign a technician to an issue.
 
     Args:
         issue_data: Dictionary containing issue details and available technicians
+        roster: Optional prepared roster to use instead of issue_data["technicians"]
+        use_cache: Answer the AI fallback from the on-disk cache when possible
+        timeout: Seconds to wait for the AI fallback (default AI_FALLBACK_TIMEOUT)
 
     Returns:
         Dictionary with assignment notification
     """
     try:
         # First try direct assignment without AI agent as fallback
-        assignment_tool = TechnicianAssignmentTool()
-        result_str = assignment_tool._run(issue_data)
+        direct_result = assignment_tool.assign(issue_data, roster)
+        if not direct_result.get("error"):
+            return direct_result
 
-        try:
-            result = json.loads(result_str)
-            if not result.get("error"):
-                return result
-        except json.JSONDecodeError:
-            pass
+        # If direct assignment fails, try with AI agent within the deadline
+        return _assign_with_ai_fallback(issue_data, direct_result, roster, use_cache, timeout)
+
+    except Exception as e:
+        return {
+            "error": f"Error in technician assignment: {str(e)}"
+        }
 
-        # If direct assignment fails, try with AI agent
+
+def _assign_with_ai_fallback(issue_data: dict, direct_result: dict, roster: TechnicianRoster = None,
+                             use_cache: bool = True, timeout: float = None) -> dict:
+    """Run the AI fallback for an issue the deterministic path already failed to place."""
+    deadline = time.monotonic() + (AI_FALLBACK_TIMEOUT if timeout is None else timeout)
+    with assignment_stats.stage("llm_fallback"):
         try:
-            # Create task for the agent
-            task = Task(
-                description=(
-                    f"Assign the best technician for this {issue_data.get('category', '')} issue. "
-                    f"Consider skills, availability, and cost. "
-                    f"Issue: {issue_data.get('title', '')} - {issue_data.get('description', '')}"
-                ),
-                expected_output="JSON notification with technician assignment details",
-                agent=technician_agent
-            )
+            pending = start_ai_fallback(issue_data, roster, use_cache, deadline)
+        except Exception:
+            return direct_result
+        return finish_ai_fallback(pending, direct_result, deadline)
 
-            # Create crew and run with minimal verbosity
-            crew = Crew(
-                agents=[technician_agent],
-                tasks=[task],
-                verbose=False
-            )
 
-            # Get the result
-            result = crew.kickoff()
+def assign_technician_batch(issues: list, technicians, use_cache: bool = True, timeout: float = None) -> list:
+    """
+    Assign technicians to many issues against one shared roster.
 
-            # Parse the result - convert CrewOutput to string first
-            result_str = str(result)
-            return json.loads(result_str)
+    Issues the deterministic path cannot place fall back to the AI agent
+    concurrently, bounded by AI_FALLBACK_CONCURRENCY, and each one waits at
+    most ``timeout`` seconds from when its LLM call started running. Calls
+    still queued once every round of AI_FALLBACK_CONCURRENCY calls could
+    have used its full timeout are cancelled.
 
-        except Exception as ai_error:
-            # If AI agent fails, fall back to direct assignment result
-            try:
-                return json.loads(result_str)
-            except:
-                return {
-                    "error": f"Both AI agent and direct assignment failed: {str(ai_error)}",
-                    "fallback_attempted": True
-                }
+    Args:
+        issues: List of issue dictionaries (title, description, category)
+        technicians: Technicians list, or a prepared TechnicianRoster
+        use_cache: Answer AI fallbacks from the on-disk cache when possible
+        timeout: Seconds to wait for each AI fallback (default AI_FALLBACK_TIMEOUT)
 
-    except Exception as e:
-        return {
-            "error": f"Error in technician assignment: {str(e)}"
-        }
+    Returns:
+        List with one assignment notification per issue, in input order
+    """
+    roster = TechnicianRoster.from_technicians(technicians)
+    timeout = AI_FALLBACK_TIMEOUT if timeout is None else timeout
+    results = [assignment_tool.assign(issue, roster) for issue in issues]
+
+    pending = {}
+    with assignment_stats.stage("llm_fallback"):
+        for index, result in enumerate(results):
+            if result.get("error"):
+                try:
+                    pending[index] = start_ai_fallback(issues[index], roster, use_cache, timeout=timeout)
+                except Exception:
+                    pass
+
+        rounds = -(-len(pending) // AI_FALLBACK_CONCURRENCY)
+        start_deadline = time.monotonic() + rounds * timeout
+        for index, fallback in pending.items():
+            results[index] = finish_ai_fallback(fallback, results[index], start_deadline)
+    return results
+
+
+def dispatch_technicians_batch(issues: list, technicians, max_jobs: int = None) -> list:
+    """
+    Assign many issues at once, spreading them over technicians by capacity.
+
+    Unlike assign_technician_batch, which picks the best technician for each
+    issue on its own, this solves the whole batch together so no technician
+    takes more than their maxConcurrentJobs (or max_jobs) issues. The AI
+    fallback is not used.
+
+    Args:
+        issues: List of issue dictionaries (title, description, category)
+        technicians: Technicians list, or a prepared TechnicianRoster
+        max_jobs: Concurrent job limit for technicians without maxConcurrentJobs
+
+    Returns:
+        List with one assignment notification per issue, in input order
+    """
+    from bulk_dispatch import DEFAULT_MAX_JOBS, UNASSIGNED, dispatch
+
+    roster = TechnicianRoster.from_technicians(technicians)
+    categories = [issue.get("category", "").lower() for issue in issues]
+
+    if not roster:
+        return [{"error": "No technicians available", "category": category} for category in categories]
+
+    features = [extract_features(issue.get("title", ""), issue.get("description", "")) for issue in issues]
+    match_categories = [
+        assignment_tool._match_category(category, issue_features, roster)
+        for category, issue_features in zip(categories, features)
+    ]
+    positions = dispatch(match_categories, roster, max_jobs or DEFAULT_MAX_JOBS)
+
+    results = []
+    for issue, category, issue_features, position in zip(issues, categories, features, positions.tolist()):
+        if position == UNASSIGNED:
+            results.append({
+                "error": "No technician has capacity left for this issue",
+                "category": category,
+                "available_technicians": len(roster)
+            })
+            continue
+        try:
+            results.append(assignment_tool._build_notification(
+                category, issue.get("title", ""), issue.get("description", ""), roster.records[position],
+                issue_features, roster
+            ))
+        except Exception as e:
+            results.append({
+                "error": f"Error while processing issue: {str(e)}",
+                "issue_data": str(issue)
+            })
+    return results
 
 # ---------------------------
 # Backend Integration Function
 # ---------------------------
-def main():
-    """Main function for backend integration - reads from stdin and writes to stdout."""
-    try:
-        # Set UTF-8 encoding for stdout to handle Unicode characters
-        import codecs
-        if hasattr(sys.stdout, 'detach'):
-            sys.stdout = codecs.getwriter('utf-8')(sys.stdout.detach())
+def _write_stdout(data: bytes):
+    """Write one UTF-8 JSON document and a newline straight to the stdout buffer."""
+    buffer = getattr(sys.stdout, 'buffer', None)
+    if buffer is None:
+        sys.stdout.write(data.decode('utf-8') + "\n")
+    else:
+        buffer.write(data + b"\n")
+    sys.stdout.flush()
+
 
-        # Read input from stdin
-        input_data = sys.stdin.read()
+def main(timings: str = None, compact: bool = None):
+    """Main function for backend integration - reads from stdin and writes to stdout.
+
+    Args:
+        timings: "json" adds a _timings block to the output, "stderr" prints it
+            to stderr; either also needs assignment_stats to be enabled
+        compact: Print the result on one line instead of indented; defaults
+            to ASSIGNMENT_OUTPUT=compact
+    """
+    indent = not (output_compact if compact is None else compact)
+    try:
+        # Read input from stdin; the JSON decoder takes the raw UTF-8 bytes
+        stdin = getattr(sys.stdin, 'buffer', sys.stdin)
+        input_data = stdin.read()
 
         if not input_data.strip():
-            print(json.dumps({"error": "No input data provided"}, ensure_ascii=False))
+            _write_stdout(json_codec.dumps_bytes({"error": "No input data provided"}))
             return
 
+        assignment_stats.begin_request()
+
         # Parse the input data
-        issue_data = json.loads(input_data)
+        with assignment_stats.stage("parse"):
+            issue_data = json_codec.loads(input_data)
+
+        # Run the assignment; {"technicians": [...], "issues": [...]} is a batch,
+        # and "mode": "dispatch" spreads the batch over technicians by capacity
+        if isinstance(issue_data.get("issues"), list):
+            if issue_data.get("mode") == "dispatch":
+                assignments = dispatch_technicians_batch(
+                    issue_data["issues"], issue_data.get("technicians", []), issue_data.get("maxJobs")
+                )
+            else:
+                assignments = assign_technician_batch(issue_data["issues"], issue_data.get("technicians", []))
+            result = {"assignments": assignments}
+        else:
+            result = assign_technician(issue_data)
 
-        # Run the assignment
-        result = assign_technician(issue_data)
+        request_timings = assignment_stats.end_request()
+        if request_timings is not None:
+            request_timings["stages_ms"]["import"] = round(IMPORT_MS, 3)
+            if timings == "json":
+                result["_timings"] = request_timings
 
-        # Output the result to stdout with proper encoding
-        print(json.dumps(result, indent=2, ensure_ascii=False))
+        # Output the result to stdout as UTF-8
+        serialize_started = time.perf_counter()
+        output = json_codec.dumps_bytes(result, indent)
+        serialize_ms = (time.perf_counter() - serialize_started) * 1000
+        assignment_stats.record("serialize", serialize_ms)
+        _write_stdout(output)
+
+        if request_timings is not None and timings == "stderr":
+            request_timings["stages_ms"]["serialize"] = round(serialize_ms, 3)
+            print(json.dumps(request_timings), file=sys.stderr)
 
     except json.JSONDecodeError as e:
-        print(json.dumps({"error": f"Invalid JSON input: {str(e)}"}, ensure_ascii=False))
+        _write_stdout(json_codec.dumps_bytes({"error": f"Invalid JSON input: {str(e)}"}))
     except Exception as e:
-        print(json.dumps({"error": f"Unexpected error: {str(e)}"}, ensure_ascii=False))
+        _write_stdout(json_codec.dumps_bytes({"error": f"Unexpected error: {str(e)}"}))
+
+# ---------------------------
+# Worker Mode
+# ---------------------------
+# Roster snapshots a worker keeps by version id
+MAX_ROSTER_VERSIONS = int(os.getenv("ROSTER_VERSIONS", "8"))
+
+
+def _roster_miss(version) -> dict:
+    return {"error": f"Unknown roster version: {version}", "rosterMiss": True, "rosterVersion": version}
+
+
+class AssignmentWorker:
+    """Long-lived worker that keeps the agent, tool and roster warm between requests.
+
+    Requests are JSON objects of the form ``{"id": ..., "op": ..., ...}``:
+
+    - ``assign``: assign a technician to ``issue``. When the issue carries no
+      ``technicians`` list, the roster set by the last ``roster`` op is used.
+    - ``batch``: assign every issue in ``issues`` against ``technicians``, or
+      against the resident roster when ``technicians`` is omitted.
+    - ``dispatch``: like ``batch``, but capacity-aware across the whole batch
+      (see dispatch_technicians_batch); ``maxJobs`` sets the default limit.
+    - ``roster``: replace the resident roster with ``technicians`` and keep
+      it as snapshot ``version`` (generated when omitted, and returned).
+    - ``roster_delta``: patch snapshot ``version`` (default: the resident
+      roster) with ``changes`` (see TechnicianRoster.apply_changes) and keep
+      the result as ``newVersion``; the resident roster follows the patch.
+    - ``cache_stats``: hit/miss counters of the AI fallback cache.
+    - ``stats``: cumulative stage histograms and path counters (needs
+      --timings); ``"reset": true`` clears them after reading.
+    - ``ping``: liveness check, with the AI circuit breaker state.
+
+    ``assign``, ``batch`` and ``dispatch`` requests may name a snapshot with
+    ``rosterVersion`` instead of sending technicians; an unknown or evicted
+    version is answered with ``"rosterMiss": true`` so the caller can resend
+    the full roster. ``assign`` and ``batch`` requests may set
+    ``"noCache": true`` to bypass the AI fallback cache and ``"timeout"``
+    (seconds) to override the AI fallback deadline.
+
+    Every response is ``{"id": ..., "result": ...}`` so callers can match
+    answers to requests. With timings enabled it also carries ``_timings``.
+    """
+
+    def __init__(self, max_pending: int = None):
+        self.roster = TechnicianRoster([])
+        self.roster_version = None
+        # version -> roster snapshot, least recently used first
+        self.rosters = OrderedDict()
+        # Guards the roster state above; socket connections share one worker across threads
+        self._roster_lock = threading.Lock()
+        self._version_counter = itertools.count(1)
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_pending or AI_FALLBACK_CONCURRENCY * 2, thread_name_prefix="worker"
+        )
+
+    def _bind(self, request: dict):
+        """
+        Resolve a request against the current roster.
+
+        Roster updates take effect here, in arrival order, so a request is
+        never affected by a roster change sent after it.
+
+        Returns:
+            (result, work): the result when it is already known, otherwise a
+            callable that may wait on the AI fallback and returns the result
+        """
+        op = request.get("op", "assign")
+        use_cache = not request.get("noCache")
+        timeout = request.get("timeout")
+
+        with self._roster_lock:
+            roster = self.roster
+            if op in ("assign", "batch", "dispatch") and "rosterVersion" in request:
+                roster = self._snapshot(request["rosterVersion"])
+                if roster is None:
+                    return _roster_miss(request["rosterVersion"]), None
+
+        if op == "assign":
+            issue_data = request.get("issue") or {}
+            if "technicians" in issue_data:
+                roster = None
+            # Deterministic assignments are answered straight away
+            direct_result = assignment_tool.assign(issue_data, roster)
+            if not direct_result.get("error"):
+                return direct_result, None
+            # The fallback starts from this result rather than matching again
+            return None, lambda: _assign_with_ai_fallback(issue_data, direct_result, roster, use_cache, timeout)
+        if op == "batch":
+            technicians = request["technicians"] if "technicians" in request else roster
+            issues = request.get("issues") or []
+            return None, lambda: {"assignments": assign_technician_batch(issues, technicians, use_cache, timeout)}
+        if op == "dispatch":
+            technicians = request["technicians"] if "technicians" in request else roster
+            return {"assignments": dispatch_technicians_batch(
+                request.get("issues") or [], technicians, request.get("maxJobs")
+            )}, None
+        if op == "roster":
+            roster = TechnicianRoster(request.get("technicians") or [])
+            with self._roster_lock:
+                version = self._keep(request.get("version"), roster)
+            return {"status": "ok", "technicians": len(roster), "version": version}, None
+        if op == "roster_delta":
+            with self._roster_lock:
+                base_version = request.get("version", self.roster_version)
+                base = self._snapshot(base_version)
+                if base is None:
+                    return _roster_miss(base_version), None
+                # Patch a copy so requests already bound to the base are unaffected
+                patched = base.copy()
+                try:
+                    patched.apply_changes(request.get("changes") or [])
+                except (KeyError, ValueError) as e:
+                    return {"error": e.args[0], "version": base_version}, None
+                version = self._keep(request.get("newVersion"), patched, base is self.roster)
+            return {"status": "ok", "technicians": len(patched), "version": version, "baseVersion": base_version}, None
+        if op == "cache_stats":
+            return get_assignment_cache().stats(), None
+        if op == "stats":
+            snapshot = assignment_stats.snapshot()
+            snapshot["import_ms"] = round(IMPORT_MS, 3)
+            if request.get("reset"):
+                assignment_stats.reset()
+            return snapshot, None
+        if op == "ping":
+            return {"status": "ok", "ai_circuit": ai_breaker.state}, None
+        return {"error": f"Unknown op: {op}"}, None
+
+    def _snapshot(self, version):
+        """Return the roster snapshot for version, or None when it is not held; call with _roster_lock held."""
+        roster = self.rosters.get(version)
+        if roster is not None:
+            self.rosters.move_to_end(version)
+        return roster
+
+    def _keep(self, version, roster: TechnicianRoster, resident: bool = True) -> str:
+        """Store a roster snapshot, evicting the least recently used past MAX_ROSTER_VERSIONS; call with _roster_lock held."""
+        if version is None:
+            version = f"r{next(self._version_counter)}"
+        self.rosters[version] = roster
+        self.rosters.move_to_end(version)
+        while len(self.rosters) > MAX_ROSTER_VERSIONS:
+            self.rosters.popitem(last=False)
+        if resident:
+            self.roster = roster
+            self.roster_version = version
+        return version
+
+    def handle(self, request: dict) -> dict:
+        """Handle a single decoded request and return the tagged response."""
+        try:
+            result, work = self._bind(request)
+            if work is not None:
+                result = work()
+        except Exception as e:
+            result = {"error": f"Unexpected error: {str(e)}"}
+
+        return {"id": request.get("id"), "result": result}
+
+    def submit(self, request: dict, respond):
+        """
+        Handle a request, calling respond(response) when it is answered.
+
+        Requests that may wait on the AI fallback run on the worker pool, so
+        later deterministic requests are answered without waiting for them;
+        responses can therefore arrive out of order and carry the request id.
+        """
+        request_id = request.get("id")
+        try:
+            result, work = self._bind(request)
+        except Exception as e:
+            respond({"id": request_id, "result": {"error": f"Unexpected error: {str(e)}"}})
+            return
+
+        if work is None:
+            respond({"id": request_id, "result": result})
+            return
+
+        def run():
+            assignment_stats.begin_request()
+            try:
+                deferred_result = work()
+            except Exception as e:
+                deferred_result = {"error": f"Unexpected error: {str(e)}"}
+            respond({"id": request_id, "result": deferred_result})
+
+        self._pool.submit(run)
+
+    def _decode(self, line: str):
+        try:
+            with assignment_stats.stage("parse"):
+                request = json_codec.loads(line)
+        except ValueError as e:
+            # JSONDecodeError, or UnicodeDecodeError for a line that is not UTF-8
+            return None, {"id": None, "result": {"error": f"Invalid JSON input: {str(e)}"}}
+
+        if not isinstance(request, dict):
+            return None, {"id": None, "result": {"error": "Request must be a JSON object"}}
+        return request, None
+
+    def _encode(self, response: dict) -> bytes:
+        """Encode a response as one compact UTF-8 line, adding this thread's request timings when enabled."""
+        request_timings = assignment_stats.end_request()
+        if request_timings is not None:
+            response["_timings"] = request_timings
+        with assignment_stats.stage("serialize"):
+            return json_codec.dumps_bytes(response)
+
+    def handle_line(self, line) -> str:
+        """Decode one NDJSON request line and return the encoded response line."""
+        assignment_stats.begin_request()
+        request, error = self._decode(line)
+        response = error if error is not None else self.handle(request)
+        return self._encode(response).decode('utf-8')
+
+    def submit_line(self, line, write_line):
+        """Decode one NDJSON request line (str or UTF-8 bytes) and pass the encoded response bytes to write_line."""
+        assignment_stats.begin_request()
+        request, error = self._decode(line)
+        if error is not None:
+            write_line(self._encode(error))
+            return
+        self.submit(request, lambda response: write_line(self._encode(response)))
+
+    def drain(self):
+        """Wait for every deferred request to be answered."""
+        self._pool.shutdown(wait=True)
+
+
+def _line_writer(write, flush):
+    """Return a thread-safe function writing one response line to a stream."""
+    lock = threading.Lock()
+
+    def write_line(line: bytes):
+        with lock:
+            write(line)
+            flush()
+
+    return write_line
+
+
+def serve_stdio(worker: AssignmentWorker):
+    """Answer newline-delimited JSON requests from stdin until EOF."""
+    stdout = sys.stdout.buffer
+    write_line = _line_writer(lambda line: stdout.write(line + b"\n"), stdout.flush)
+    for line in sys.stdin.buffer:
+        if not line.strip():
+            continue
+        worker.submit_line(line, write_line)
+    worker.drain()
+
+
+def serve_unix_socket(worker: AssignmentWorker, socket_path: str):
+    """Answer newline-delimited JSON requests on a local Unix socket."""
+    import socketserver
+
+    class _Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            write_line = _line_writer(lambda line: self.wfile.write(line + b"\n"), self.wfile.flush)
+            for line in self.rfile:
+                if not line.strip():
+                    continue
+                worker.submit_line(line, write_line)
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+    server = socketserver.ThreadingUnixStreamServer(socket_path, _Handler)
+    server.daemon_threads = True
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
 
 # ---------------------------
 # Test Function
@@ -364,14 +1052,52 @@ def test_assignment():
         print(f"Result type: {type(result)}")
         print(f"Result: {result}")
 
+IMPORT_MS = (time.perf_counter() - _import_started) * 1000
+
 # ---------------------------
 # Run if called directly
 # ---------------------------
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Technician assignment agent")
+    parser.add_argument("--worker", action="store_true",
+                        help="Serve newline-delimited JSON requests from stdin until EOF")
+    parser.add_argument("--socket", metavar="PATH",
+                        help="Serve newline-delimited JSON requests on a Unix socket")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Bypass the on-disk cache of AI fallback assignments")
+    parser.add_argument("--ai-timeout", type=float, metavar="SECONDS",
+                        help=f"Deadline for the AI fallback (default {AI_FALLBACK_TIMEOUT:g})")
+    parser.add_argument("--timings", choices=TIMINGS_OUTPUTS, default=timings_output,
+                        help="Record per-stage timings and add them to the output JSON or print them to stderr")
+    parser.add_argument("--compact", action="store_true",
+                        help="Print the result JSON on one line instead of indented")
+    args = parser.parse_args()
+
+    if args.timings:
+        assignment_stats.enabled = True
+        assignment_stats.record("import", IMPORT_MS)
+
+    if args.no_cache:
+        cache_enabled = False
+    if args.ai_timeout is not None:
+        AI_FALLBACK_TIMEOUT = args.ai_timeout
+
+    if args.socket:
+        serve_unix_socket(AssignmentWorker(), args.socket)
+    elif args.worker:
+        serve_stdio(AssignmentWorker())
     # Check if we're being called from backend (with stdin data) or for testing
-    if not sys.stdin.isatty():
+    elif not sys.stdin.isatty():
         # Called from backend with stdin data
-        main()
+        main(args.timings, args.compact or None)
     else:
         # Called directly for testing
-        test_assignment()
\ No newline at end of file
+        test_assignment()
+
+    # Don't let LLM calls that missed their deadline hold the process open
+    if abandoned_fallbacks:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(0)
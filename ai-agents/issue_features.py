@@ -0,0 +1,113 @@
+"""
+Keyword features extracted from an issue's title and description
+"""
+import re
+
+# Categories accepted by the Issue model (backend/models/Issue.js)
+ISSUE_CATEGORIES = (
+    "plumbing", "electrical", "carpentry", "painting", "cleaning",
+    "security", "elevator", "parking", "garden", "other"
+)
+
+# Matched anywhere in the text, like the original per-keyword `in` checks.
+# Some also hint at a category.
+URGENT_KEYWORDS = {
+    "emergency": None,
+    "urgent": None,
+    "broken": None,
+    "not working": None,
+    "leak": "plumbing",
+    "spark": "electrical",
+}
+
+# Matched at the start of a word, so "tap" finds "taps" but not "startup"
+CATEGORY_KEYWORDS = {
+    "plumbing": ["plumb", "pipe", "tap", "faucet", "drain", "sink", "toilet", "flush", "water", "geyser"],
+    "electrical": ["electric", "power", "wiring", "switch", "socket", "fuse", "bulb", "light", "fan", "short circuit", "mcb"],
+    "carpentry": ["carpent", "door", "window", "cabinet", "cupboard", "furniture", "hinge", "wood"],
+    "painting": ["paint", "peeling", "whitewash", "dampness"],
+    "cleaning": ["clean", "garbage", "trash", "dust", "sweep", "dirty", "stink", "smell"],
+    "security": ["security", "guard", "cctv", "theft", "intruder", "stolen", "gate"],
+    "elevator": ["lift", "elevator"],
+    "parking": ["parking", "parked", "vehicle", "scooter", "bike"],
+    "garden": ["garden", "plants", "lawn", "grass", "hedge", "pruning"],
+}
+
+
+class IssueFeatures:
+    """Urgency flags and keyword category scores for one issue."""
+    __slots__ = ("urgent_keywords", "category_scores")
+
+    def __init__(self, urgent_keywords: list, category_scores: dict):
+        self.urgent_keywords = urgent_keywords
+        self.category_scores = category_scores
+
+    @property
+    def urgent(self) -> bool:
+        return bool(self.urgent_keywords)
+
+    @property
+    def category_guess(self):
+        """Category with the most keyword hits, or None when nothing matched."""
+        if not self.category_scores:
+            return None
+        # Ties go to the category whose keyword appeared first
+        return max(self.category_scores, key=self.category_scores.get)
+
+
+class IssueFeatureExtractor:
+    """Single compiled matcher for urgency and category keywords.
+
+    Every keyword is one alternative of one regex wrapped in a lookahead, so
+    a single finditer over the lowercased text reports every occurrence of
+    every keyword. No keyword may be a prefix of another; that keeps at most
+    one keyword per text position, so none are shadowed.
+    """
+
+    def __init__(self, urgent_keywords: dict = None, category_keywords: dict = None):
+        urgent_keywords = URGENT_KEYWORDS if urgent_keywords is None else urgent_keywords
+        category_keywords = CATEGORY_KEYWORDS if category_keywords is None else category_keywords
+
+        # keyword -> (is urgent, category hint)
+        self.keywords = {keyword: (True, category) for keyword, category in urgent_keywords.items()}
+        for category, keywords in category_keywords.items():
+            for keyword in keywords:
+                if keyword in self.keywords:
+                    raise ValueError(f"Keyword listed twice: {keyword!r}")
+                self.keywords[keyword] = (False, category)
+
+        ordered = sorted(self.keywords)
+        for shorter, longer in zip(ordered, ordered[1:]):
+            if longer.startswith(shorter):
+                raise ValueError(f"Keyword {shorter!r} is a prefix of {longer!r}")
+
+        alternatives = [
+            re.escape(keyword) if urgent else r"\b" + re.escape(keyword)
+            for keyword, (urgent, _) in self.keywords.items()
+        ]
+        self.pattern = re.compile("(?=(" + "|".join(alternatives) + "))")
+
+    def extract(self, title, description) -> IssueFeatures:
+        """Scan the title and description once and return their features."""
+        # The newline keeps a keyword from spanning the two fields
+        text = f"{title or ''}\n{description or ''}".lower()
+
+        urgent_keywords = []
+        category_scores = {}
+        for match in self.pattern.finditer(text):
+            keyword = match.group(1)
+            urgent, category = self.keywords[keyword]
+            if urgent:
+                urgent_keywords.append(keyword)
+            if category:
+                category_scores[category] = category_scores.get(category, 0) + 1
+
+        return IssueFeatures(urgent_keywords, category_scores)
+
+
+default_extractor = IssueFeatureExtractor()
+
+
+def extract_features(title, description) -> IssueFeatures:
+    """Extract features with the default keyword tables."""
+    return default_extractor.extract(title, description)
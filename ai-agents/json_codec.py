@@ -0,0 +1,80 @@
+"""
+JSON encoding and decoding for agent input and output
+
+Uses orjson when it is installed and the standard library otherwise. Both
+produce the same text: UTF-8 without ASCII escaping, two-space indentation
+when indented, and no spaces after separators when compact. NaN and
+infinite floats are written as null either way, as orjson does, since
+NaN is not valid JSON for the backend to parse. The one difference left
+is the exponent of floats under 1e-4 in magnitude with a one-digit
+exponent: orjson writes 1e-7 where the standard library writes 1e-07;
+both read back as the same number. Set AGENT_JSON=stdlib to force the
+standard library.
+"""
+import json
+import math
+import os
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if os.getenv("AGENT_JSON", "").lower() == "stdlib":
+    orjson = None
+
+ENCODER = "orjson" if orjson is not None else "json"
+
+
+def dumps_bytes(obj, indent: bool = False) -> bytes:
+    """Encode obj as UTF-8 JSON bytes, indented by two spaces or fully compact."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+        except TypeError:
+            # Values orjson refuses (non-string keys, huge ints) take the stdlib path
+            pass
+    return dumps(obj, indent).encode("utf-8")
+
+
+def dumps(obj, indent: bool = False) -> str:
+    """Encode obj as a JSON string with the same layout as dumps_bytes."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0).decode("utf-8")
+        except TypeError:
+            pass
+    try:
+        return _stdlib_dumps(obj, indent)
+    except ValueError as e:
+        if "Out of range float" not in str(e):
+            raise
+        return _stdlib_dumps(_finite(obj), indent)
+
+
+def _stdlib_dumps(obj, indent: bool) -> str:
+    if indent:
+        return json.dumps(obj, indent=2, ensure_ascii=False, allow_nan=False)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), allow_nan=False)
+
+
+def _finite(obj):
+    """obj with NaN and infinite floats replaced by None, as orjson writes them."""
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {key: _finite(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_finite(value) for value in obj]
+    return obj
+
+
+def loads(text):
+    """Decode JSON text or bytes; invalid input raises json.JSONDecodeError as with json.loads."""
+    if orjson is not None:
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            # Re-parse for the stdlib error message (and its NaN/Infinity support)
+            pass
+    return json.loads(text)
@@ -0,0 +1,202 @@
+"""
+Near-duplicate bill detection by blocking and vectorized similarity scoring
+"""
+import difflib
+import re
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_THRESHOLD = 0.9
+DEFAULT_DATE_WINDOW = 3
+# Each bill is compared with at most this many later bills of its block, in
+# date order, which keeps candidate generation linear in the number of bills
+MAX_NEIGHBORS = 20
+
+# Share of the similarity score given to each field; they sum to 1
+WEIGHTS = {"name": 0.35, "amount": 0.2, "date": 0.2, "comments": 0.15, "status": 0.1}
+
+_NON_WORD = re.compile(r"[^\w\s]+")
+_PHONETIC_CODES = {letter: str(code) for code, letters in enumerate(
+    ["aeiouyhw", "bfpv", "cgjkqsxz", "dt", "l", "mn", "r"]) for letter in letters}
+NO_DAY = np.iinfo(np.int64).min // 2
+
+
+def normalize_text(value) -> str:
+    """Lowercase, drop punctuation and collapse whitespace ("Raj  verma." -> "raj verma")."""
+    if not isinstance(value, str):
+        return ""
+    return " ".join(_NON_WORD.sub(" ", value.lower()).split())
+
+
+def phonetic_key(name: str) -> str:
+    """Soundex-style key of a whole name: first letter, then consonant classes without repeats or vowels.
+
+    Digits and letters outside a-z are kept as they are.
+    """
+    key = []
+    previous = None
+    for char in name:
+        code = _PHONETIC_CODES.get(char)
+        if code is None:
+            if char.isalnum():
+                key.append(char)
+                previous = None
+            continue
+        if not key:
+            key.append(char)
+        elif code != previous and code != "0":
+            key.append(code)
+        if char not in "hw":
+            previous = code
+    return "".join(key)
+
+
+def _text_codes(column: pd.Series):
+    """Integer code per row and the normalized distinct texts the codes index."""
+    # Normalize each distinct raw text once, then merge those that normalize alike
+    raw_codes, raw_uniques = pd.factorize(column)
+    normalized_codes, texts = pd.factorize(pd.Series([normalize_text(text) for text in raw_uniques] + [""]))
+    return normalized_codes[raw_codes], list(texts)
+
+
+def pair_similarity(codes_a: np.ndarray, codes_b: np.ndarray, texts: list, needed: np.ndarray = None) -> np.ndarray:
+    """
+    difflib ratio of texts[codes_a[i]] and texts[codes_b[i]], scored once per distinct pair.
+
+    Pairs are grouped by their second text so each SequenceMatcher indexes
+    it once. With needed, a pair whose cheap upper bound (real_quick_ratio,
+    then quick_ratio) is already below needed[i] for all its rows gets
+    that bound instead of its exact ratio: it stays below needed either way.
+    """
+    # One int64 key per pair; np.unique over rows of a 2-D array is several times slower
+    size = np.int64(max(len(texts), 1))
+    keys, inverse = np.unique(np.minimum(codes_a, codes_b).astype(np.int64) * size + np.maximum(codes_a, codes_b),
+                              return_inverse=True)
+    distinct = np.stack([keys // size, keys % size], axis=1)
+    inverse = inverse.reshape(-1)
+    floor = np.full(len(distinct), -np.inf)
+    if needed is not None:
+        floor = np.full(len(distinct), np.inf)
+        # A little slack so rounding in the caller's sums never turns a bound into a link
+        np.minimum.at(floor, inverse, needed - 1e-9)
+
+    scores = np.ones(len(distinct), dtype=np.float64)
+    matcher = difflib.SequenceMatcher(None)
+    current = None
+    # Grouped by the second text, the one the matcher indexes
+    for index in np.lexsort((distinct[:, 0], distinct[:, 1])).tolist():
+        a, b = distinct[index].tolist()
+        if a == b:
+            continue
+        if b != current:
+            matcher.set_seq2(texts[b])
+            current = b
+        matcher.set_seq1(texts[a])
+        bound = matcher.real_quick_ratio()
+        if bound >= floor[index]:
+            bound = matcher.quick_ratio()
+            if bound >= floor[index]:
+                bound = matcher.ratio()
+        scores[index] = bound
+    return scores[inverse]
+
+
+def candidate_pairs(block: np.ndarray, day: np.ndarray, date_window: int, max_neighbors: int = MAX_NEIGHBORS):
+    """
+    Row pairs in the same block whose dates are at most date_window days apart.
+
+    Rows are sorted by (block, day) and each is paired with the following
+    rows while they stay in its block and window (sorted neighbourhood), so
+    the work is O(n * max_neighbors) however the blocks are sized.
+    """
+    order = np.lexsort((day, block))
+    sorted_block = block[order]
+    sorted_day = day[order]
+    left, right = [], []
+    for offset in range(1, max_neighbors + 1):
+        same = ((sorted_block[offset:] == sorted_block[:-offset])
+                & (sorted_day[offset:] - sorted_day[:-offset] <= date_window))
+        if not same.any():
+            break
+        positions = np.flatnonzero(same)
+        left.append(order[positions])
+        right.append(order[positions + offset])
+    if not left:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(left), np.concatenate(right)
+
+
+def connected_components(size: int, left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """Smallest row index in each row's cluster, by min-label propagation with pointer jumping."""
+    labels = np.arange(size)
+    while True:
+        previous = labels.copy()
+        lowest = np.minimum(labels[left], labels[right])
+        np.minimum.at(labels, left, lowest)
+        np.minimum.at(labels, right, lowest)
+        labels = labels[labels]
+        if np.array_equal(labels, previous):
+            return labels
+
+
+def find_near_duplicates(df: pd.DataFrame, threshold: float = DEFAULT_THRESHOLD,
+                         date_window: int = DEFAULT_DATE_WINDOW):
+    """
+    Cluster bills that are probably the same charge entered twice.
+
+    Candidates share a phonetic resident-name key and the amount rounded to
+    a whole unit, and are at most date_window days apart. Each candidate
+    pair is scored on name, amount, date, comments and status (see WEIGHTS);
+    pairs scoring at least threshold are linked and linked bills form a
+    cluster.
+
+    Returns:
+        (cluster_ids, scores): per row, the first row of its cluster or -1
+        when it has no near duplicate, and {cluster_id: lowest pair score
+        that joined the cluster}
+    """
+    size = len(df)
+    if size == 0:
+        return np.empty(0, dtype=np.int64), {}
+    name_codes, names = _text_codes(df['Resident Name'])
+    comment_codes, comments = _text_codes(df['Comments'])
+    status_codes, _ = _text_codes(df['Status'])
+
+    amount = pd.to_numeric(df['Amount'], errors='coerce').to_numpy(dtype=np.float64)
+    amount_bucket = np.where(np.isnan(amount), np.iinfo(np.int64).min, np.round(np.nan_to_num(amount))).astype(np.int64)
+    dates = pd.to_datetime(df['Date'], errors='coerce').to_numpy(dtype='datetime64[D]')
+    day = np.where(np.isnat(dates), NO_DAY, dates.astype(np.int64))
+
+    name_keys = pd.factorize(pd.Series([phonetic_key(name.replace(" ", "")) for name in names]))[0]
+    block = pd.MultiIndex.from_arrays([name_keys[name_codes], amount_bucket]).factorize()[0]
+    left, right = candidate_pairs(block, day, date_window)
+
+    amount_left, amount_right = amount[left], amount[right]
+    amount_scale = np.maximum(np.maximum(np.abs(amount_left), np.abs(amount_right)), 1.0)
+    amount_score = np.where(np.isnan(amount_left) & np.isnan(amount_right), 1.0,
+                            np.nan_to_num(1.0 - np.abs(amount_left - amount_right) / amount_scale))
+    date_score = 1.0 - np.abs(day[left] - day[right]) / (date_window + 1)
+    status_score = status_codes[left] == status_codes[right]
+    # Text is scored last and only as exactly as the threshold needs: a pair
+    # that cannot reach it even with identical comments keeps a name bound
+    rest = WEIGHTS["amount"] * amount_score + WEIGHTS["date"] * date_score + WEIGHTS["status"] * status_score
+    name_score = pair_similarity(name_codes[left], name_codes[right], names,
+                                 (threshold - rest - WEIGHTS["comments"]) / WEIGHTS["name"])
+    comment_score = pair_similarity(comment_codes[left], comment_codes[right], comments,
+                                    (threshold - rest - WEIGHTS["name"] * name_score) / WEIGHTS["comments"])
+    score = (WEIGHTS["name"] * name_score
+             + WEIGHTS["amount"] * amount_score
+             + WEIGHTS["date"] * date_score
+             + WEIGHTS["comments"] * comment_score
+             + WEIGHTS["status"] * status_score)
+
+    linked = score >= threshold
+    left, right, score = left[linked], right[linked], score[linked]
+    labels = connected_components(size, left, right)
+    cluster_ids = np.full(size, -1, dtype=np.int64)
+    cluster_ids[left] = labels[left]
+    cluster_ids[right] = labels[right]
+
+    lowest = pd.Series(score).groupby(labels[left]).min()
+    return cluster_ids, {int(cluster): round(float(value), 3) for cluster, value in lowest.items()}
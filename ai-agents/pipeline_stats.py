@@ -0,0 +1,145 @@
+"""
+Opt-in stage timings and path counters for the assignment pipeline
+"""
+import threading
+import time
+
+# Histogram bucket upper bounds in milliseconds; the last bucket is unbounded
+BUCKET_BOUNDS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class StageHistogram:
+    """Cumulative latency histogram for one pipeline stage."""
+    __slots__ = ("buckets", "count", "total_ms", "max_ms")
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, elapsed_ms: float):
+        index = 0
+        while index < len(BUCKET_BOUNDS_MS) and elapsed_ms > BUCKET_BOUNDS_MS[index]:
+            index += 1
+        self.buckets[index] += 1
+        self.count += 1
+        self.total_ms += elapsed_ms
+        if elapsed_ms > self.max_ms:
+            self.max_ms = elapsed_ms
+
+    def to_dict(self) -> dict:
+        labels = [f"<={bound:g}ms" for bound in BUCKET_BOUNDS_MS] + [f">{BUCKET_BOUNDS_MS[-1]:g}ms"]
+        return {
+            "count": self.count,
+            "total_ms": round(self.total_ms, 3),
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 3),
+            "buckets": {label: count for label, count in zip(labels, self.buckets) if count}
+        }
+
+
+class _StageTimer:
+    __slots__ = ("stats", "name", "started")
+
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stats.record(self.name, (time.perf_counter() - self.started) * 1000)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class PipelineStats:
+    """Per-stage durations and path counters, per request and cumulative.
+
+    Nothing is recorded unless ``enabled`` is set. Between begin_request()
+    and end_request() the calling thread also collects its own timings, which
+    end_request() returns for the ``_timings`` output block.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.histograms = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def stage(self, name: str):
+        """Context manager timing one stage; a no-op when disabled."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _StageTimer(self, name)
+
+    def record(self, name: str, elapsed_ms: float):
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = StageHistogram()
+            histogram.add(elapsed_ms)
+
+        timings = getattr(self._local, "timings", None)
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + elapsed_ms
+
+    def count(self, name: str):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + 1
+
+        paths = getattr(self._local, "paths", None)
+        if paths is not None:
+            paths[name] = paths.get(name, 0) + 1
+
+    def begin_request(self):
+        if self.enabled:
+            self._local.timings = {}
+            self._local.paths = {}
+
+    def end_request(self):
+        """Return this thread's timings since begin_request(), or None when disabled."""
+        timings = getattr(self._local, "timings", None)
+        if timings is None:
+            return None
+        paths = self._local.paths
+        self._local.timings = None
+        self._local.paths = None
+        return {
+            "stages_ms": {name: round(elapsed_ms, 3) for name, elapsed_ms in timings.items()},
+            "paths": paths
+        }
+
+    def snapshot(self) -> dict:
+        """Cumulative histograms and counters since start (or the last reset)."""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "stages": {name: histogram.to_dict() for name, histogram in self.histograms.items()},
+                "counters": dict(self.counters)
+            }
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+            self.counters = {}
@@ -2,16 +2,17 @@
 """
 Simple test script for the billing agent without external dependencies
 """
-import pandas as pd
 import json
 import sys
 from pathlib import Path
 
+from bill_schema import cell_text, normalize_text_column, read_bills
+
 def simple_duplicate_check(csv_file_path):
     """Simple duplicate detection without external dependencies"""
     try:
-        # Read CSV file
-        df = pd.read_csv(csv_file_path)
+        # Read CSV file with the shared bill schema
+        df = read_bills(csv_file_path)
         
         print(f"Total records: {len(df)}")
         print(f"File: {csv_file_path}")
@@ -19,11 +20,10 @@ def simple_duplicate_check(csv_file_path):
         # Check for duplicates based on key columns
         columns_to_check = ['Resident Name', 'Amount', 'Status', 'Date', 'Comments']
         
-        # Clean string columns
+        # Clean string columns (once per distinct value for categories)
         df_clean = df.copy()
         for col in columns_to_check:
-            if df_clean[col].dtype == 'object':
-                df_clean[col] = df_clean[col].str.strip().str.lower()
+            df_clean[col] = normalize_text_column(df_clean[col])
         
         # Find duplicates
         duplicate_rows = df[df_clean.duplicated(subset=columns_to_check, keep=False)]
@@ -43,14 +43,14 @@ def simple_duplicate_check(csv_file_path):
         
         # Add details for each duplicate group
         if not duplicate_rows.empty:
-            duplicate_groups = df[df_clean.duplicated(subset=columns_to_check, keep=False)].groupby(columns_to_check)
+            duplicate_groups = df[df_clean.duplicated(subset=columns_to_check, keep=False)].groupby(columns_to_check, observed=True)
             
             for group_key, group_data in duplicate_groups:
                 results["duplicate_details"].append({
                     "resident_name": str(group_key[0]),
                     "amount": int(group_key[1]),
                     "status": str(group_key[2]),
-                    "date": str(group_key[3]),
+                    "date": cell_text(group_key[3]),
                     "comments": str(group_key[4]),
                     "bill_ids": group_data['Bill ID'].tolist(),
                     "count": int(len(group_data))
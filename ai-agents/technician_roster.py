@@ -0,0 +1,416 @@
+"""
+Technician roster shared by every issue assigned in one call
+"""
+import hashlib
+import json
+from array import array
+
+EXACT_SKILL_SCORE = 3  # Primary skill match
+PARTIAL_SKILL_SCORE = 2  # Partial skill match
+
+# Categories come from free-text issue fields, so the per-category match
+# table is bounded rather than allowed to grow for the life of a worker.
+MAX_CACHED_CATEGORIES = 1024
+
+# Stored in the rate column when hourlyRate is missing or not a number
+DEFAULT_HOURLY_RATE = 1000
+LOW_HOURLY_RATE = 600
+
+_MISSING = object()
+
+
+def _is_low_rate(hourly_rate) -> bool:
+    return isinstance(hourly_rate, (int, float)) and hourly_rate < LOW_HOURLY_RATE
+
+
+def _lowest_position(mask: int):
+    """Position of the lowest set bit, or None for an empty mask."""
+    return (mask & -mask).bit_length() - 1 if mask else None
+
+
+def mask_positions(mask: int) -> list:
+    """Positions of every set bit, in ascending order."""
+    bits = bin(mask)[:1:-1]
+    positions = []
+    position = bits.find("1")
+    while position != -1:
+        positions.append(position)
+        position = bits.find("1", position + 1)
+    return positions
+
+
+def positions_mask(positions: list, size: int) -> int:
+    """Bitmask with the given positions set."""
+    bitmap = bytearray((size + 7) // 8)
+    for position in positions:
+        bitmap[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(bitmap, "little")
+
+
+class TechnicianRecord:
+    """The fields of one technician that an assignment reads or returns.
+
+    Supports the ``record[key]`` and ``record.get(key)`` lookups the
+    notification code uses on technician dicts, with the same KeyError for
+    a field the original record did not have.
+    """
+    __slots__ = ("id", "name", "phone", "email", "skills", "hourly_rate", "availability", "max_jobs")
+
+    _KEYS = {
+        "_id": "id", "id": "id", "name": "name", "phone": "phone", "email": "email", "skills": "skills",
+        "hourlyRate": "hourly_rate", "availability": "availability", "maxConcurrentJobs": "max_jobs",
+    }
+
+    def __init__(self, tech: dict):
+        self.id = tech.get("_id", tech.get("id"))
+        self.name = tech.get("name", _MISSING)
+        self.phone = tech.get("phone", _MISSING)
+        self.email = tech.get("email", _MISSING)
+        self.skills = tech.get("skills", _MISSING)
+        self.hourly_rate = tech.get("hourlyRate", _MISSING)
+        self.availability = tech.get("availability", _MISSING)
+        self.max_jobs = tech.get("maxConcurrentJobs", _MISSING)
+
+    def __getitem__(self, key: str):
+        value = getattr(self, self._KEYS[key])
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def get(self, key: str, default=None):
+        value = getattr(self, self._KEYS[key], _MISSING) if key in self._KEYS else _MISSING
+        return default if value is _MISSING else value
+
+    def to_dict(self) -> dict:
+        tech = {"_id": self.id}
+        for key in ("name", "phone", "email", "skills", "hourlyRate", "availability", "maxConcurrentJobs"):
+            value = getattr(self, self._KEYS[key])
+            if value is not _MISSING:
+                tech[key] = value
+        return tech
+
+
+class TechnicianRoster:
+    """Technicians stored as columns, with skills interned into bitsets.
+
+    Each technician keeps a slotted record for the notification fields;
+    everything used for matching is columnar. Availability, low rate and
+    multi-skill flags are technician bitmasks (bit ``i`` is technician
+    ``i``), and the points availability and a low rate add to a score
+    are a byte array. Rates are only kept in the records. Every distinct
+    skill string is lowercased once and given a bit in the skill
+    vocabulary; each technician has a skill bitset over that vocabulary
+    and each skill has a technician bitmask. Scoring a category is then
+    a handful of big-integer AND/OR operations instead of a scan over
+    dicts.
+    """
+
+    def __init__(self, technicians: list):
+        self.records = []
+        self.bonus = array("b")
+        self.skill_bits = []
+        self.vocabulary = {}  # lowercased skill -> vocabulary bit
+        self.skill_masks = {}  # lowercased skill -> technician bitmask
+        self._skill_names = {}  # vocabulary bit -> lowercased skill
+        self._interned = {}  # raw skill string -> vocabulary bit
+
+        # Positions are gathered first and turned into bitmasks in one pass;
+        # OR-ing bits into a growing int one technician at a time is quadratic.
+        available = []
+        low_rate = []
+        multi_skilled = []
+        skill_positions = {}  # vocabulary bit -> technician positions
+        for position, tech in enumerate(technicians or []):
+            record, skill_bits, is_available, is_low_rate, is_multi_skilled = self._describe(tech)
+            self.records.append(record)
+            self.skill_bits.append(skill_bits)
+            # Availability and rate each add one point on top of the skill score
+            self.bonus.append(int(is_available) + int(is_low_rate))
+            for skill_bit in self._split_bits(skill_bits):
+                skill_positions.setdefault(skill_bit, []).append(position)
+            if is_available:
+                available.append(position)
+            if is_low_rate:
+                low_rate.append(position)
+            if is_multi_skilled:
+                multi_skilled.append(position)
+
+        size = len(self.records)
+        self.all_mask = (1 << size) - 1
+        self.available_mask = positions_mask(available, size)
+        self.low_rate_mask = positions_mask(low_rate, size)
+        self.multi_skilled_mask = positions_mask(multi_skilled, size)
+        for skill_bit, positions in skill_positions.items():
+            self.skill_masks[self._skill_names[skill_bit]] = positions_mask(positions, size)
+
+        self._positions = None
+        self._invalidate()
+
+    def _describe(self, tech: dict) -> tuple:
+        """Return (record, skill bits, available, low rate, multi-skilled) for one technician.
+
+        New skills are added to the vocabulary, each distinct raw string
+        lowercased only once.
+        """
+        skills = tech.get("skills", [])
+        skill_bits = 0
+        for skill in skills:
+            skill_bit = self._interned.get(skill)
+            if skill_bit is None:
+                name = skill.lower()
+                skill_bit = self.vocabulary.get(name)
+                if skill_bit is None:
+                    skill_bit = self.vocabulary[name] = 1 << len(self.vocabulary)
+                    self.skill_masks[name] = 0
+                    self._skill_names[skill_bit] = name
+                self._interned[skill] = skill_bit
+            skill_bits |= skill_bit
+
+        # Prefer technicians with lower hourly rate (cost-effective)
+        # Prefer technicians with lower hourly rate (cost-effective)
+        return (
+            TechnicianRecord(tech),
+            skill_bits,
+            tech.get("availability") == "available",
+            _is_low_rate(tech.get("hourlyRate", DEFAULT_HOURLY_RATE)),
+            len(skills) >= 2,
+        )
+
+    def _invalidate(self):
+        """Drop everything derived from the columns; called after every change."""
+        self._category_masks = {}
+        self._best_positions = {}
+        self._fingerprint = None
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __bool__(self) -> bool:
+        return bool(self.records)
+
+    @staticmethod
+    def _split_bits(bits: int):
+        while bits:
+            lowest = bits & -bits
+            yield lowest
+            bits ^= lowest
+
+    @classmethod
+    def from_technicians(cls, technicians) -> "TechnicianRoster":
+        """Return technicians as a roster, reusing it if it is one already."""
+        if isinstance(technicians, cls):
+            return technicians
+        return cls(technicians)
+
+    def skills_of(self, position: int) -> list:
+        """Lowercased distinct skills of one technician, in vocabulary order."""
+        return [self._skill_names[bit] for bit in self._split_bits(self.skill_bits[position])]
+
+    @property
+    def fingerprint(self) -> str:
+        """Stable hash of the fields that decide an assignment, in roster order."""
+        if self._fingerprint is None:
+            fields = [
+                [record.id, [skill.lower() for skill in record.get("skills", [])],
+                 record.get("availability"), record.get("hourlyRate")]
+                for record in self.records
+            ]
+            self._fingerprint = hashlib.sha256(json.dumps(fields, default=str).encode("utf-8")).hexdigest()
+        return self._fingerprint
+
+    def category_masks(self, category: str) -> tuple:
+        """Return (exact, partial) technician bitmasks for a category.
+
+        A partial match is a skill containing the category or contained in
+        it. Only the skill vocabulary is searched, never the technicians.
+        """
+        masks = self._category_masks.get(category)
+        if masks is None:
+            exact = self.skill_masks.get(category, 0)
+            partial = 0
+            for skill, mask in self.skill_masks.items():
+                if skill != category and (skill in category or category in skill):
+                    partial |= mask
+            masks = (exact, partial & ~exact)
+
+            if len(self._category_masks) >= MAX_CACHED_CATEGORIES:
+                self._category_masks.clear()
+            self._category_masks[category] = masks
+        return masks
+
+    def category_matches(self, category: str) -> tuple:
+        """Return (exact, partial) technician positions for a category."""
+        exact, partial = self.category_masks(category)
+        return mask_positions(exact), mask_positions(partial)
+
+    def best_match(self, category: str):
+        """Return the position of the highest scoring technician, or None.
+
+        Scores are +3 for an exact skill, +2 for a partial skill, +1 when
+        available and +1 for a rate under 600. Ties go to the technician
+        listed first, and a technician scoring 0 never matches. The answer
+        depends only on the category, so it is cached per category.
+        """
+        if category in self._best_positions:
+            return self._best_positions[category]
+
+        exact, partial = self.category_masks(category)
+        unmatched = self.all_mask & ~(exact | partial)
+        both = self.available_mask & self.low_rate_mask
+        one = self.available_mask ^ self.low_rate_mask
+        neither = self.all_mask & ~(self.available_mask | self.low_rate_mask)
+
+        # Technicians at each score from 5 down to 1
+        levels = (
+            exact & both,
+            (exact & one) | (partial & both),
+            (exact & neither) | (partial & one),
+            (partial & neither) | (unmatched & both),
+            unmatched & one,
+        )
+        best_position = None
+        for mask in levels:
+            if mask:
+                best_position = _lowest_position(mask)
+                break
+
+        if len(self._best_positions) >= MAX_CACHED_CATEGORIES:
+            self._best_positions.clear()
+        self._best_positions[category] = best_position
+        return best_position
+
+    def fallback_position(self) -> tuple:
+        """Return (position, path) for the fallback technician when nothing scores."""
+        # Try to find a general technician with multiple skills
+        if self.multi_skilled_mask:
+            return _lowest_position(self.multi_skilled_mask), "multi_skill_fallback"
+        # Last resort - any available technician
+        if self.available_mask:
+            return _lowest_position(self.available_mask), "available_fallback"
+        # Absolute last resort
+        if self.records:
+            return 0, "first_technician_fallback"
+        return None, None
+
+    def fallback_order(self) -> list:
+        """Every position in fallback preference: multi-skilled, available, then the rest."""
+        return list(dict.fromkeys(
+            mask_positions(self.multi_skilled_mask) + mask_positions(self.available_mask)
+            + list(range(len(self)))
+        ))
+
+    # ---------------------------
+    # Delta updates
+    # ---------------------------
+    def copy(self) -> "TechnicianRoster":
+        """Independent roster sharing the (read-only) records, for patching."""
+        clone = object.__new__(TechnicianRoster)
+        clone.__dict__.update(self.__dict__)
+        for name in ("records", "skill_bits"):
+            setattr(clone, name, list(getattr(self, name)))
+        clone.bonus = array(self.bonus.typecode, self.bonus)
+        for name in ("vocabulary", "skill_masks", "_skill_names", "_interned"):
+            setattr(clone, name, dict(getattr(self, name)))
+        if self._positions is not None:
+            clone._positions = dict(self._positions)
+        clone._invalidate()
+        return clone
+
+    def position_of(self, tech_id):
+        """Position of the first technician with this id, or None."""
+        if self._positions is None:
+            self._positions = {}
+            for position, record in enumerate(self.records):
+                self._positions.setdefault(record.id, position)
+        return self._positions.get(tech_id)
+
+    def _write(self, position: int, tech: dict):
+        """Store tech at position, replacing the technician there or appending."""
+        record, skill_bits, is_available, is_low_rate, is_multi_skilled = self._describe(tech)
+        bit = 1 << position
+        if position == len(self.records):
+            self.records.append(record)
+            self.skill_bits.append(0)
+            self.bonus.append(0)
+            self.all_mask |= bit
+            if self._positions is not None:
+                self._positions.setdefault(record.id, position)
+        else:
+            if self._positions is not None and self.records[position].id != record.id:
+                # A changed id may uncover a later duplicate; rebuild on the next lookup
+                self._positions = None
+            self.records[position] = record
+
+        for skill_bit in self._split_bits(self.skill_bits[position] & ~skill_bits):
+            self.skill_masks[self._skill_names[skill_bit]] &= ~bit
+        for skill_bit in self._split_bits(skill_bits & ~self.skill_bits[position]):
+            self.skill_masks[self._skill_names[skill_bit]] |= bit
+        self.skill_bits[position] = skill_bits
+        self.bonus[position] = int(is_available) + int(is_low_rate)
+        self.available_mask = self.available_mask | bit if is_available else self.available_mask & ~bit
+        self.low_rate_mask = self.low_rate_mask | bit if is_low_rate else self.low_rate_mask & ~bit
+        self.multi_skilled_mask = self.multi_skilled_mask | bit if is_multi_skilled else self.multi_skilled_mask & ~bit
+        self._invalidate()
+
+    def add(self, tech: dict):
+        """Append a technician; like appending to the technicians list."""
+        self._write(len(self.records), tech)
+
+    def update(self, tech_id, fields: dict):
+        """Merge fields into a technician's record, keeping its position."""
+        position = self._require(tech_id)
+        self._write(position, {**self.records[position].to_dict(), **fields})
+
+    def set_availability(self, tech_id, availability: str):
+        self.update(tech_id, {"availability": availability})
+
+    def remove(self, tech_id):
+        """Remove a technician; later technicians move up one position."""
+        position = self._require(tech_id)
+        low_bits = (1 << position) - 1
+
+        def drop(mask):
+            return (mask & low_bits) | ((mask >> (position + 1)) << position)
+
+        for name, mask in self.skill_masks.items():
+            if mask >> position:
+                self.skill_masks[name] = drop(mask)
+        self.available_mask = drop(self.available_mask)
+        self.low_rate_mask = drop(self.low_rate_mask)
+        self.multi_skilled_mask = drop(self.multi_skilled_mask)
+        self.all_mask >>= 1
+        del self.records[position]
+        del self.skill_bits[position]
+        del self.bonus[position]
+        # Later technicians moved up, so the id index is rebuilt on the next lookup
+        self._positions = None
+        self._invalidate()
+
+    def _require(self, tech_id) -> int:
+        position = self.position_of(tech_id)
+        if position is None:
+            raise KeyError(f"Unknown technician: {tech_id}")
+        return position
+
+    def apply_changes(self, changes: list):
+        """Apply roster deltas in order.
+
+        Each change is ``{"action": "add", "technician": {...}}``,
+        ``{"action": "remove", "id": ...}``,
+        ``{"action": "update", "id": ..., "fields": {...}}`` or
+        ``{"action": "availability", "id": ..., "availability": ...}``.
+        Raises KeyError for an unknown technician and ValueError for an
+        unknown action.
+        """
+        for change in changes:
+            action = change.get("action")
+            if action == "add":
+                self.add(change.get("technician") or {})
+            elif action == "remove":
+                self.remove(change.get("id"))
+            elif action == "update":
+                self.update(change.get("id"), change.get("fields") or {})
+            elif action == "availability":
+                self.set_availability(change.get("id"), change.get("availability"))
+            else:
+                raise ValueError(f"Unknown roster change: {action}")
@@ -49,6 +49,341 @@ def test_billing_agent():
         print(f"❌ Error running analysis: {e}")
         return False
 
+def test_counts_report_and_details_agree(tmp_path):
+    """Counts, raw_output and duplicate_details come from the same normalized grouping"""
+    csv_file = tmp_path / "bills.csv"
+    csv_file.write_text(
+        "Bill ID,Resident Name,Amount,Status,Date,Comments\n"
+        "B1,Raj Verma,2000,Paid,2025-07-11,\n"
+        "B2, raj verma ,2000,PAID,2025-07-11,\n"
+        "B3,Neha Patel,1800,Disputed,2025-07-12,Water charges\n"
+        "B4,Neha Patel,1800,Disputed,2025-07-12,water charges \n"
+        "B5,Neha Patel,1800,Paid,2025-07-12,\n"
+    )
+
+    results = run_analysis(str(csv_file))
+
+    assert results["total_records"] == 5
+    assert results["duplicate_records"] == 4
+    assert results["raw_output"].startswith("Duplicate entries found (4 rows)")
+    assert [(group["resident_name"], group["bill_ids"]) for group in results["duplicate_details"]] == [
+        ("Neha Patel", ["B3", "B4"]), ("Raj Verma", ["B1", "B2"])
+    ]
+    assert sum(group["count"] for group in results["duplicate_details"]) == results["duplicate_records"]
+    assert results["duplicate_details"][1]["comments"] == ""
+
+def test_duplicate_details_pages_sorts_and_streams(tmp_path):
+    """Pages are slices of the full listing, sort='size' puts the largest group first, NDJSON has one group per line"""
+    import io
+    from billingagent import write_ndjson
+
+    csv_file = tmp_path / "bills.csv"
+    csv_file.write_text(
+        "Bill ID,Resident Name,Amount,Status,Date,Comments\n"
+        "B1,Raj Verma,2000,Paid,2025-07-11,\n"
+        "B2,Amit Shah,1500,Paid,2025-07-11,\n"
+        "B3,raj verma,2000,Paid,2025-07-11,\n"
+        "B4,Amit Shah,1500,Paid,2025-07-11,\n"
+        "B5,Amit Shah,1500,Paid,2025-07-11,\n"
+        "B6,Neha Patel,1800,Paid,2025-07-12,\n"
+        "B7,Neha Patel,1800,Paid,2025-07-12,\n"
+    )
+
+    full = run_analysis(str(csv_file))
+    assert full["duplicate_groups"] == 3
+    assert [group["resident_name"] for group in full["duplicate_details"]] == ["Amit Shah", "Neha Patel", "Raj Verma"]
+    assert run_analysis(str(csv_file), offset=1, limit=1)["duplicate_details"] == full["duplicate_details"][1:2]
+    by_size = run_analysis(str(csv_file), sort="size", limit=2)
+    assert [group["bill_ids"] for group in by_size["duplicate_details"]] == [["B2", "B4", "B5"], ["B6", "B7"]]
+    assert by_size["duplicate_groups"] == 3
+    # Amount totals cover every group, not just the page
+    assert (by_size["duplicate_amount"], by_size["potential_savings"]) == (4500 + 3600 + 4000, 3000 + 1800 + 2000)
+    assert run_analysis(str(csv_file), chunksize=2, sort="size", limit=2) == by_size
+
+    output = io.StringIO()
+    write_ndjson(run_analysis(str(csv_file), stream=True), output)
+    summary, *groups = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert "duplicate_details" not in summary and summary["duplicate_records"] == 7
+    assert summary["duplicate_amount"] == by_size["duplicate_amount"]
+    assert groups == full["duplicate_details"]
+
+def test_typed_bill_schema_loads_categories_and_dates(tmp_path):
+    """Categorical normalization merges variants like plain text does, and the typed load is smaller"""
+    import pandas as pd
+    from bill_schema import memory_report, normalize_text_column, read_bills
+
+    csv_file = tmp_path / "bills.csv"
+    csv_file.write_text(
+        "Bill ID,Resident Name,Amount,Status,Date,Comments,Extra\n"
+        "B1,Raj Verma,2000,Paid,2025-07-11,,x\n"
+        "B2, raj verma ,2000,PAID,2025-07-11,,y\n"
+        "B3,Neha Patel,1800,Disputed,2025-07-12,Water,z\n"
+    )
+    df = read_bills(str(csv_file))
+    assert list(df.columns) == ["Bill ID", "Resident Name", "Amount", "Status", "Date", "Comments"]
+    assert isinstance(df["Status"].dtype, pd.CategoricalDtype)
+    assert pd.api.types.is_datetime64_dtype(df["Date"].dtype)
+
+    names = normalize_text_column(df["Resident Name"])
+    assert names.tolist() == ["raj verma", "raj verma", "neha patel"]
+    assert list(names.cat.categories) == ["neha patel", "raj verma"]
+    assert normalize_text_column(df["Comments"]).isna().tolist() == [True, True, False]
+
+    assert run_analysis(str(csv_file))["duplicate_details"][0]["date"] == "2025-07-11"
+    report = memory_report(str(csv_file))
+    assert report["typed"]["columns"]["Status"]["dtype"] == "category"
+
+def test_analyzer_pipeline_shares_one_load(tmp_path):
+    """Residents, status and anomaly analyses run beside duplicates without changing its result"""
+    csv_file = tmp_path / "bills.csv"
+    rows = ["Bill ID,Resident Name,Amount,Status,Date,Comments"]
+    rows += [f"B{i},Raj Verma,1000,Paid,2025-07-{i + 1:02d}," for i in range(6)]
+    rows += ["B6,raj verma ,9000,Unpaid,2025-08-01,", "B7,Neha Patel,1500,Disputed,2025-08-02,Water"]
+    csv_file.write_text("\n".join(rows) + "\n")
+
+    plain = run_analysis(str(csv_file))
+    results = run_analysis(str(csv_file), analyzers=["duplicates", "residents", "status", "anomalies"])
+    assert {key: value for key, value in results.items() if key not in ("analyzers", "analyses")} == plain
+
+    residents = results["analyses"]["residents"]["residents"]
+    assert residents[1] == {"resident_name": "Raj Verma", "bills": 7, "total_amount": 15000.0,
+                            "average_amount": 2142.86, "disputes": 0, "dispute_rate": 0.0, "unpaid_amount": 9000.0}
+    status = results["analyses"]["status"]
+    assert [month["month"] for month in status["by_month"]] == ["2025-07", "2025-08"]
+    assert (status["unpaid_amount"], status["disputed_bills"]) == (9000.0, 1)
+
+    anomalies = results["analyses"]["anomalies"]["anomalies"]
+    assert [(row["bill_id"], row["baseline"], row["expected_amount"]) for row in anomalies] == [("B6", "resident", 1000.0)]
+    assert "error" in run_analysis(str(csv_file), chunksize=2, analyzers=["residents"])
+
+def write_repeated_bills(csv_file):
+    """Write 240 bills over a few residents, with case, spacing and missing-value variants, to csv_file"""
+    rows = ["Bill ID,Resident Name,Amount,Status,Date,Comments"]
+    for i in range(240):
+        name = ["Raj Verma", " raj verma", "Neha Patel", "Sneha Rao"][i % 4]
+        date = f"2025-07-{11 + i % 2}" if i % 11 else ""  # some bills have no date
+        rows.append(f"B{i},{name},{1200 + (i % 3) * 400},{'Paid' if i % 5 else 'paid '},{date},{'' if i % 7 else 'Late'}")
+    csv_file.write_text("\n".join(rows) + "\n")
+    return csv_file
+
+def test_chunked_analysis_matches_full_load(tmp_path):
+    """Streaming in small chunks gives exactly the in-memory result, truncated listing included"""
+    csv_file = write_repeated_bills(tmp_path / "bills.csv")
+
+    full = run_analysis(str(csv_file))
+    assert full["duplicate_records"] > 100
+    for chunksize in (1, 17, 1000):
+        assert run_analysis(str(csv_file), chunksize=chunksize) == full
+
+    sample = str(Path(__file__).parent / "samplemaintenance.csv")
+    assert run_analysis(sample, chunksize=10) == run_analysis(sample)
+
+def test_bills_streamed_as_csv_or_ndjson_match_file_mode(tmp_path):
+    """One pass over piped CSV or NDJSON gives the file result, truncated listing included"""
+    import io
+    import subprocess
+    import pandas as pd
+    from billingagent import run_stream_analysis
+
+    csv_file = write_repeated_bills(tmp_path / "bills.csv")
+    records = pd.read_csv(csv_file, dtype=str).to_dict("records")
+    ndjson = "\n".join(json.dumps({key: value for key, value in record.items() if isinstance(value, str)})
+                       for record in records)
+
+    full = {**run_analysis(str(csv_file)), "csv_file": "<stdin>"}
+    assert full["duplicate_records"] > 100
+    for chunksize in (1, 17, 1000):
+        assert run_stream_analysis(io.StringIO(csv_file.read_text()), "csv", chunksize) == full
+        assert run_stream_analysis(io.StringIO(ndjson), "ndjson", chunksize) == full
+
+    script = Path(__file__).parent / "billingagent.py"
+    output = subprocess.run([sys.executable, str(script), "-", "--input-format", "ndjson", "--format", "ndjson"],
+                            input=ndjson, capture_output=True, text=True, check=True).stdout
+    summary, *groups = [json.loads(line) for line in output.splitlines()]
+    assert summary["duplicate_records"] == full["duplicate_records"] and groups == full["duplicate_details"]
+
+def test_profile_records_stages_without_changing_results(tmp_path):
+    """profile=True adds stage timings, peak memory and counts, and can dump cProfile stats"""
+    import pstats
+    import tracemalloc
+
+    sample = str(Path(__file__).parent / "samplemaintenance.csv")
+    cprofile_path = tmp_path / "billing.prof"
+    results = run_analysis(sample, profile=True, cprofile_path=str(cprofile_path))
+    profile = results.pop("profile")
+    assert results == run_analysis(sample)
+    assert {"load", "group", "report", "details", "serialize"} <= set(profile["stages"])
+    assert all(stage["peak_bytes"] <= profile["peak_bytes"] for stage in profile["stages"].values())
+    assert profile["counts"]["rows"] == 52 and profile["counts"]["groups"] == results["duplicate_groups"]
+    assert pstats.Stats(str(cprofile_path)).total_calls > 0 and not tracemalloc.is_tracing()
+
+    chunked = run_analysis(sample, chunksize=10, profile=True)["profile"]
+    assert chunked["stages"]["read"]["calls"] > 5 and "fingerprint" in chunked["stages"]
+
+def test_bill_cache_serves_unchanged_files_and_rebuilds_changed_ones(tmp_path):
+    """Cached loads equal a fresh parse for both backends, and an edited file is never served stale"""
+    import pandas as pd
+    from bill_cache import BillCache, pa
+    from bill_schema import SCHEMA_VERSION, read_bills
+
+    csv_file = tmp_path / "bills.csv"
+    csv_file.write_bytes((Path(__file__).parent / "samplemaintenance.csv").read_bytes())
+
+    for backend in ["npy"] + (["arrow"] if pa is not None else []):
+        cache = BillCache(str(tmp_path / backend), backend=backend)
+        parsed = cache.load(str(csv_file), pd.read_csv)
+        pd.testing.assert_frame_equal(cache.load(str(csv_file), pd.read_csv), parsed)
+        assert (cache.hits, cache.misses) == (1, 1)
+
+        typed = BillCache(str(tmp_path / f"{backend}-typed"), backend=backend, schema=SCHEMA_VERSION)
+        pd.testing.assert_frame_equal(typed.load(str(csv_file), read_bills), typed.load(str(csv_file), read_bills))
+        assert typed.hits == 1
+
+    cache = BillCache(str(tmp_path / "npy"), backend="npy")
+    with open(csv_file, "a") as bills:
+        bills.write("\nBILL999,New Resident,900,Paid,2025-08-01,")
+    assert len(cache.load(str(csv_file), pd.read_csv)) == len(parsed) + 1
+    assert cache.misses == 1
+
+def test_incremental_analysis_reports_only_new_and_grown_groups(tmp_path):
+    """An appended file is resumed from the index, and totals stay equal to a full run"""
+    from billingagent import run_incremental_analysis
+
+    csv_file = tmp_path / "bills.csv"
+    index = str(tmp_path / "index.sqlite3")
+    csv_file.write_text(
+        "Bill ID,Resident Name,Amount,Status,Date,Comments\n"
+        "B1,Raj Verma,2000,Paid,2025-07-11,\n"
+        "B2, raj verma ,2000,PAID,2025-07-11,\n"
+        "B3,Neha Patel,1800,Disputed,2025-07-12,Water charges\n"
+    )
+    first = run_incremental_analysis(str(csv_file), index)
+    assert (first["new_records"], first["duplicate_records"]) == (3, 2)
+    assert [group["change"] for group in first["duplicate_details"]] == ["new"]
+
+    assert run_incremental_analysis(str(csv_file), index)["new_records"] == 0
+
+    with open(csv_file, "a") as bills:
+        bills.write("B4,Raj Verma,2000,Paid,2025-07-11,\nB5,neha patel,1800,Disputed,2025-07-12,water charges\n")
+    second = run_incremental_analysis(str(csv_file), index)
+    full = run_analysis(str(csv_file))
+    assert second["new_records"] == 2
+    assert (second["total_records"], second["duplicate_records"]) == (full["total_records"], full["duplicate_records"])
+    assert [(group["bill_ids"], group["previous_count"], group["change"]) for group in second["duplicate_details"]] == [
+        (["B3", "B5"], 1, "new"), (["B1", "B2", "B4"], 2, "changed")
+    ]
+
+    rebuilt = run_incremental_analysis(str(csv_file), index, rebuild=True)
+    assert (rebuilt["new_records"], rebuilt["duplicate_records"]) == (5, 5)
+
+def test_near_duplicate_mode_clusters_reworded_bills_a_day_apart(tmp_path):
+    """Near-duplicates are clustered with a similarity; monthly repeats and other residents are not"""
+    from billingagent import run_near_duplicate_analysis
+
+    csv_file = tmp_path / "bills.csv"
+    csv_file.write_text(
+        "Bill ID,Resident Name,Amount,Status,Date,Comments\n"
+        "B1,Raj Verma,2000,Paid,2025-07-11,Water charges July\n"
+        "B2,Neha Patel,2000,Paid,2025-07-11,Water charges July\n"
+        "B3,Raj  verma.,2000,Paid,2025-07-12,water charge july\n"
+        "B4,Raj Verma,2000,Paid,2025-08-11,Water charges August\n"
+        "B5,Neha Patel,1800,Paid,2025-07-11,Water charges July\n"
+    )
+
+    results = run_near_duplicate_analysis(str(csv_file))
+
+    assert results["mode"] == "near_duplicate"
+    assert results["duplicate_records"] == 2
+    [cluster] = results["duplicate_details"]
+    assert (cluster["resident_name"], cluster["bill_ids"], cluster["count"]) == ("Raj Verma", ["B1", "B3"], 2)
+    assert 0.9 <= cluster["similarity"] < 1
+    assert run_near_duplicate_analysis(str(csv_file), date_window=0)["duplicate_records"] == 0
+
+def test_pair_similarity_bounds_only_pairs_below_what_is_needed():
+    """Pairs that reach what the caller needs get the exact difflib ratio; the rest stay below it"""
+    import difflib
+    import random
+    import numpy as np
+    from near_duplicates import pair_similarity
+
+    texts = ["raj verma", "raj varma", "rajverma", "neha patel", "", "r verma", "water charges july"]
+    rng = random.Random(5)
+    codes_a = np.array([rng.randrange(len(texts)) for _ in range(300)])
+    codes_b = np.array([rng.randrange(len(texts)) for _ in range(300)])
+    needed = np.array([rng.choice([0.0, 0.5, 0.8, 0.95, 2.0]) for _ in range(300)])
+
+    exact = np.array([difflib.SequenceMatcher(None, texts[min(a, b)], texts[max(a, b)]).ratio()
+                      for a, b in zip(codes_a.tolist(), codes_b.tolist())])
+    assert np.array_equal(pair_similarity(codes_a, codes_b, texts), exact)
+    bounded = pair_similarity(codes_a, codes_b, texts, needed)
+    reached = exact >= needed
+    assert np.array_equal(bounded[reached], exact[reached])
+    assert (bounded[~reached] < needed[~reached]).all()
+
+def test_multi_file_analysis_reports_per_file_and_cross_file_groups(tmp_path):
+    """A bill re-issued in the next export is a cross-file group; each file keeps its own results"""
+    from billingagent import expand_paths, run_multi_file_analysis
+
+    july = tmp_path / "2025-07.csv"
+    july.write_text(
+        "Bill ID,Resident Name,Amount,Status,Date,Comments\n"
+        "B1,Raj Verma,2000,Paid,2025-07-11,\n"
+        "B2,raj verma,2000,Paid,2025-07-11,\n"
+        "B3,Neha Patel,1800,Paid,2025-07-12,Lift\n"
+    )
+    august = tmp_path / "2025-08.csv"
+    august.write_text(
+        "Bill ID,Resident Name,Amount,Status,Date,Comments\n"
+        "C1,Neha Patel,1800,Paid,2025-07-12,lift \n"
+        "C2,Amit Shah,1500,Paid,2025-08-01,\n"
+    )
+    paths = expand_paths([str(tmp_path / "*.csv")])
+    assert paths == [str(july), str(august)]
+
+    merged = run_multi_file_analysis(paths, workers=1)
+    assert [results["duplicate_records"] for results in merged["files"]] == [2, 0]
+    assert merged["files"][0] == run_analysis(str(july))
+    assert (merged["total_records"], merged["duplicate_records"]) == (5, 2)
+    [group] = merged["cross_file_details"]
+    assert (group["resident_name"], group["bill_ids"], group["count"]) == ("Neha Patel", ["B3", "C1"], 2)
+    assert group["files"] == [{"csv_file": str(july), "bill_ids": ["B3"]}, {"csv_file": str(august), "bill_ids": ["C1"]}]
+
+    assert run_multi_file_analysis(paths, workers=2) == merged
+    assert run_multi_file_analysis(paths, workers=2, chunksize=1) == merged
+
+    # A Date column empty in one file is parsed as NaT there and still matches the other file's missing dates
+    undated = tmp_path / "undated.csv"
+    undated.write_text("Bill ID,Resident Name,Amount,Status,Date,Comments\nD1,Amit Shah,900,Paid,,\n")
+    dated = tmp_path / "dated.csv"
+    dated.write_text("Bill ID,Resident Name,Amount,Status,Date,Comments\n"
+                     "E1,amit shah,900,Paid,,\nE2,Neha Patel,1800,Paid,2025-07-12,\n")
+    merged = run_multi_file_analysis([str(undated), str(dated)], workers=1)
+    assert all("error" not in results for results in merged["files"])
+    assert merged["total_records"] == 3
+    assert [group["bill_ids"] for group in merged["cross_file_details"]] == [["D1", "E1"]]
+
+
+def test_billing_benchmark_generator_is_seeded_and_regressions_flagged(tmp_path):
+    """Synthetic exports are reproducible, hold the requested duplicates, and both thresholds are honoured"""
+    from benchmark_billing import compare, generate_bills, write_bills_csv
+
+    assert generate_bills(500, seed=3).equals(generate_bills(500, seed=3))
+    assert not generate_bills(500, seed=3).equals(generate_bills(500, seed=4))
+    bills = generate_bills(1000, duplicate_fraction=0.2, near_noise=0.0, residents=50)
+    assert bills["Bill ID"].is_unique and bills["Resident Name"].str.strip().str.lower().nunique() <= 50
+
+    csv_file = write_bills_csv(str(tmp_path / "bills.csv"), 1000, duplicate_fraction=0.2, near_noise=0.0)
+    results = run_analysis(csv_file)
+    assert results["total_records"] == 1000 and results["duplicate_records"] - results["duplicate_groups"] >= 200
+
+    baseline = {"a": {"seconds_per_op": 1.0, "peak_bytes": 100}, "b": {"seconds_per_op": 1.0, "peak_bytes": 100}}
+    current = {"a": {"seconds_per_op": 1.1, "peak_bytes": 150}, "b": {"seconds_per_op": 1.5, "peak_bytes": 100},
+               "new": {"seconds_per_op": 9.0, "peak_bytes": 1}}
+    assert [(name, metric) for name, metric, _, _ in compare(current, baseline, threshold=0.2)] == [("b", "seconds_per_op")]
+    assert [(name, metric) for name, metric, _, _ in compare(current, baseline, 0.2, memory_threshold=0.2)] == [
+        ("a", "peak_bytes"), ("b", "seconds_per_op")]
+
+
 if __name__ == "__main__":
     success = test_billing_agent()
-    sys.exit(0 if success else 1) 
\ No newline at end of file
+    sys.exit(0 if success else 1)
@@ -0,0 +1,561 @@
+#!/usr/bin/env python3
+"""
+Tests for the technician assignment agent
+"""
+import os
+import sys
+import json
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from categoryagent import AssignmentWorker, assign_technician, assign_technician_batch
+
+SAMPLE_TECHNICIANS = [
+    {
+        "_id": "tech1",
+        "name": "Rajesh Kumar",
+        "phone": "+91 98765 43210",
+        "email": "rajesh.plumber@societyhub.com",
+        "skills": ["plumbing"],
+        "hourlyRate": 800,
+        "availability": "available"
+    },
+    {
+        "_id": "tech2",
+        "name": "Amit Singh",
+        "phone": "+91 98765 43211",
+        "email": "amit.electrician@societyhub.com",
+        "skills": ["electrical"],
+        "hourlyRate": 550,
+        "availability": "available"
+    }
+]
+
+
+def make_issue(category="plumbing", title="Water leak in kitchen sink", description="Water is dripping"):
+    return {
+        "title": title,
+        "description": description,
+        "category": category,
+        "technicians": SAMPLE_TECHNICIANS
+    }
+
+
+def test_assign_technician_direct_match():
+    """The deterministic path picks the technician whose skill matches the category"""
+    result = assign_technician(make_issue())
+
+    assert result["type"] == "technician_assignment"
+    assert result["technician"]["id"] == "tech1"
+    assert result["estimatedTime"] == "2-4 (Urgent)"
+
+
+def test_batch_matches_single_assignments():
+    """A batch over one roster returns the same notifications as one call per issue"""
+    issues = [
+        make_issue(),
+        make_issue(category="electrical", title="Switch sparking"),
+        make_issue(category="garden", title="Hedge overgrown", description="Needs trimming"),
+    ]
+
+    batch = assign_technician_batch([{k: v for k, v in issue.items() if k != "technicians"} for issue in issues],
+                                    SAMPLE_TECHNICIANS)
+
+    assert batch == [assign_technician(issue) for issue in issues]
+    assert [result["technician"]["id"] for result in batch] == ["tech1", "tech2", "tech2"]
+
+
+def test_worker_uses_resident_roster():
+    """Worker requests without technicians fall back to the roster set earlier"""
+    worker = AssignmentWorker()
+
+    roster = json.loads(worker.handle_line(json.dumps({"id": 1, "op": "roster", "technicians": SAMPLE_TECHNICIANS})))
+    assert roster == {"id": 1, "result": {"status": "ok", "technicians": 2, "version": "r1"}}
+
+    issue = make_issue(category="electrical", title="Fan not working")
+    del issue["technicians"]
+    response = json.loads(worker.handle_line(json.dumps({"id": "req-2", "op": "assign", "issue": issue})))
+
+    assert response["id"] == "req-2"
+    assert response["result"]["technician"]["id"] == "tech2"
+
+
+def test_worker_reports_bad_requests():
+    """Malformed lines and unknown ops are answered instead of killing the worker"""
+    worker = AssignmentWorker()
+
+    assert "error" in json.loads(worker.handle_line("{not json"))["result"]
+    assert json.loads(worker.handle_line(json.dumps({"id": 7, "op": "nope"}))) == {
+        "id": 7, "result": {"error": "Unknown op: nope"}
+    }
+
+
+def test_fast_path_does_not_import_llm_stack():
+    """Deterministic assignment and billing analysis must not load crewai or the Gemini client"""
+    import subprocess
+
+    script = (
+        "import sys, json\n"
+        "import categoryagent, billingagent\n"
+        f"issue = json.loads({json.dumps(json.dumps(make_issue()))})\n"
+        "assert 'error' not in categoryagent.assign_technician(issue)\n"
+        "assert 'error' not in billingagent.run_analysis('samplemaintenance.csv')\n"
+        "heavy = [m for m in sys.modules if m.split('.')[0] in ('crewai', 'litellm')"
+        " or m.startswith(('google.generativeai', 'google.genai'))]\n"
+        "print(json.dumps(heavy))\n"
+    )
+    completed = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True, timeout=120
+    )
+
+    assert completed.returncode == 0, completed.stderr
+    assert json.loads(completed.stdout.strip().splitlines()[-1]) == []
+
+
+def test_roster_index_keeps_scan_tie_breaking():
+    """Indexed lookup returns the same technician as the original linear scan"""
+    from technician_roster import TechnicianRoster
+
+    technicians = [
+        {"_id": "busy-electrician", "skills": ["Electrical"], "availability": "busy", "hourlyRate": 900},
+        {"_id": "cheap-cleaner", "skills": ["cleaning"], "availability": "available", "hourlyRate": 400},
+        {"_id": "pipe-fitter", "skills": ["plumbing work"], "availability": "busy", "hourlyRate": 900},
+    ]
+    roster = TechnicianRoster(technicians)
+
+    # Exact match beats everything
+    assert roster.best_match("electrical") == 0
+    # Partial match (2) ties with availability + rate (2); the earlier technician wins
+    assert roster.best_match("plumbing work repair") == 1
+    # Nothing scores for an expensive, busy, unskilled roster; fall back to the first technician
+    busy = TechnicianRoster([{"skills": ["cleaning"], "availability": "busy", "hourlyRate": 900}])
+    assert busy.best_match("elevator") is None
+    assert busy.fallback_position() == (0, "first_technician_fallback")
+
+
+def test_dispatch_spreads_batch_by_capacity():
+    """Bulk dispatch stops giving every issue to the same cheap technician"""
+    from categoryagent import dispatch_technicians_batch
+
+    technicians = [dict(tech, maxConcurrentJobs=1) for tech in SAMPLE_TECHNICIANS]
+    issues = [
+        {"title": "Tap dripping", "category": "plumbing"},
+        {"title": "Fuse blown", "category": "electrical"},
+        {"title": "Pipe burst", "category": "plumbing"},
+    ]
+
+    results = dispatch_technicians_batch(issues, technicians)
+
+    assert [result["technician"]["id"] for result in results[:2]] == ["tech1", "tech2"]
+    assert results[2]["error"] == "No technician has capacity left for this issue"
+    # With room for two jobs each, the second plumbing issue goes to the plumber again
+    results = dispatch_technicians_batch(issues, SAMPLE_TECHNICIANS, max_jobs=2)
+    assert [result["technician"]["id"] for result in results] == ["tech1", "tech2", "tech1"]
+
+
+def test_score_matrix_follows_assignment_rules():
+    """Score matrix rows equal the per-issue scores for each category"""
+    from bulk_dispatch import score_matrix
+    from technician_roster import TechnicianRoster
+
+    scores = score_matrix(["plumbing", "electrical", "plumb"], TechnicianRoster(SAMPLE_TECHNICIANS))
+
+    # tech1: available, 800/hour; tech2: available, 550/hour
+    assert scores.tolist() == [[4, 2], [1, 5], [3, 2]]
+
+
+def test_ai_fallback_answers_repeats_from_cache(monkeypatch):
+    """Near-identical complaints against the same roster reach the LLM once"""
+    import categoryagent
+    from assignment_cache import AssignmentCache
+
+    cache = AssignmentCache(":memory:")
+    calls = []
+
+    def fake_ai_assignment(issue_data):
+        calls.append(issue_data)
+        return {"type": "technician_assignment", "technician": {"id": "tech1"}}
+
+    monkeypatch.setattr(categoryagent, "_assignment_cache", cache)
+    monkeypatch.setattr(categoryagent, "cache_enabled", True)
+    monkeypatch.setattr(categoryagent, "run_ai_assignment", fake_ai_assignment)
+
+    # No technicians, so the deterministic path fails and the AI fallback runs
+    first = assign_technician({"title": "Water leak, flat 101", "category": "Plumbing", "technicians": []})
+    second = assign_technician({"title": "water  leak flat 101!", "category": "plumbing", "technicians": []})
+    assign_technician({"title": "Water leak, flat 101", "category": "plumbing", "technicians": []}, use_cache=False)
+
+    assert first == second == {"type": "technician_assignment", "technician": {"id": "tech1"}}
+    assert len(calls) == 2
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_assignment_cache_expires_and_evicts():
+    """Entries past their TTL miss, and the least recently used entry is evicted first"""
+    from assignment_cache import AssignmentCache
+
+    cache = AssignmentCache(":memory:", ttl_seconds=3600, max_entries=2)
+    cache.put("a", {"n": 1})
+    cache.put("b", {"n": 2})
+    assert cache.get("a") == {"n": 1}
+    cache.put("c", {"n": 3})
+
+    assert cache.get("b") is None
+    assert cache.get("a") == {"n": 1} and cache.get("c") == {"n": 3}
+
+    cache.ttl_seconds = -1
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 1
+
+
+def test_ai_fallback_deadline_and_circuit_breaker(monkeypatch):
+    """Slow LLM answers are abandoned at the deadline and repeated failures open the breaker"""
+    import threading
+    import time
+    import categoryagent
+
+    release = threading.Event()
+    calls = []
+
+    def slow_ai_assignment(issue_data):
+        calls.append(issue_data)
+        release.wait(5)
+        return {"type": "technician_assignment"}
+
+    monkeypatch.setattr(categoryagent, "cache_enabled", False)
+    monkeypatch.setattr(categoryagent, "ai_breaker", categoryagent.CircuitBreaker(failure_threshold=2))
+    monkeypatch.setattr(categoryagent, "run_ai_assignment", slow_ai_assignment)
+
+    issue = {"title": "Lift stuck", "category": "elevator", "technicians": []}
+    try:
+        started = time.monotonic()
+        results = categoryagent.assign_technician_batch([issue, issue], [], timeout=0.2)
+        assert time.monotonic() - started < 2
+        assert results == [{"error": "No technicians available", "category": "elevator"}] * 2
+        assert categoryagent.ai_breaker.state == "open"
+
+        # With the breaker open the LLM is skipped entirely
+        assert categoryagent.assign_technician(issue, timeout=0.2)["error"] == "No technicians available"
+        assert len(calls) == 2
+    finally:
+        release.set()
+
+
+def test_queued_batch_fallbacks_time_out_from_their_start(monkeypatch):
+    """Batch fallbacks queued behind a healthy model are answered and never open the breaker"""
+    import time
+    import categoryagent
+
+    def fast_ai_assignment(issue_data):
+        time.sleep(0.02)
+        return {"type": "technician_assignment", "title": issue_data["title"]}
+
+    monkeypatch.setattr(categoryagent, "cache_enabled", False)
+    monkeypatch.setattr(categoryagent, "ai_breaker", categoryagent.CircuitBreaker(failure_threshold=2))
+    monkeypatch.setattr(categoryagent, "run_ai_assignment", fast_ai_assignment)
+
+    issues = [{"title": f"Lift stuck {n}", "category": "elevator"} for n in range(10 * categoryagent.AI_FALLBACK_CONCURRENCY)]
+    results = categoryagent.assign_technician_batch(issues, [], timeout=0.15)
+
+    assert [result.get("title") for result in results] == [issue["title"] for issue in issues]
+    assert categoryagent.ai_breaker.failures == 0 and categoryagent.ai_breaker.state == "closed"
+
+
+def test_late_ai_answers_do_not_reset_circuit_breaker(monkeypatch):
+    """A model that always answers after the deadline still opens the breaker"""
+    import threading
+    import categoryagent
+
+    answered = threading.Semaphore(0)
+
+    def late_ai_assignment(issue_data):
+        release.wait(5)
+        answered.release()
+        return {"type": "technician_assignment"}
+
+    monkeypatch.setattr(categoryagent, "cache_enabled", False)
+    monkeypatch.setattr(categoryagent, "ai_breaker", categoryagent.CircuitBreaker(failure_threshold=3))
+    monkeypatch.setattr(categoryagent, "run_ai_assignment", late_ai_assignment)
+
+    issue = {"title": "Lift stuck", "category": "elevator", "technicians": []}
+    for _ in range(3):
+        release = threading.Event()
+        assert categoryagent.assign_technician(issue, timeout=0.05)["error"] == "No technicians available"
+        # Let the abandoned call answer before the next request
+        release.set()
+        assert answered.acquire(timeout=5)
+    assert categoryagent.ai_breaker.failures == 3
+    assert categoryagent.ai_breaker.state == "open"
+
+
+def test_worker_answers_fast_requests_while_fallback_waits(monkeypatch):
+    """A request waiting on the LLM does not hold up later deterministic requests"""
+    import threading
+    import categoryagent
+
+    release = threading.Event()
+
+    def slow_ai_assignment(issue_data):
+        release.wait(5)
+        return {"type": "technician_assignment", "source": "ai"}
+
+    monkeypatch.setattr(categoryagent, "cache_enabled", False)
+    monkeypatch.setattr(categoryagent, "ai_breaker", categoryagent.CircuitBreaker())
+    monkeypatch.setattr(categoryagent, "run_ai_assignment", slow_ai_assignment)
+
+    worker = AssignmentWorker()
+    responses = []
+    worker.submit_line(json.dumps({"id": "slow", "issue": {"title": "Lift stuck", "technicians": []}}), responses.append)
+    worker.submit_line(json.dumps({"id": "fast", "issue": make_issue()}), responses.append)
+
+    assert [json.loads(line)["id"] for line in responses] == ["fast"]
+    release.set()
+    worker.drain()
+    assert json.loads(responses[1]) == {"id": "slow", "result": {"type": "technician_assignment", "source": "ai"}}
+
+
+def test_feature_extractor_matches_keyword_scan():
+    """One compiled pass flags urgency exactly like the per-keyword substring checks"""
+    import random
+    from issue_features import URGENT_KEYWORDS, extract_features
+
+    fragments = ["emergency", "Urgent", "brok", "en", "not", " working", "LEAK", "spark", "water", "lift", " ", "\n", "xx"]
+    rng = random.Random(7)
+    for _ in range(500):
+        title = "".join(rng.choice(fragments) for _ in range(rng.randint(0, 6)))
+        description = "".join(rng.choice(fragments) for _ in range(rng.randint(0, 6)))
+        expected = any(keyword in title.lower() or keyword in description.lower() for keyword in URGENT_KEYWORDS)
+        assert extract_features(title, description).urgent == expected, (title, description)
+
+
+def test_missing_category_is_inferred_from_text():
+    """Issues without a known category are matched on the keyword category guess"""
+    issue = make_issue(category="", title="Tap dripping", description="Water pooling under the sink")
+    result = assign_technician(issue)
+
+    # Without inference the empty category partially matches every skill and the cheaper electrician wins
+    assert result["technician"]["id"] == "tech1"
+    assert result["issue"]["category"] == ""
+    assert result["issue"]["inferredCategory"] == "plumbing"
+    assert result["estimatedTime"] == "2-4 hours"
+
+
+def test_unknown_category_matching_a_roster_skill_is_kept():
+    """A category outside the known list is only inferred when no technician has that skill"""
+    from categoryagent import dispatch_technicians_batch
+
+    hvac = dict(SAMPLE_TECHNICIANS[0], _id="tech3", skills=["hvac"], availability="busy", hourlyRate=900)
+    issue = make_issue(category="hvac", title="Fan not cooling", description="AC fan makes noise")
+    issue["technicians"] = SAMPLE_TECHNICIANS + [hvac]
+
+    result = assign_technician(issue)
+    assert result["technician"]["id"] == "tech3"
+    assert "inferredCategory" not in result["issue"]
+    assert dispatch_technicians_batch([issue], issue["technicians"])[0]["technician"]["id"] == "tech3"
+
+    # Without an hvac technician the text still points at the electrician
+    issue["technicians"] = SAMPLE_TECHNICIANS
+    assert assign_technician(issue)["issue"]["inferredCategory"] == "electrical"
+
+
+def test_timings_record_stages_and_fallback_paths(monkeypatch):
+    """Enabled stats report per-request stage timings and which fallback path was taken"""
+    import categoryagent
+    from pipeline_stats import PipelineStats
+
+    stats = PipelineStats(enabled=True)
+    monkeypatch.setattr(categoryagent, "assignment_stats", stats)
+
+    worker = AssignmentWorker()
+    general = dict(SAMPLE_TECHNICIANS[0], skills=["carpentry", "painting"], availability="busy", hourlyRate=900)
+    response = json.loads(worker.handle_line(json.dumps(
+        {"id": 1, "issue": make_issue(category="elevator", title="Lift stuck") | {"technicians": [general]}}
+    )))
+
+    assert response["_timings"]["paths"] == {"multi_skill_fallback": 1}
+    assert {"parse", "features", "match", "estimate"} <= set(response["_timings"]["stages_ms"])
+
+    worker.handle_line(json.dumps({"id": 2, "issue": make_issue()}))
+    snapshot = json.loads(worker.handle_line(json.dumps({"id": 3, "op": "stats"})))["result"]
+    assert snapshot["counters"] == {"multi_skill_fallback": 1, "direct_match": 1}
+    assert snapshot["stages"]["match"]["count"] == 2
+
+
+def test_worker_fallback_reuses_direct_match(monkeypatch):
+    """An assign request that falls back to the LLM is only matched once"""
+    import categoryagent
+    from pipeline_stats import PipelineStats
+
+    stats = PipelineStats(enabled=True)
+    monkeypatch.setattr(categoryagent, "assignment_stats", stats)
+    monkeypatch.setattr(categoryagent, "cache_enabled", False)
+    monkeypatch.setattr(categoryagent, "ai_breaker", categoryagent.CircuitBreaker())
+    monkeypatch.setattr(categoryagent, "run_ai_assignment", lambda issue_data: {"type": "technician_assignment"})
+
+    worker = AssignmentWorker()
+    worker.handle_line(json.dumps({"id": 1, "issue": {"title": "Lift stuck", "category": "elevator", "technicians": []}}))
+    snapshot = json.loads(worker.handle_line(json.dumps({"id": 2, "op": "stats"})))["result"]
+    assert snapshot["counters"] == {"llm_used": 1}
+    assert snapshot["stages"]["features"]["count"] == 1
+
+
+def test_unknown_timings_output_is_ignored():
+    """An ASSIGNMENT_TIMINGS value other than json or stderr leaves stats off instead of recording silently"""
+    import subprocess
+
+    completed = subprocess.run(
+        [sys.executable, "-c", "import categoryagent; print(categoryagent.assignment_stats.enabled)"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env={**os.environ, "ASSIGNMENT_TIMINGS": "yes"},
+        capture_output=True, text=True, timeout=120
+    )
+
+    assert completed.returncode == 0, completed.stderr
+    assert completed.stdout.strip() == "False"
+    assert "ASSIGNMENT_TIMINGS='yes'" in completed.stderr
+
+
+def test_benchmark_generators_are_seeded_and_regressions_flagged():
+    """Synthetic data is reproducible and the comparison honours the threshold"""
+    from benchmark_assignment import compare, generate_issues, generate_roster
+
+    assert generate_roster(50, seed=3) == generate_roster(50, seed=3)
+    assert generate_issues(20, seed=3) == generate_issues(20, seed=3)
+    assert len(generate_roster(50)) == 50
+
+    baseline = {"a": {"seconds_per_op": 1.0}, "b": {"seconds_per_op": 1.0}}
+    results = {"a": {"seconds_per_op": 1.1}, "b": {"seconds_per_op": 1.5}, "new": {"seconds_per_op": 9.0}}
+    assert [name for name, _, _ in compare(results, baseline, threshold=0.2)] == ["b"]
+
+
+def test_roster_columns_and_records():
+    """Roster keeps columns and bitsets; records read like the technician dicts"""
+    import pytest
+    from technician_roster import TechnicianRoster
+
+    roster = TechnicianRoster(SAMPLE_TECHNICIANS + [{"_id": "tech3", "skills": ["Plumbing", "Painting"]}])
+
+    assert list(roster.bonus) == [1, 2, 0]
+    assert roster.available_mask == 0b011 and roster.low_rate_mask == 0b010
+    assert roster.skills_of(2) == ["plumbing", "painting"]
+    assert roster.category_matches("plumbing") == ([0, 2], [])
+    assert roster.fallback_order() == [2, 0, 1]
+
+    record = roster.records[0]
+    assert record["name"] == "Rajesh Kumar" and record.get("_id") == "tech1"
+    assert record.to_dict() == SAMPLE_TECHNICIANS[0]
+    with pytest.raises(KeyError):
+        roster.records[2]["phone"]
+
+
+def test_roster_deltas_keep_id_index():
+    """Adds and updates keep the id index; id changes and removals find the right technician"""
+    from technician_roster import TechnicianRoster
+
+    roster = TechnicianRoster(SAMPLE_TECHNICIANS)
+    assert roster.position_of("tech2") == 1
+    index = roster._positions
+
+    roster.apply_changes([
+        {"action": "add", "technician": {"_id": "tech3", "skills": ["painting"]}},
+        {"action": "add", "technician": {"_id": "tech1", "skills": ["carpentry"]}},
+        {"action": "availability", "id": "tech3", "availability": "busy"},
+    ])
+    assert roster._positions is index
+    assert [roster.position_of(tech_id) for tech_id in ("tech1", "tech2", "tech3")] == [0, 1, 2]
+
+    # Renaming the first tech1 uncovers the duplicate appended above
+    roster.update("tech1", {"_id": "tech0"})
+    assert roster.position_of("tech1") == 3 and roster.position_of("tech0") == 0
+    roster.remove("tech2")
+    assert [roster.position_of(tech_id) for tech_id in ("tech0", "tech2", "tech3", "tech1")] == [0, None, 1, 2]
+
+
+def test_worker_roster_versions_and_deltas():
+    """Requests name a cached roster version; deltas patch it and unknown versions miss"""
+    worker = AssignmentWorker()
+
+    def call(request):
+        return json.loads(worker.handle_line(json.dumps(request)))["result"]
+
+    assert call({"op": "roster", "technicians": SAMPLE_TECHNICIANS, "version": "v1"})["version"] == "v1"
+    issue = make_issue(category="electrical", title="Fuse blown")
+    del issue["technicians"]
+    assert call({"issue": issue, "rosterVersion": "v1"})["technician"]["id"] == "tech2"
+
+    delta = call({"op": "roster_delta", "version": "v1", "newVersion": "v2", "changes": [
+        {"action": "availability", "id": "tech2", "availability": "off-duty"},
+        {"action": "add", "technician": dict(SAMPLE_TECHNICIANS[1], _id="tech3", hourlyRate=500)},
+    ]})
+    assert delta == {"status": "ok", "technicians": 3, "version": "v2", "baseVersion": "v1"}
+    assert call({"issue": issue, "rosterVersion": "v2"})["technician"]["id"] == "tech3"
+    # The base snapshot is untouched and the resident roster follows the patch
+    assert call({"issue": issue, "rosterVersion": "v1"})["technician"]["id"] == "tech2"
+    assert call({"issue": issue})["technician"]["id"] == "tech3"
+
+    miss = call({"issue": issue, "rosterVersion": "v9"})
+    assert miss["rosterMiss"] is True and miss["rosterVersion"] == "v9"
+    assert call({"op": "roster_delta", "version": "v2", "changes": [{"action": "remove", "id": "nobody"}]}) == {
+        "error": "Unknown technician: nobody", "version": "v2"
+    }
+
+
+def test_worker_roster_versions_are_thread_safe():
+    """Connection threads sharing a worker never miss a resident roster version"""
+    import sys
+    import threading
+
+    worker = AssignmentWorker()
+    worker.handle_line(json.dumps({"op": "roster", "technicians": SAMPLE_TECHNICIANS, "version": "v1"}))
+    issue = make_issue(category="electrical", title="Fuse blown")
+    del issue["technicians"]
+    request = json.dumps({"issue": issue, "rosterVersion": "v1"})
+    misses = []
+
+    def client():
+        for _ in range(500):
+            if "rosterMiss" in json.loads(worker.handle_line(request))["result"]:
+                misses.append(1)
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=client) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert misses == []
+
+
+def test_json_codec_matches_stdlib_layout(monkeypatch):
+    """The fast encoder, when installed, writes exactly what the stdlib fallback writes"""
+    import json_codec
+
+    result = assign_technician(make_issue()) | {"note": "₹ ✓", "ratio": 0.125, "nested": [{}, []]}
+    fast = (json_codec.dumps_bytes(result, indent=True), json_codec.dumps_bytes(result))
+    monkeypatch.setattr(json_codec, "orjson", None)
+    stdlib = (json_codec.dumps_bytes(result, indent=True), json_codec.dumps_bytes(result))
+
+    assert fast == stdlib
+    assert stdlib[0].decode("utf-8") == json.dumps(result, indent=2, ensure_ascii=False)
+    assert json_codec.loads(stdlib[1]) == result
+
+
+def test_json_codec_float_boundary(monkeypatch):
+    """Non-finite floats are null with either encoder; tiny floats differ only in exponent padding"""
+    import json_codec
+
+    values = {"nan": float("nan"), "inf": [float("inf"), -float("inf")], "big": 1e16, "tiny": 1e-7, "rate": 0.125}
+    fast = json_codec.dumps_bytes(values)
+    monkeypatch.setattr(json_codec, "orjson", None)
+    stdlib = json_codec.dumps_bytes(values)
+
+    assert stdlib == b'{"nan":null,"inf":[null,null],"big":1e+16,"tiny":1e-07,"rate":0.125}'
+    assert fast in (stdlib, stdlib.replace(b"1e-07", b"1e-7"))
+    assert json.loads(fast) == json.loads(stdlib)
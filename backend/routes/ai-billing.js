@@ -4,6 +4,8 @@ const { protect } = require('../middleware/auth');
 const Bill = require('../models/Bill');
 const { spawn } = require('child_process');
 const path = require('path');
+const readline = require('readline');
+const { once } = require('events');
 
 // AI Billing Analysis Results
 const aiBillingResults = {
@@ -114,8 +116,56 @@ const aiBillingResults = {
   }
 };
 
+// Duplicate groups fetched per analysis (largest first); the agent still
+// reports how many there are in duplicate_groups
+const BILLING_GROUP_LIMIT = parseInt(process.env.BILLING_GROUP_LIMIT || '500', 10);
+
+// The full dashboard view asks for every analyzer in the same run, so the
+// CSV is loaded once; their results arrive in the summary under "analyses".
+const DASHBOARD_ANALYZERS = ['duplicates', 'residents', 'status', 'anomalies'];
+
+// 'database' analyses the maintenance bills in MongoDB instead of the sample CSV
+const BILLING_SOURCE = process.env.BILLING_SOURCE || 'csv';
+
+// Maintenance bills from a database cursor, as rows with the CSV export's columns
+async function* maintenanceBillRows() {
+  const cursor = Bill.find({ type: 'maintenance' }).populate('resident', 'name').lean().cursor();
+  for await (const bill of cursor) {
+    yield {
+      'Bill ID': bill._id.toString(),
+      'Resident Name': bill.resident ? bill.resident.name : null,
+      Amount: bill.amount,
+      Status: bill.status,
+      Date: bill.dueDate ? bill.dueDate.toISOString().split('T')[0] : null,
+      Comments: bill.notes || null
+    };
+  }
+}
+
+// Write rows to the agent's stdin as NDJSON, waiting whenever the pipe is full
+const writeBillRows = async (rows, input) => {
+  for await (const row of rows) {
+    if (!input.write(JSON.stringify(row) + '\n')) {
+      await once(input, 'drain');
+    }
+  }
+  input.end();
+};
+
 // Function to run Python billing agent
-const runBillingAgent = async () => {
+// The agent writes NDJSON: the summary on the first line, then one duplicate
+// group per line, so results are parsed as they arrive instead of buffering
+// one large JSON document.
+// With bills (an async iterable of export rows, e.g. maintenanceBillRows())
+// they are piped to the agent as they are read; the agent then runs the
+// duplicate analysis only.
+const runBillingAgent = async ({
+  limit = BILLING_GROUP_LIMIT,
+  offset = 0,
+  sort = 'size',
+  analyzers = ['duplicates'],
+  bills = BILLING_SOURCE === 'database' ? maintenanceBillRows() : null
+} = {}) => {
   return new Promise((resolve, reject) => {
     // Use the original billing agent script
     const pythonScript = path.join(__dirname, '../../ai-agents/billingagent.py');
@@ -123,22 +173,43 @@ const runBillingAgent = async () => {
     
     console.log('Starting Python process...');
     console.log('Python script:', pythonScript);
-    console.log('CSV file:', csvFile);
+    console.log('Bills from:', bills ? 'stdin' : csvFile);
     
-    const pythonProcess = spawn('python', [pythonScript, csvFile], {
+    const input = bills ? ['-', '--input-format', 'ndjson'] : [csvFile, '--analyzers', analyzers.join(',')];
+    const pythonProcess = spawn('python', [
+      pythonScript, ...input,
+      '--format', 'ndjson',
+      '--sort', sort,
+      '--offset', String(offset),
+      '--limit', String(limit)
+    ], {
       env: {
         ...process.env,
         PYTHONPATH: path.join(__dirname, '../../ai-agents')
       }
     });
 
-    let output = '';
+    let summary = null;
+    const duplicateDetails = [];
     let error = '';
+    let exitCode = null;
+    let outputClosed = false;
 
-    pythonProcess.stdout.on('data', (data) => {
-      const dataStr = data.toString();
-      output += dataStr;
-      console.log('Python output:', dataStr.trim());
+    const lines = readline.createInterface({ input: pythonProcess.stdout });
+    lines.on('line', (line) => {
+      if (!line.trim()) {
+        return;
+      }
+      try {
+        const record = JSON.parse(line);
+        if (summary === null) {
+          summary = record;
+        } else {
+          duplicateDetails.push(record);
+        }
+      } catch (parseError) {
+        console.warn('⚠️ Skipping unparsable Python output line:', parseError.message);
+      }
     });
 
     pythonProcess.stderr.on('data', (data) => {
@@ -147,19 +218,40 @@ const runBillingAgent = async () => {
       console.error('Python error:', dataStr.trim());
     });
 
-    pythonProcess.on('close', (code) => {
-      console.log(`Python process exited with code: ${code}`);
-      if (code === 0) {
-        resolve(output);
+    // Settle once the process has exited and its last output line is parsed
+    const finish = () => {
+      if (exitCode === null || !outputClosed) {
+        return;
+      }
+      console.log(`Python process exited with code: ${exitCode}`);
+      if (exitCode === 0) {
+        resolve({ ...(summary || {}), duplicate_details: duplicateDetails });
       } else {
-        reject(new Error(`Python process exited with code ${code}: ${error}`));
+        reject(new Error(`Python process exited with code ${exitCode}: ${error}`));
       }
+    };
+    lines.on('close', () => {
+      outputClosed = true;
+      finish();
+    });
+    pythonProcess.on('close', (code) => {
+      exitCode = code;
+      finish();
     });
 
     pythonProcess.on('error', (err) => {
       console.error('Failed to start Python process:', err.message);
       reject(new Error(`Failed to start Python process: ${err.message}`));
     });
+
+    if (bills) {
+      // An agent that exits early closes the pipe; its exit code reports why
+      pythonProcess.stdin.on('error', (err) => console.warn('⚠️ Bill stream closed:', err.message));
+      writeBillRows(bills, pythonProcess.stdin).catch((err) => {
+        pythonProcess.kill();
+        reject(new Error(`Failed to stream bills: ${err.message}`));
+      });
+    }
   });
 };
 
@@ -328,35 +420,14 @@ router.post('/resolve-duplicate/:duplicateId', protect, async (req, res) => {
 router.post('/test-python', async (req, res) => {
   try {
     console.log('🧪 Testing Python agent...');
-    const pythonOutput = await runBillingAgent();
+    const pythonResults = await runBillingAgent();
     
     console.log('✅ Python agent test completed');
-    
-    // Try to parse JSON from the output
-    let pythonResults = {};
-    try {
-      // Find JSON in the output (it should be at the end)
-      const lines = pythonOutput.split('\n');
-      for (let i = lines.length - 1; i >= 0; i--) {
-        const line = lines[i].trim();
-        if (line.startsWith('{') && line.endsWith('}')) {
-          pythonResults = JSON.parse(line);
-          break;
-        }
-      }
-      if (Object.keys(pythonResults).length === 0) {
-        pythonResults = { rawOutput: pythonOutput };
-      }
-    } catch (parseError) {
-      console.warn('⚠️ Failed to parse Python output as JSON:', parseError.message);
-      pythonResults = { rawOutput: pythonOutput };
-    }
 
     res.json({
       success: true,
       message: 'Python agent test completed',
       data: {
-        pythonOutput: pythonOutput,
         parsedResults: pythonResults,
         timestamp: new Date().toISOString()
       }
@@ -386,29 +457,9 @@ router.post('/test-run-analysis', async (req, res) => {
     
     // Run the Python billing agent
     console.log('🤖 Running Python billing agent...');
-    const pythonOutput = await runBillingAgent();
+    const pythonResults = await runBillingAgent();
     
-    console.log('✅ Python agent output:', pythonOutput);
-
-    // Parse the JSON output from Python
-    let pythonResults = {};
-    try {
-      // Find JSON in the output (it should be at the end)
-      const lines = pythonOutput.split('\n');
-      for (let i = lines.length - 1; i >= 0; i--) {
-        const line = lines[i].trim();
-        if (line.startsWith('{') && line.endsWith('}')) {
-          pythonResults = JSON.parse(line);
-          break;
-        }
-      }
-      if (Object.keys(pythonResults).length === 0) {
-        pythonResults = { rawOutput: pythonOutput };
-      }
-    } catch (parseError) {
-      console.warn('⚠️ Failed to parse Python output as JSON:', parseError.message);
-      pythonResults = { rawOutput: pythonOutput };
-    }
+    console.log('✅ Python agent found', pythonResults.duplicate_groups || 0, 'duplicate groups');
 
     // Integrate Python results with existing mock data
     const enhancedResults = {
@@ -437,10 +488,9 @@ router.post('/test-run-analysis', async (req, res) => {
       enhancedResults.summary = {
         totalBills: pythonResults.total_records || 50,
         duplicateBills: pythonResults.duplicate_records || 0,
-        duplicateAmount: pythonResults.duplicate_details ? 
-          pythonResults.duplicate_details.reduce((sum, dup) => sum + (dup.amount * dup.count), 0) : 0,
-        potentialSavings: pythonResults.duplicate_details ? 
-          pythonResults.duplicate_details.reduce((sum, dup) => sum + (dup.amount * (dup.count - 1)), 0) : 0,
+        // Totals over every duplicate group; duplicate_details is only the first page
+        duplicateAmount: pythonResults.duplicate_amount || 0,
+        potentialSavings: pythonResults.potential_savings || 0,
         disputeRate: "12%",
         averageResolutionTime: "3.2 days"
       };
@@ -469,29 +519,9 @@ router.post('/run-analysis', protect, async (req, res) => {
 
     // Run the Python billing agent
     console.log('🤖 Running Python billing agent...');
-    const pythonOutput = await runBillingAgent();
+    const pythonResults = await runBillingAgent({ analyzers: DASHBOARD_ANALYZERS });
     
-    console.log('✅ Python agent output:', pythonOutput);
-
-    // Parse the JSON output from Python
-    let pythonResults = {};
-    try {
-      // Find JSON in the output (it should be at the end)
-      const lines = pythonOutput.split('\n');
-      for (let i = lines.length - 1; i >= 0; i--) {
-        const line = lines[i].trim();
-        if (line.startsWith('{') && line.endsWith('}')) {
-          pythonResults = JSON.parse(line);
-          break;
-        }
-      }
-      if (Object.keys(pythonResults).length === 0) {
-        pythonResults = { rawOutput: pythonOutput };
-      }
-    } catch (parseError) {
-      console.warn('⚠️ Failed to parse Python output as JSON:', parseError.message);
-      pythonResults = { rawOutput: pythonOutput };
-    }
+    console.log('✅ Python agent found', pythonResults.duplicate_groups || 0, 'duplicate groups');
 
     // Get bills with disputes (complaints about double payments)
     const billsWithDisputes = await Bill.find({
@@ -549,6 +579,9 @@ router.post('/run-analysis', protect, async (req, res) => {
         duplicateBills: filteredDuplicateBills.length,
         duplicateAmount: filteredDuplicateBills.reduce((sum, bill) => sum + bill.amount, 0),
         potentialSavings: filteredDuplicateBills.reduce((sum, bill) => sum + bill.amount, 0),
+        // What the agent found across all duplicate groups, not just the paged details
+        detectedDuplicateAmount: pythonResults.duplicate_amount || 0,
+        detectedPotentialSavings: pythonResults.potential_savings || 0,
         disputeRate: `${((filteredDuplicateBills.length / aiBillingResults.summary.totalBills) * 100).toFixed(1)}%`,
         averageResolutionTime: "3.2 days"
       }
@@ -38,31 +38,38 @@ async function assignExistingIssues() {
       return;
     }
 
+    // Assign the whole backlog in one agent call against a single roster
+    const agentData = {
+      technicians: technicians.map(tech => ({
+        _id: tech._id.toString(),
+        name: tech.name,
+        phone: tech.phone,
+        email: tech.email,
+        skills: tech.skills,
+        hourlyRate: tech.hourlyRate,
+        availability: tech.availability
+      })),
+      issues: unassignedIssues.map(issue => ({
+        title: issue.title,
+        description: issue.description,
+        category: issue.category
+      }))
+    };
+
+    const batchResult = await runTechnicianAssignment(agentData);
+
+    if (batchResult.error || !Array.isArray(batchResult.assignments)) {
+      console.log(`❌ Error running batch technician assignment: ${batchResult.error}`);
+      return;
+    }
+
     // Process each unassigned issue
     for (let i = 0; i < unassignedIssues.length; i++) {
       const issue = unassignedIssues[i];
+      const assignmentResult = batchResult.assignments[i] || { error: 'No assignment returned' };
       console.log(`\n🔄 Processing issue ${i + 1}/${unassignedIssues.length}: ${issue.title}`);
 
-      // Prepare data for the Python agent
-      const agentData = {
-        title: issue.title,
-        description: issue.description,
-        category: issue.category,
-        technicians: technicians.map(tech => ({
-          _id: tech._id.toString(),
-          name: tech.name,
-          phone: tech.phone,
-          email: tech.email,
-          skills: tech.skills,
-          hourlyRate: tech.hourlyRate,
-          availability: tech.availability
-        }))
-      };
-
       try {
-        // Call the Python agent
-        const assignmentResult = await runTechnicianAssignment(agentData);
-
         if (assignmentResult.error) {
           console.log(`❌ Error assigning technician to issue ${issue._id}: ${assignmentResult.error}`);
           continue;
@@ -89,9 +96,6 @@ async function assignExistingIssues() {
       } catch (error) {
         console.error(`❌ Error processing issue ${issue._id}:`, error);
       }
-
-      // Add a small delay to avoid overwhelming the system
-      await new Promise(resolve => setTimeout(resolve, 1000));
     }
 
     console.log('\n🎯 Assignment process completed!');